@@ -11,6 +11,10 @@ from datetime import datetime, timedelta
 from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler, filters, ChatMemberHandler
 
 from src.database.database import Database
+from src.database.async_database import AsyncDatabase
+from src.database.memory import MemoryStorage
+from src.database.sharding import ShardedDatabase
+from src.database.storage import AttendanceStorage
 from src.config.settings import Settings
 from src.handlers.command_handlers import CommandHandlers
 from src.handlers.callback_handlers import CallbackHandlers
@@ -29,7 +33,9 @@ class AttendanceBot:
     def __init__(self):
         """Initialize the bot with all components"""
         self.bot_token = Settings.BOT_TOKEN
-        self.database = Database(Settings.DATABASE_PATH)
+        self.database = AsyncDatabase(
+            self.create_storage(), read_workers=Settings.DATABASE_READ_POOL_SIZE
+        )
 
         # Initialize handlers
         self.command_handlers = CommandHandlers(self.database)
@@ -57,6 +63,8 @@ class AttendanceBot:
         self.application.add_handler(CommandHandler("clockout", self.command_handlers.clockout_command))
         self.application.add_handler(CommandHandler("check", self.command_handlers.check_command))
         self.application.add_handler(CommandHandler("status", self.command_handlers.status_command))
+        self.application.add_handler(CommandHandler("report", self.command_handlers.report_command))
+        self.application.add_handler(CommandHandler("backup", self.command_handlers.backup_command))
         self.application.add_handler(CommandHandler("config", self.command_handlers.config_command))
         self.application.add_handler(CommandHandler("help", self.command_handlers.help_command))
         self.application.add_handler(CommandHandler("setup", self.chat_handlers.setup_commands))
@@ -106,6 +114,10 @@ class AttendanceBot:
         self.application.add_handler(
             ChatMemberHandler(self.chat_handlers.handle_my_chat_member, ChatMemberHandler.MY_CHAT_MEMBER)
         )
+        # Administrators joining or leaving change who reminders are for
+        self.application.add_handler(
+            ChatMemberHandler(self.chat_handlers.handle_chat_member, ChatMemberHandler.CHAT_MEMBER)
+        )
 
         # Error handler
         self.application.add_error_handler(self.error_handler)
@@ -114,53 +126,104 @@ class AttendanceBot:
         """Setup scheduled jobs for reminders"""
         job_queue = self.application.job_queue
 
-        # Check for active configurations and schedule reminders
-        self.schedule_reminders_from_config()
+        # One job ticking every minute sends all scheduled messages and reminders;
+        # its index is built from the active configurations in on_startup
+        self.scheduled_handlers.dispatcher.start(job_queue)
 
         # Schedule a job to refresh configurations every hour
         job_queue.run_repeating(
             self.refresh_configurations_job,
             interval=timedelta(hours=1),
-            first=datetime.now() + timedelta(minutes=5)
+            first=timedelta(minutes=5)
+        )
+
+        # Move closed months out of the hot attendance table once a day
+        job_queue.run_daily(
+            self.archive_attendance_job,
+            time=self.local_time(Settings.ARCHIVE_TIME),
+            name='archive_attendance'
+        )
+
+        # Compressed online backup without stopping the bot
+        job_queue.run_daily(
+            self.backup_job,
+            time=self.local_time(Settings.BACKUP_TIME),
+            name='database_backup'
         )
 
+        # Checkpoint, analyze and vacuum the database off-hours
+        job_queue.run_daily(
+            self.maintenance_job,
+            time=self.local_time(Settings.MAINTENANCE_TIME),
+            name='database_maintenance'
+        )
+
+    @staticmethod
+    def create_storage() -> AttendanceStorage:
+        """Create the storage engine selected by STORAGE_BACKEND"""
+        if Settings.STORAGE_BACKEND == 'memory':
+            logger.warning("Using in-memory storage: attendance is lost when the bot stops")
+            return MemoryStorage()
+        if Settings.STORAGE_BACKEND != 'sqlite':
+            raise ValueError(f"Unknown STORAGE_BACKEND: {Settings.STORAGE_BACKEND}")
+
+        options = dict(
+            pool_size=Settings.DATABASE_POOL_SIZE,
+            migration_batch_size=Settings.MIGRATION_BATCH_SIZE,
+            read_pool_size=Settings.DATABASE_READ_POOL_SIZE,
+            user_cache_size=Settings.USER_CACHE_SIZE
+        )
+        if Settings.DATABASE_SHARDS > 1:
+            return ShardedDatabase(Settings.DATABASE_PATH, shards=Settings.DATABASE_SHARDS, **options)
+        return Database(Settings.DATABASE_PATH, **options)
+
+    @staticmethod
+    def local_time(time_str: str):
+        """Turn an HH:MM setting into a time in the configured timezone for run_daily"""
+        parsed = datetime.strptime(time_str, '%H:%M').replace(year=datetime.now().year)
+        return Settings.TIMEZONE.localize(parsed).timetz()
+
     async def refresh_configurations_job(self, context):
         """Job to refresh configurations and reschedule reminders"""
         try:
             logger.info("Refreshing configurations and rescheduling reminders")
-            self.schedule_reminders_from_config()
+            await self.schedule_reminders_from_config()
         except Exception as e:
             logger.error(f"Error refreshing configurations: {e}")
 
-    def schedule_reminders_from_config(self):
-        """Schedule reminders based on active configurations"""
-        job_queue = self.application.job_queue
-
-        # Get all active configurations
-        configurations = self.database.get_all_active_configurations()
-
-        # Group configurations by chat_id to avoid duplicate scheduling
-        chat_configs = {}
-        for config in configurations:
-            chat_id = config['chat_id']
-            if chat_id not in chat_configs:
-                chat_configs[chat_id] = []
-            chat_configs[chat_id].append(config)
+    async def archive_attendance_job(self, context):
+        """Job to archive closed months into monthly partitions"""
+        try:
+            await self.database.archive_closed_months(
+                keep_months=Settings.ARCHIVE_KEEP_MONTHS,
+                batch_size=Settings.ARCHIVE_BATCH_SIZE
+            )
+        except Exception as e:
+            logger.error(f"Error archiving attendance: {e}")
 
-        # Remove all existing reminder jobs
-        for job in job_queue.jobs():
-            if job.name and ('clock_in_reminder' in job.name or 'clock_out_reminder' in job.name or 
-                            'clock_in_' in job.name or 'clock_out_' in job.name):
-                job.schedule_removal()
+    async def backup_job(self, context):
+        """Job to write the daily database backup"""
+        try:
+            await self.database.backup(
+                Settings.BACKUP_DIR,
+                keep=Settings.BACKUP_KEEP,
+                pages=Settings.BACKUP_PAGES_PER_STEP,
+                sleep=Settings.BACKUP_STEP_SLEEP_MS / 1000
+            )
+        except Exception as e:
+            logger.error(f"Error backing up database: {e}")
 
-        # Schedule new jobs based on configurations, grouped by chat
-        scheduled_chats = 0
-        for chat_id, configs in chat_configs.items():
-            # Schedule all reminders for this chat
-            self.scheduled_handlers.schedule_daily_messages(chat_id, self.application)
-            scheduled_chats += 1
+    async def maintenance_job(self, context):
+        """Job to run nightly database maintenance"""
+        try:
+            await self.database.run_maintenance(vacuum_step_pages=Settings.MAINTENANCE_VACUUM_PAGES)
+        except Exception as e:
+            logger.error(f"Error running database maintenance: {e}")
 
-        logger.info(f"Scheduled reminders for {scheduled_chats} chats with {len(configurations)} configurations")
+    async def schedule_reminders_from_config(self):
+        """Schedule reminders based on active configurations"""
+        # Only configurations that changed since the last run are re-indexed
+        self.scheduled_handlers.dispatcher.refresh()
 
     async def error_handler(self, update, context):
         """Handle errors"""
@@ -183,6 +246,7 @@ class AttendanceBot:
             ("clockout", "Clock out manual"),
             ("check", "Cek kehadiran hari ini"),
             ("status", "Laporan kehadiran detail"),
+            ("report", "Laporan kehadiran periode"),
             ("config", "Konfigurasi clock in/out"),
             ("setup", "Setup pengingat otomatis"),
             ("trigger_clockin", "Kirim pengingat clock in manual"),
@@ -190,17 +254,28 @@ class AttendanceBot:
             ("help", "Bantuan penggunaan")
         ])
 
+        # Check for active configurations and schedule reminders
+        await self.schedule_reminders_from_config()
+        # Pick up where the previous run stopped, so reminders missed while down still go out
+        await self.scheduled_handlers.dispatcher.restore()
+
+        # Build indexes and backfill new columns while the bot keeps serving
+        application.create_task(self.database.run_online_migrations())
+
     async def on_shutdown(self, application):
         """Called when the bot shuts down"""
         logger.info("Bot shutting down...")
 
+        # Flush pending writes, close the connection pool and stop the database thread
+        await self.database.close()
+
     def run(self):
         """Run the bot"""
         try:
             # Start the bot
             logger.info("Starting Attendance Bot...")
             self.application.run_polling(
-                allowed_updates=["message", "callback_query", "my_chat_member"],
+                allowed_updates=["message", "callback_query", "my_chat_member", "chat_member"],
                 drop_pending_updates=True
             )
 
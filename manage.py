@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Maintenance commands for the attendance database
+"""
+
+import argparse
+import logging
+import os
+import sys
+from typing import Union
+
+from src.config.settings import Settings
+from src.database import backup
+from src.database.database import Database
+from src.database.sharding import ShardedDatabase, shard_path
+
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+logger = logging.getLogger(__name__)
+
+SqliteStorage = Union[Database, ShardedDatabase]
+
+def migrate_command(database: SqliteStorage, args) -> int:
+    """Apply every pending migration, including the online steps"""
+    while database.run_online_migration_step():
+        pass
+    logger.info("✅ Database schema is up to date")
+    return 0
+
+def backfill_summary_command(database: SqliteStorage, args) -> int:
+    """Rebuild daily_summary for past days from the attendance history"""
+    if database.has_pending_migrations():
+        migrate_command(database, args)
+    database.backfill_daily_summary()
+    return 0
+
+def vacuum_command(database: SqliteStorage, args) -> int:
+    """Rebuild the database file once so nightly incremental vacuums can run"""
+    result = database.full_vacuum()
+    logger.info(f"✅ VACUUM reclaimed {result['reclaimed_pages']} pages in {result['seconds']:.2f}s")
+    return 0
+
+def backup_command(args) -> int:
+    """Write a compressed online backup while the bot keeps running.
+
+    Reads through a read-only connection per database file, so the live
+    database is never migrated or created by a backup.
+    """
+    if args.shards > 1:
+        targets = [
+            (shard_path(args.database, index), os.path.join(args.backup_dir, f"shard{index}"))
+            for index in range(args.shards)
+        ]
+    else:
+        targets = [(args.database, args.backup_dir)]
+
+    for db_path, backup_dir in targets:
+        conn = backup.connect_read_only(db_path)
+        try:
+            result = backup.backup_database(
+                conn,
+                backup_dir,
+                keep=args.keep,
+                pages=Settings.BACKUP_PAGES_PER_STEP,
+                sleep=Settings.BACKUP_STEP_SLEEP_MS / 1000
+            )
+        finally:
+            conn.close()
+        logger.info(f"✅ Backup written to {result['path']} ({result['compressed_bytes']} bytes)")
+    return 0
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the command line parser"""
+    parser = argparse.ArgumentParser(description="Attendance bot database maintenance")
+    parser.add_argument('--database', default=Settings.DATABASE_PATH,
+                        help="Path to the SQLite database (default: DATABASE_PATH)")
+    parser.add_argument('--shards', type=int, default=Settings.DATABASE_SHARDS,
+                        help="Number of database shards (default: DATABASE_SHARDS)")
+
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser(
+        'migrate', help="Apply pending schema migrations"
+    ).set_defaults(func=migrate_command)
+    subparsers.add_parser(
+        'backfill-summary', help="Rebuild the daily summary of past days"
+    ).set_defaults(func=backfill_summary_command)
+    subparsers.add_parser(
+        'vacuum', help="Rebuild the database file and enable incremental vacuum (stop the bot first)"
+    ).set_defaults(func=vacuum_command)
+
+    backup_parser = subparsers.add_parser('backup', help="Write a compressed online backup")
+    backup_parser.add_argument('--backup-dir', default=Settings.BACKUP_DIR,
+                               help="Directory for backups (default: BACKUP_DIR)")
+    backup_parser.add_argument('--keep', type=int, default=Settings.BACKUP_KEEP,
+                               help="Number of backups to keep (default: BACKUP_KEEP)")
+    backup_parser.set_defaults(func=backup_command, storage=False)
+
+    return parser
+
+def main() -> int:
+    """Run a maintenance command"""
+    args = build_parser().parse_args()
+    if not getattr(args, 'storage', True):
+        # Commands that must not open the storage, which would migrate the file
+        try:
+            return args.func(args)
+        except Exception as e:
+            logger.error(f"❌ {args.command} failed: {e}")
+            return 1
+
+    if args.shards > 1:
+        database = ShardedDatabase(
+            args.database, shards=args.shards, migration_batch_size=Settings.MIGRATION_BATCH_SIZE
+        )
+    else:
+        database = Database(args.database, migration_batch_size=Settings.MIGRATION_BATCH_SIZE)
+    try:
+        return args.func(database, args)
+    except Exception as e:
+        logger.error(f"❌ {args.command} failed: {e}")
+        return 1
+    finally:
+        database.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,31 +5,28 @@
 
 echo "🗑️ Resetting database..."
 
-# Stop the bot service
-echo "⏹️ Stopping bot service..."
-sudo systemctl stop telegram-bot.service
+cd /home/ubuntu/telegram-bappenas-bot
+source bot_env/bin/activate
 
-# Backup old database if exists
+# Backup old database if exists, using SQLite's online backup over a read-only
+# connection while the bot is still running (cp on a live WAL database can miss
+# committed pages, and the backup never migrates the file)
 if [ -f "data/attendance.db" ]; then
     echo "💾 Backing up old database..."
-    cp data/attendance.db "data/attendance.db.backup.$(date +%Y%m%d_%H%M%S)"
+    python manage.py --database data/attendance.db backup --backup-dir data/backups
 fi
 
-# Remove old database
+# Stop the bot service
+echo "⏹️ Stopping bot service..."
+sudo systemctl stop telegram-bot.service
+
+# Remove old database together with its WAL files
 echo "🗑️ Removing old database..."
-rm -f data/attendance.db
+rm -f data/attendance.db data/attendance.db-wal data/attendance.db-shm
 
-# Create new database by running the bot briefly
+# Create new database with every migration applied
 echo "🔄 Creating new database..."
-cd /home/ubuntu/telegram-bappenas-bot
-source bot_env/bin/activate
-
-# Test database creation
-python -c "
-from src.database.database import Database
-db = Database('data/attendance.db')
-print('✅ Database created successfully')
-"
+python manage.py --database data/attendance.db migrate && echo "✅ Database created successfully"
 
 # Start the bot service
 echo "▶️ Starting bot service..."
@@ -40,4 +37,4 @@ echo "📊 Checking bot status..."
 sudo systemctl status telegram-bot.service --no-pager
 
 echo "✅ Database reset completed!"
-echo "📝 Old database backed up as data/attendance.db.backup.*" 
\ No newline at end of file
+echo "📝 Old database backed up in data/backups/" 
\ No newline at end of file
@@ -12,8 +12,61 @@ class Settings:
     # Timezone Configuration
     TIMEZONE = pytz.timezone('Asia/Jakarta')  # Default to Jakarta timezone
 
+    # Storage engine: 'sqlite' (default) or 'memory' (nothing survives a restart)
+    STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'sqlite').lower()
+
     # Database Configuration
     DATABASE_PATH = os.getenv('DATABASE_PATH', 'attendance.db')
+    DATABASE_POOL_SIZE = int(os.getenv('DATABASE_POOL_SIZE', '4'))
+    # Above 1, chats are spread over this many files (attendance.shard0.db, ...)
+    # by chat_id; fix it before the first start, changing it needs the data moved
+    DATABASE_SHARDS = int(os.getenv('DATABASE_SHARDS', '1'))
+    # Read-only connections (and reader threads) for reports
+    DATABASE_READ_POOL_SIZE = int(os.getenv('DATABASE_READ_POOL_SIZE', '2'))
+    # Recently seen user names kept in memory
+    USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', '10000'))
+
+    # Group commit for attendance writes: inserts arriving within the window
+    # are committed together as one transaction
+    ATTENDANCE_BATCH_WINDOW_MS = int(os.getenv('ATTENDANCE_BATCH_WINDOW_MS', '5'))
+    ATTENDANCE_BATCH_MAX_SIZE = int(os.getenv('ATTENDANCE_BATCH_MAX_SIZE', '200'))
+
+    # Rows per transaction for background migration backfills
+    MIGRATION_BATCH_SIZE = int(os.getenv('MIGRATION_BATCH_SIZE', '1000'))
+
+    # Monthly archive: months older than the current one plus ARCHIVE_KEEP_MONTHS
+    # move out of the hot attendance table every day at ARCHIVE_TIME (HH:MM, local)
+    ARCHIVE_KEEP_MONTHS = int(os.getenv('ARCHIVE_KEEP_MONTHS', '1'))
+    ARCHIVE_BATCH_SIZE = int(os.getenv('ARCHIVE_BATCH_SIZE', '1000'))
+    ARCHIVE_TIME = os.getenv('ARCHIVE_TIME', '02:30')
+
+    # Nightly WAL checkpoint, ANALYZE and incremental vacuum at MAINTENANCE_TIME (HH:MM, local)
+    MAINTENANCE_TIME = os.getenv('MAINTENANCE_TIME', '03:00')
+    MAINTENANCE_VACUUM_PAGES = int(os.getenv('MAINTENANCE_VACUUM_PAGES', '1000'))
+
+    # Online backups: a gzipped snapshot every day at BACKUP_TIME (HH:MM, local),
+    # keeping the newest BACKUP_KEEP; the copy runs BACKUP_PAGES_PER_STEP pages at a time
+    BACKUP_DIR = os.getenv('BACKUP_DIR', 'backups')
+    BACKUP_KEEP = int(os.getenv('BACKUP_KEEP', '7'))
+    BACKUP_TIME = os.getenv('BACKUP_TIME', '02:00')
+    BACKUP_PAGES_PER_STEP = int(os.getenv('BACKUP_PAGES_PER_STEP', '256'))
+    BACKUP_STEP_SLEEP_MS = int(os.getenv('BACKUP_STEP_SLEEP_MS', '10'))
+
+    # Scheduled fan-out: chats handled at once, and Telegram's limits of about 30
+    # messages per second per bot and 20 per minute per group; limits below 2 are raised to 2
+    FANOUT_CONCURRENCY = max(int(os.getenv('FANOUT_CONCURRENCY', '32')), 1)
+    TELEGRAM_MESSAGES_PER_SECOND = max(int(os.getenv('TELEGRAM_MESSAGES_PER_SECOND', '30')), 2)
+    TELEGRAM_CHAT_MESSAGES_PER_MINUTE = max(int(os.getenv('TELEGRAM_CHAT_MESSAGES_PER_MINUTE', '20')), 2)
+    # Scheduled sends of each chat are delayed by a fixed share of this many seconds,
+    # spreading chats with the same start time; 0 sends everything on the minute
+    DISPATCH_JITTER_SECONDS = float(os.getenv('DISPATCH_JITTER_SECONDS', '0'))
+    # Retries of a message after Telegram answers with RetryAfter
+    FANOUT_MAX_RETRIES = int(os.getenv('FANOUT_MAX_RETRIES', '3'))
+
+    # Telegram user IDs allowed to run bot-wide commands such as /backup
+    BOT_ADMIN_IDS = [
+        int(user_id) for user_id in os.getenv('BOT_ADMIN_IDS', '').split(',') if user_id.strip()
+    ]
 
     @classmethod
     def validate_bot_token(cls):
@@ -65,6 +118,7 @@ class Settings:
         'clockout': 'Clock out manual',
         'check': 'Cek kehadiran hari ini',
         'status': 'Laporan kehadiran detail',
+        'report': 'Laporan kehadiran periode',
         'config': 'Konfigurasi clock in/out',
         'help': 'Bantuan penggunaan bot'
     }
@@ -0,0 +1,255 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from functools import partial
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from src.config.settings import Settings
+from src.database.config_snapshot import ScheduleConfig
+from src.database.roster import DailyRoster
+from src.database.storage import AttendanceStorage, ClockStatus, DailySummary, ScheduleMarkers
+from src.database.write_queue import AttendanceWriteQueue
+from src.utils.helpers import format_report_lines, paginate_lines
+
+logger = logging.getLogger(__name__)
+
+class AsyncDatabase:
+    """Awaitable facade over a storage engine for use inside async handlers"""
+
+    def __init__(self, database: AttendanceStorage, read_workers: int = 2):
+        self.database = database
+        # A single dedicated thread runs every query, so they never block the
+        # event loop and writes never contend with each other for the lock
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="database")
+        # Reports run on their own threads against read-only snapshots, so a
+        # long report never queues clock-ins behind it
+        self._read_executor = ThreadPoolExecutor(max_workers=read_workers, thread_name_prefix="database-read")
+
+        # Clock-in bursts are committed together instead of one fsync per tap
+        self._write_queue = AttendanceWriteQueue(
+            self._commit_attendance_batch,
+            window_ms=Settings.ATTENDANCE_BATCH_WINDOW_MS,
+            max_batch=Settings.ATTENDANCE_BATCH_MAX_SIZE,
+            failed_result=ClockStatus.FAILED
+        )
+
+    async def _run(self, func, *args, **kwargs):
+        """Run a blocking Database call on the database thread"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(func, *args, **kwargs))
+
+    async def _run_read(self, func, *args, **kwargs):
+        """Run a blocking read-only Database call on a reader thread"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._read_executor, partial(func, *args, **kwargs))
+
+    async def add_chat_group(self, chat_id: int, chat_title: str, chat_type: str) -> bool:
+        """Add a chat group to the database"""
+        return await self._run(self.database.add_chat_group, chat_id, chat_title, chat_type)
+
+    async def record_attendance(self, chat_id: int, user_id: int, user_name: str,
+                                username: str, clock_type: str, clock_time: datetime) -> bool:
+        """Record attendance in the database"""
+        status = await self.clock(chat_id, user_id, user_name, username, clock_type, clock_time)
+        return status == ClockStatus.INSERTED
+
+    async def clock(self, chat_id: int, user_id: int, user_name: str, username: str,
+                    clock_type: str, clock_time: datetime, day: Optional[date] = None) -> ClockStatus:
+        """Clock a user in or out through the group-commit write queue"""
+        # Filed under day when given, e.g. the start day of an overnight window
+        day = day or clock_time
+        # A roster already in memory settles duplicates without queueing a write
+        roster = self.database.peek_roster(chat_id, day)
+        if roster is not None:
+            if clock_type == 'in' and roster.has_clocked_in(user_id):
+                return ClockStatus.ALREADY_CLOCKED
+            if clock_type == 'out' and roster.has_clocked_out(user_id):
+                return ClockStatus.ALREADY_CLOCKED
+
+        return await self._write_queue.submit(
+            (chat_id, user_id, user_name, username, clock_type, clock_time, day)
+        )
+
+    async def _commit_attendance_batch(self, records: List[Tuple]) -> List[ClockStatus]:
+        """Commit a batch collected by the write queue"""
+        return await self._run(self.database.clock_batch, records)
+
+    async def get_today_attendance(self, chat_id: int, date: datetime) -> Dict:
+        """Get attendance for a specific date"""
+        return await self._run(self.database.get_today_attendance, chat_id, date)
+
+    async def get_daily_summary(self, chat_id: int, date: datetime) -> DailySummary:
+        """Get a chat's attendance counts for a date"""
+        return await self._run(self.database.get_daily_summary, chat_id, date)
+
+    def peek_roster(self, chat_id: int, date: datetime) -> Optional[DailyRoster]:
+        """Get a chat's roster for a date if it is already in memory (no database round trip)"""
+        return self.database.peek_roster(chat_id, date)
+
+    async def get_roster(self, chat_id: int, date: datetime) -> DailyRoster:
+        """Get a chat's in-memory attendance roster, touching the database only on first use"""
+        roster = self.database.peek_roster(chat_id, date)
+        if roster is not None:
+            return roster
+        return await self._run(self.database.get_roster, chat_id, date)
+
+    async def _stream(self, iterator: Iterator) -> AsyncIterator:
+        """Step a blocking read-only iterator on a reader thread, one item per round trip"""
+        done = object()
+        try:
+            while True:
+                item = await self._run_read(next, iterator, done)
+                if item is done:
+                    break
+                yield item
+        finally:
+            # Close the iterator even if the consumer stops early
+            close = getattr(iterator, 'close', None)
+            if close is not None:
+                await self._run_read(close)
+
+    async def iter_report_pages(self, chat_id: int, start: date, end: date,
+                                header: str = "") -> AsyncIterator[str]:
+        """Yield a date-range attendance report as Telegram-sized pages"""
+        # Clock-in times are shown in the configured timezone
+        utc_offset = Settings.get_timezone().utcoffset(datetime.combine(start, datetime.min.time()))
+        rows = self.database.iter_attendance_report(
+            chat_id, start, end, utc_offset=int(utc_offset.total_seconds())
+        )
+        pages = self._stream(paginate_lines(format_report_lines(rows), header))
+        try:
+            async for page in pages:
+                yield page
+        finally:
+            await pages.aclose()
+
+    async def save_configuration(self, chat_id: int, config_type: str, start_time: str,
+                                 end_time: str, reminder_interval: int, enabled_days: List[int]) -> bool:
+        """Save clock in/out configuration"""
+        return await self._run(
+            self.database.save_configuration,
+            chat_id, config_type, start_time, end_time, reminder_interval, enabled_days
+        )
+
+    def get_configuration(self, chat_id: int, config_type: str) -> Optional[ScheduleConfig]:
+        """Get configuration for a chat and type (in-memory, no database round trip)"""
+        return self.database.get_configuration(chat_id, config_type)
+
+    def get_all_active_configurations(self) -> List[ScheduleConfig]:
+        """Get all active configurations (in-memory, no database round trip)"""
+        return self.database.get_all_active_configurations()
+
+    async def save_schedule_markers(self, last_tick: int, fired: List[Tuple[int, str, int]]) -> bool:
+        """Record the dispatcher's last tick and last-fired markers"""
+        return await self._run(self.database.save_schedule_markers, last_tick, fired)
+
+    async def get_schedule_markers(self) -> Tuple[Optional[int], ScheduleMarkers]:
+        """Get the dispatcher's last tick and every last-fired marker"""
+        return await self._run(self.database.get_schedule_markers)
+
+    async def get_members_without_attendance(self, chat_id: int, clock_type: str,
+                                             date: datetime, member_ids: List[int]) -> List[int]:
+        """Get member IDs who haven't clocked in/out on a specific date"""
+        return await self._run(
+            self.database.get_members_without_attendance,
+            chat_id, clock_type, date, member_ids
+        )
+
+    async def get_all_chat_groups(self) -> List[Dict]:
+        """Get all chat groups"""
+        return await self._run(self.database.get_all_chat_groups)
+
+    async def run_online_migrations(self, pause: float = 0.05):
+        """Run pending online migration steps one at a time between regular queries"""
+        if not self.database.has_pending_migrations():
+            return
+
+        logger.info("Running online migrations in the background")
+        # Each step is its own short transaction on the database thread; the pause
+        # lets queued handler queries and group commits run in between
+        while await self._run(self.database.run_online_migration_step):
+            await asyncio.sleep(pause)
+        logger.info("Online migrations finished")
+
+    async def archive_closed_months(self, keep_months: int = 1, batch_size: int = 1000,
+                                    pause: float = 0.05) -> int:
+        """Move closed months out of the hot attendance table in batches"""
+        total = 0
+        while True:
+            month, moved = await self._run(self.database.archive_step, keep_months, batch_size)
+            if month is None:
+                break
+            total += moved
+            # Let handler queries and group commits run between batches
+            await asyncio.sleep(pause)
+
+        if total:
+            logger.info(f"Archived {total} attendance rows into monthly partitions")
+        return total
+
+    async def run_maintenance(self, vacuum_step_pages: int = 1000, pause: float = 0.05) -> Dict:
+        """Checkpoint the WAL, refresh statistics and reclaim free pages in steps"""
+        started = time.monotonic()
+
+        checkpoint = await self._run(self.database.checkpoint)
+        if checkpoint:
+            logger.info(
+                f"WAL checkpoint: {checkpoint['checkpointed_pages']}/{checkpoint['wal_pages']} pages "
+                f"in {checkpoint['seconds']:.2f}s" + (" (busy, not truncated)" if checkpoint['busy'] else "")
+            )
+
+        optimize = await self._run(self.database.optimize)
+        if optimize:
+            action = "ANALYZE" if optimize['analyzed'] else "PRAGMA optimize"
+            logger.info(f"{action} finished in {optimize['seconds']:.2f}s")
+
+        # Bounded vacuum steps, so queued writes run in between
+        vacuum_started = time.monotonic()
+        reclaimed = 0
+        while True:
+            pages = await self._run(self.database.incremental_vacuum_step, vacuum_step_pages)
+            reclaimed += pages
+            if pages < vacuum_step_pages:
+                break
+            await asyncio.sleep(pause)
+        logger.info(f"Incremental vacuum reclaimed {reclaimed} pages in {time.monotonic() - vacuum_started:.2f}s")
+
+        elapsed = time.monotonic() - started
+        logger.info(f"Database maintenance finished in {elapsed:.2f}s")
+        return {
+            'checkpoint': checkpoint,
+            'optimize': optimize,
+            'reclaimed_pages': reclaimed,
+            'seconds': elapsed
+        }
+
+    async def backup(self, backup_dir: str, keep: int = 7, pages: int = 256,
+                     sleep: float = 0.01) -> Dict:
+        """Write a compressed online backup on a reader thread, leaving writes untouched"""
+        result = await self._run_read(self.database.backup, backup_dir, keep, pages, sleep)
+        if not result:
+            logger.info(f"{type(self.database).__name__} keeps no database file, nothing to back up")
+            return result
+        logger.info(
+            f"Backup written to {result['path']}: {result['raw_bytes']} bytes, "
+            f"{result['compressed_bytes']} compressed, {result['steps']} steps, "
+            f"{result['rotated']} old backups removed, {result['seconds']:.2f}s"
+        )
+        return result
+
+    async def close(self):
+        """Flush queued writes, close pooled connections and stop the executors"""
+        await self._write_queue.close()
+
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, partial(self._read_executor.shutdown, wait=True))
+
+        try:
+            await self._run(self.database.close)
+        except Exception as e:
+            logger.error(f"Error closing database connections: {e}")
+
+        await loop.run_in_executor(None, partial(self._executor.shutdown, wait=True))
+        logger.info("Database executor stopped")
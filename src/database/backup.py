@@ -0,0 +1,85 @@
+import sqlite3
+import gzip
+import logging
+import os
+import shutil
+import time
+from datetime import datetime
+from typing import Dict, List
+from urllib.parse import quote
+
+logger = logging.getLogger(__name__)
+
+BACKUP_PREFIX = 'attendance-'
+BACKUP_SUFFIX = '.db.gz'
+
+def list_backups(backup_dir: str) -> List[str]:
+    """Compressed snapshots in a backup directory, oldest first"""
+    if not os.path.isdir(backup_dir):
+        return []
+    names = sorted(
+        name for name in os.listdir(backup_dir)
+        if name.startswith(BACKUP_PREFIX) and name.endswith(BACKUP_SUFFIX)
+    )
+    return [os.path.join(backup_dir, name) for name in names]
+
+def rotate_backups(backup_dir: str, keep: int) -> List[str]:
+    """Delete all but the newest keep snapshots, returning the removed paths"""
+    backups = list_backups(backup_dir)
+    removed = backups[:-keep] if keep > 0 else []
+    for path in removed:
+        os.remove(path)
+    return removed
+
+def connect_read_only(db_path: str) -> sqlite3.Connection:
+    """Open an existing database read-only, without running migrations or creating the file"""
+    conn = sqlite3.connect(f"file:{quote(db_path)}?mode=ro", uri=True)
+    conn.execute("PRAGMA query_only = ON")
+    return conn
+
+def backup_database(source: sqlite3.Connection, backup_dir: str, keep: int = 7,
+                    pages: int = 256, sleep: float = 0.01) -> Dict:
+    """Copy a live database with the online backup API into a gzipped, rotated snapshot.
+
+    Each step copies at most pages pages and then sleeps, so writers on other
+    connections are never locked out for long; SQLite restarts the copy by
+    itself if another connection changes pages already copied.
+    """
+    os.makedirs(backup_dir, exist_ok=True)
+    started = time.monotonic()
+    name = f"{BACKUP_PREFIX}{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+    raw_path = os.path.join(backup_dir, f"{name}.db.tmp")
+    final_path = os.path.join(backup_dir, f"{name}{BACKUP_SUFFIX}")
+
+    steps = 0
+
+    def progress(status, remaining, total):
+        nonlocal steps
+        steps += 1
+
+    target = sqlite3.connect(raw_path)
+    try:
+        source.backup(target, pages=pages, progress=progress, sleep=sleep)
+    finally:
+        target.close()
+
+    try:
+        raw_size = os.path.getsize(raw_path)
+        with open(raw_path, 'rb') as raw, gzip.open(final_path + '.tmp', 'wb') as compressed:
+            shutil.copyfileobj(raw, compressed)
+        # Only a complete archive ever carries the final name
+        os.replace(final_path + '.tmp', final_path)
+    finally:
+        for leftover in (raw_path, final_path + '.tmp'):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+
+    removed = rotate_backups(backup_dir, keep)
+    return {
+        'path': final_path,
+        'raw_bytes': raw_size,
+        'compressed_bytes': os.path.getsize(final_path),
+        'steps': steps,
+        'rotated': len(removed),
+        'seconds': time.monotonic() - started
+    }
@@ -0,0 +1,66 @@
+from dataclasses import dataclass
+from datetime import time
+from types import MappingProxyType
+from typing import Dict, Iterable, List, Optional, Tuple
+
+def days_to_mask(days: Iterable[int]) -> int:
+    """Convert a list of weekday numbers (0=Monday) to a bitmask"""
+    mask = 0
+    for day in days:
+        mask |= 1 << day
+    return mask
+
+def mask_to_days(mask: int) -> List[int]:
+    """Convert a weekday bitmask back to a sorted list of weekday numbers"""
+    return [day for day in range(7) if mask >> day & 1]
+
+@dataclass(frozen=True)
+class ScheduleConfig:
+    """Clock in/out configuration of one chat with pre-parsed times"""
+    chat_id: int
+    config_type: str  # 'clock_in' or 'clock_out'
+    start_time: time
+    end_time: time
+    reminder_interval: int  # minutes
+    enabled_days_mask: int  # bit n set when weekday n is enabled
+    is_active: bool = True
+
+    @property
+    def enabled_days(self) -> List[int]:
+        return mask_to_days(self.enabled_days_mask)
+
+    @property
+    def start_time_str(self) -> str:
+        return self.start_time.strftime('%H:%M')
+
+    @property
+    def end_time_str(self) -> str:
+        return self.end_time.strftime('%H:%M')
+
+    def is_enabled_on(self, weekday: int) -> bool:
+        """Check whether the configuration applies on a weekday (0=Monday)"""
+        return bool(self.enabled_days_mask >> weekday & 1)
+
+class ConfigSnapshot:
+    """Immutable view of every configuration, replaced as a whole on each write"""
+
+    def __init__(self, configs: Dict[Tuple[int, str], ScheduleConfig] = None):
+        self._configs = MappingProxyType(dict(configs or {}))
+        self._active = tuple(config for config in self._configs.values() if config.is_active)
+
+    def get(self, chat_id: int, config_type: str) -> Optional[ScheduleConfig]:
+        """Get the configuration of a chat and type"""
+        return self._configs.get((chat_id, config_type))
+
+    def active(self) -> Tuple[ScheduleConfig, ...]:
+        """All active configurations"""
+        return self._active
+
+    def with_config(self, config: ScheduleConfig) -> 'ConfigSnapshot':
+        """Return a new snapshot with one configuration added or replaced"""
+        configs = dict(self._configs)
+        configs[(config.chat_id, config.config_type)] = config
+        return ConfigSnapshot(configs)
+
+    def __len__(self) -> int:
+        return len(self._configs)
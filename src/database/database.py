@@ -1,116 +1,251 @@
 import sqlite3
 import logging
-from datetime import datetime, time
-from typing import Dict, List, Optional, Tuple
+from datetime import date, datetime
+from typing import Dict, Iterator, List, Optional, Tuple
 import json
 import threading
+from dataclasses import replace
+
+from src.database.config_snapshot import ConfigSnapshot, ScheduleConfig, days_to_mask
+from src.database.migrations import MigrationRunner
+from src.database import backup, maintenance, partitions
+from src.database.pool import ConnectionPool
+from src.database.roster import DailyRoster
+from src.database.storage import AttendanceStorage, ClockStatus, DailySummary, ScheduleMarkers
+from src.database.timecodes import day_number, epoch_seconds
+from src.database.users import UserCache, UserName
+from src.utils.helpers import get_current_time
 
 logger = logging.getLogger(__name__)
 
-class Database:
-    _connection_pool = {}
-    _lock = threading.Lock()
+class Database(AttendanceStorage):
+    """SQLite storage engine"""
+
+    # Hot read paths, kept here so verify_query_plans checks the exact SQL
+    # the handlers run. None of them may scan the attendance table.
+    TODAY_ATTENDANCE_QUERY = '''
+        SELECT user_id, clock_type, clock_ts
+        FROM attendance
+        WHERE chat_id = ? AND day_num = ?
+        ORDER BY clock_ts
+    '''
+    ATTENDED_USERS_QUERY = '''
+        SELECT user_id FROM attendance
+        WHERE chat_id = ? AND day_num = ? AND clock_type = ?
+    '''
+    ATTENDED_USER_QUERY = '''
+        SELECT 1 FROM attendance
+        WHERE chat_id = ? AND day_num = ? AND clock_type = ? AND user_id = ?
+    '''
+    CLOCK_QUERY = '''
+        INSERT OR IGNORE INTO attendance
+        (chat_id, user_id, clock_type, clock_ts, day_num)
+        SELECT ?, ?, ?, ?, ?
+        WHERE ? = 'in' OR EXISTS (
+            SELECT 1 FROM attendance
+            WHERE chat_id = ? AND day_num = ? AND clock_type = 'in' AND user_id = ?
+        )
+    '''
+    # Runs in clock_batch's transaction for every inserted row; MIN/MAX of a
+    # NULL are NULL, so COALESCE keeps whichever side is set
+    SUMMARY_UPSERT = '''
+        INSERT INTO daily_summary (chat_id, day_num, in_count, out_count, first_in, last_out)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (chat_id, day_num) DO UPDATE SET
+            in_count = in_count + excluded.in_count,
+            out_count = out_count + excluded.out_count,
+            first_in = COALESCE(MIN(first_in, excluded.first_in), first_in, excluded.first_in),
+            last_out = COALESCE(MAX(last_out, excluded.last_out), last_out, excluded.last_out)
+    '''
+    SUMMARY_QUERY = '''
+        SELECT in_count, out_count, first_in, last_out FROM daily_summary
+        WHERE chat_id = ? AND day_num = ?
+    '''
+    # Only writes when the name actually changed, so an unchanged name costs
+    # one primary key lookup and no page write
+    USER_UPSERT = '''
+        INSERT INTO users (user_id, user_name, username) VALUES (?, ?, ?)
+        ON CONFLICT (user_id) DO UPDATE SET
+            user_name = excluded.user_name,
+            username = excluded.username,
+            updated_at = CURRENT_TIMESTAMP
+        WHERE user_name IS NOT excluded.user_name OR username IS NOT excluded.username
+    '''
+
+    def __init__(self, db_path: str = "attendance.db", pool_size: int = 4,
+                 migration_batch_size: int = 1000, read_pool_size: int = 2,
+                 user_cache_size: int = 10000):
+        self.db_path = db_path
+        # Each Database owns its pools, so instances on different files never share connections
+        self._pool = ConnectionPool(db_path, max_size=pool_size)
+        # Reports and exports read through read-only connections, leaving the
+        # write connections free for clock-ins
+        self._read_pool = ConnectionPool(db_path, max_size=read_pool_size, read_only=True)
 
-    # Configuration cache
-    _config_cache = {}
-    _cache_timeout = 300  # 5 minutes in seconds
-    _last_cache_update = {}
+        # Today's attendance per chat, updated incrementally by record_attendance
+        self._rosters = {}  # chat_id -> DailyRoster
+        self._roster_date = None
+        self._roster_lock = threading.Lock()
 
-    def __init__(self, db_path: str = "attendance.db"):
-        self.db_path = db_path
-        self.init_database()
+        # Latest names of recently seen users; attendance rows only carry user_id
+        self._users = UserCache(user_cache_size)
 
-    def get_connection(self):
-        """Get a connection from the pool or create a new one"""
-        thread_id = threading.get_ident()
+        # Immutable snapshot of every configuration, swapped on each save
+        self._config_snapshot = ConfigSnapshot()
+        self._config_lock = threading.Lock()
 
-        with self._lock:
-            if thread_id not in self._connection_pool:
-                conn = sqlite3.connect(self.db_path)
-                # Enable foreign keys
-                conn.execute("PRAGMA foreign_keys = ON")
-                # Set journal mode to WAL for better concurrency
-                conn.execute("PRAGMA journal_mode = WAL")
-                # Set synchronous mode to NORMAL for better performance
-                conn.execute("PRAGMA synchronous = NORMAL")
-                self._connection_pool[thread_id] = conn
+        # Schema changes are versioned; index builds and backfills run in the background
+        self._migrations = MigrationRunner(batch_size=migration_batch_size)
+        self._online_migrations_pending = False
 
-            return self._connection_pool[thread_id]
+        # Months already moved out of the hot attendance table, oldest first
+        self._partition_months = []
+        # SELECTs over attendance tables a migration is still draining
+        self._legacy_sources = []
+
+        self.init_database()
+        if not self._online_migrations_pending:
+            self.verify_query_plans()
+        self.load_configurations()
+
+    def close(self):
+        """Close every pooled connection"""
+        self._pool.close_all()
+        self._read_pool.close_all()
 
     def init_database(self):
-        """Initialize database with required tables"""
+        """Bring the schema up to date, deferring slow steps to run_online_migration_step"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
+            with self._pool.connection() as conn:
+                applied = self._migrations.migrate(conn)
+                self._online_migrations_pending = self._migrations.has_online_work(conn)
+                self._partition_months = partitions.load_partitions(conn)
+                self._legacy_sources = self._load_legacy_sources(conn)
 
-                # Create attendance table
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS attendance (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        chat_id INTEGER NOT NULL,
-                        user_id INTEGER NOT NULL,
-                        user_name TEXT NOT NULL,
-                        username TEXT,
-                        clock_type TEXT NOT NULL, -- 'in' or 'out'
-                        clock_time DATETIME NOT NULL,
-                        date_only TEXT NOT NULL, -- YYYY-MM-DD format for unique constraint
-                        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                        UNIQUE(chat_id, user_id, clock_type, date_only)
-                    )
-                ''')
+            if applied:
+                logger.info(f"Database migrated to version {self._migrations.latest_version}")
+            logger.info("Database initialized successfully")
 
-                # Create indexes for attendance table
-                cursor.execute('CREATE INDEX IF NOT EXISTS idx_attendance_chat_date ON attendance(chat_id, date_only)')
-                cursor.execute('CREATE INDEX IF NOT EXISTS idx_attendance_user ON attendance(user_id)')
-                cursor.execute('CREATE INDEX IF NOT EXISTS idx_attendance_type ON attendance(clock_type)')
+        except Exception as e:
+            logger.error(f"Error initializing database: {e}")
+            raise
 
-                # Create configuration table
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS configurations (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        chat_id INTEGER NOT NULL,
-                        config_type TEXT NOT NULL, -- 'clock_in' or 'clock_out'
-                        start_time TEXT NOT NULL, -- HH:MM format
-                        end_time TEXT NOT NULL, -- HH:MM format
-                        reminder_interval INTEGER NOT NULL, -- minutes
-                        enabled_days TEXT NOT NULL, -- JSON array of days [0,1,2,3,4,5,6]
-                        is_active BOOLEAN DEFAULT 1,
-                        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                        UNIQUE(chat_id, config_type)
-                    )
-                ''')
+    def has_pending_migrations(self) -> bool:
+        """Check whether online migration steps are still waiting to run"""
+        return self._online_migrations_pending
 
-                # Create indexes for configurations table
-                cursor.execute('CREATE INDEX IF NOT EXISTS idx_config_chat ON configurations(chat_id)')
-                cursor.execute('CREATE INDEX IF NOT EXISTS idx_config_active ON configurations(is_active)')
+    def run_online_migration_step(self) -> bool:
+        """Run one online migration step or batch, returning True while work remains"""
+        try:
+            with self._pool.connection() as conn:
+                self._online_migrations_pending = self._migrations.run_online_step(conn)
+                self._legacy_sources = self._load_legacy_sources(conn)
+        except Exception as e:
+            logger.error(f"❌ Error running online migration step: {e}")
+            return False
 
-                # Create chat groups table
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS chat_groups (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        chat_id INTEGER UNIQUE NOT NULL,
-                        chat_title TEXT,
-                        chat_type TEXT,
-                        is_active BOOLEAN DEFAULT 1,
-                        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-                    )
-                ''')
+        if not self._online_migrations_pending:
+            self.verify_query_plans()
+        return self._online_migrations_pending
+
+    def _load_legacy_sources(self, conn: sqlite3.Connection) -> List[str]:
+        """SELECTs reading the tables a migration is still draining in the live layout"""
+        utc_offset = partitions.utc_offset()
+        return [
+            partitions.legacy_select(conn, table, utc_offset) for table in partitions.legacy_tables(conn)
+        ]
+
+    def archive_step(self, keep_months: int = 1, batch_size: int = 1000) -> Tuple[Optional[str], int]:
+        """Move one batch of the oldest closed month to its partition, returning (month, rows moved)"""
+        if self._online_migrations_pending:
+            # The archiver relies on the day_num index of the attendance table
+            logger.info("Skipping attendance archiving until online migrations finish")
+            return None, 0
+
+        cutoff = partitions.archive_cutoff(get_current_time().date(), keep_months)
+        try:
+            with self._pool.connection() as conn:
+                month, moved, self._partition_months = partitions.archive_batch(
+                    conn, cutoff, self._partition_months, batch_size
+                )
+                return month, moved
+        except Exception as e:
+            logger.error(f"❌ Error archiving attendance: {e}")
+            return None, 0
 
-                # Create index for chat_groups table
-                cursor.execute('CREATE INDEX IF NOT EXISTS idx_chat_groups_active ON chat_groups(is_active)')
+    def partition_tables(self, start: date, end: date) -> List[str]:
+        """Attendance tables holding rows dated between start and end inclusive"""
+        return partitions.partition_tables(self._partition_months, start, end)
 
-                conn.commit()
-                logger.info("Database initialized successfully")
+    def checkpoint(self) -> Dict:
+        """Checkpoint the WAL and truncate the -wal file"""
+        try:
+            with self._pool.connection() as conn:
+                return maintenance.checkpoint(conn)
+        except sqlite3.Error as e:
+            logger.error(f"❌ Error checkpointing WAL: {e}")
+            return {}
 
-        except Exception as e:
-            logger.error(f"Error initializing database: {e}")
-            raise
+    def optimize(self) -> Dict:
+        """Refresh query planner statistics"""
+        try:
+            with self._pool.connection() as conn:
+                return maintenance.optimize(conn)
+        except sqlite3.Error as e:
+            logger.error(f"❌ Error optimizing database: {e}")
+            return {}
+
+    def incremental_vacuum_step(self, pages: int = 1000) -> int:
+        """Reclaim up to pages free pages, returning how many were reclaimed"""
+        try:
+            with self._pool.connection() as conn:
+                return maintenance.incremental_vacuum_step(conn, pages)
+        except sqlite3.Error as e:
+            logger.error(f"❌ Error running incremental vacuum: {e}")
+            return 0
+
+    def full_vacuum(self) -> Dict:
+        """Rebuild the database file, enabling incremental vacuum for later runs"""
+        with self._pool.connection() as conn:
+            return maintenance.full_vacuum(conn)
+
+    def backup(self, backup_dir: str, keep: int = 7, pages: int = 256, sleep: float = 0.01) -> Dict:
+        """Write a compressed online backup, reading through the read-only pool"""
+        with self._read_pool.connection() as conn:
+            return backup.backup_database(conn, backup_dir, keep=keep, pages=pages, sleep=sleep)
+
+    def verify_query_plans(self) -> bool:
+        """Check with EXPLAIN QUERY PLAN that the daily read paths use an index"""
+        hot_queries = {
+            'get_today_attendance': (self.TODAY_ATTENDANCE_QUERY, (0, 0)),
+            'get_members_without_attendance': (self.ATTENDED_USERS_QUERY, (0, 0, 'in')),
+            'clock': (self.CLOCK_QUERY, (0, 0, 'out', 0, 0, 'out', 0, 0, 0)),
+        }
+
+        all_indexed = True
+        try:
+            with self._pool.connection() as conn:
+                for name, (query, params) in hot_queries.items():
+                    plan = conn.execute(f"EXPLAIN QUERY PLAN {query}", params).fetchall()
+                    details = [row[-1] for row in plan]
+
+                    # A full scan shows up as 'SCAN attendance' (or 'SCAN TABLE attendance'
+                    # on older SQLite); index lookups are reported as 'SEARCH ... USING'
+                    if any(detail.startswith('SCAN') and 'attendance' in detail for detail in details):
+                        logger.warning(f"⚠️ Query plan for {name} scans attendance: {details}")
+                        all_indexed = False
+                    else:
+                        logger.debug(f"Query plan for {name}: {details}")
+        except sqlite3.Error as e:
+            logger.error(f"Database error verifying query plans: {e}")
+            return False
+
+        return all_indexed
 
     def add_chat_group(self, chat_id: int, chat_title: str, chat_type: str):
         """Add a chat group to the database"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._pool.connection() as conn:
                 cursor = conn.cursor()
 
                 # Check if chat group already exists
@@ -144,61 +279,104 @@ class Database:
             logger.error(f"❌ Error adding chat group to database: {e}")
             return False
 
-    def record_attendance(self, chat_id: int, user_id: int, user_name: str, 
-                         username: str, clock_type: str, clock_time: datetime):
-        """Record attendance in the database"""
+    def clock_batch(self, records: List[Tuple]) -> List[ClockStatus]:
+        """Clock several users in one transaction, returning a status per record"""
+        if not records:
+            return []
+
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO attendance 
-                (chat_id, user_id, user_name, username, clock_type, clock_time, date_only)
-                VALUES (?, ?, ?, ?, ?, ?, DATE(?))
-            ''', (chat_id, user_id, user_name, username, clock_type, clock_time, clock_time))
-            conn.commit()
-            logger.info(f"✅ Attendance recorded: Chat={chat_id}, User={user_name}({user_id}), Type={clock_type}, Time={clock_time}")
-            return True
-        except sqlite3.IntegrityError as e:
-            # Handle unique constraint violation (user already clocked in/out today)
-            logger.warning(f"⚠️ User already recorded attendance: Chat={chat_id}, User={user_name}({user_id}), Type={clock_type}")
-            return False
+            with self._pool.connection() as conn:
+                cursor = conn.cursor()
+                results = []
+                inserted = []
+                renamed = {}
+
+                for chat_id, user_id, user_name, username, clock_type, clock_time, day in records:
+                    # day_num is a local calendar day, normally that of clock_time;
+                    # deriving it from the UTC epoch would file early clock-ins under yesterday
+                    clock_ts = epoch_seconds(clock_time)
+                    day_num = day_number(day)
+
+                    # Names are stored once per user, and only written when they change
+                    if self._users.get(user_id) != (user_name, username):
+                        cursor.execute(self.USER_UPSERT, (user_id, user_name, username))
+                        renamed[user_id] = (user_name, username)
+
+                    # Clock out only inserts when today's clock in exists, and OR IGNORE
+                    # turns the unique constraint (already clocked in/out today) into a
+                    # zero rowcount, so two fast taps can't race into an IntegrityError
+                    cursor.execute(self.CLOCK_QUERY, (
+                        chat_id, user_id, clock_type, clock_ts, day_num,
+                        clock_type, chat_id, day_num, user_id
+                    ))
+
+                    if cursor.rowcount == 1:
+                        is_in = clock_type == 'in'
+                        cursor.execute(self.SUMMARY_UPSERT, (
+                            chat_id, day_num, int(is_in), int(not is_in),
+                            clock_ts if is_in else None, None if is_in else clock_ts
+                        ))
+                        logger.info(f"✅ Attendance recorded: Chat={chat_id}, User={user_name}({user_id}), Type={clock_type}, Time={clock_time}")
+                        results.append(ClockStatus.INSERTED)
+                        inserted.append((chat_id, user_id, clock_type, clock_ts, day_num))
+                        continue
+
+                    # Nothing inserted: a clock out is either a duplicate or lacks a clock in
+                    if clock_type == 'out':
+                        cursor.execute(self.ATTENDED_USER_QUERY, (chat_id, day_num, 'out', user_id))
+                        if cursor.fetchone() is None:
+                            logger.warning(f"⚠️ User has not clocked in yet: Chat={chat_id}, User={user_name}({user_id})")
+                            results.append(ClockStatus.NOT_CLOCKED_IN)
+                            continue
+
+                    logger.warning(f"⚠️ User already recorded attendance: Chat={chat_id}, User={user_name}({user_id}), Type={clock_type}")
+                    results.append(ClockStatus.ALREADY_CLOCKED)
+
+                conn.commit()
+
+                # Only committed rows reach the in-memory caches
+                for user_id, (user_name, username) in renamed.items():
+                    self._users.put(user_id, user_name, username)
+                with self._roster_lock:
+                    for chat_id, user_id, clock_type, clock_ts, day_num in inserted:
+                        roster = self._rosters.get(chat_id)
+                        if roster is not None and roster.day_num == day_num:
+                            roster.add(user_id, clock_type, clock_ts)
+
+                return results
         except Exception as e:
+            # The pool rolls back the open transaction when the connection is returned
             logger.error(f"❌ Error recording attendance: {e}")
-            return False
+            return [ClockStatus.FAILED] * len(records)
 
     def get_today_attendance(self, chat_id: int, date: datetime) -> Dict:
         """Get attendance for a specific date"""
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            date_str = date.strftime('%Y-%m-%d')
-
-            cursor.execute('''
-                SELECT user_id, user_name, username, clock_type, clock_time
-                FROM attendance 
-                WHERE chat_id = ? AND DATE(clock_time) = ?
-                ORDER BY clock_time
-            ''', (chat_id, date_str))
-
-            results = cursor.fetchall()
-            attendance = {'clock_in': {}, 'clock_out': {}}
-
-            for row in results:
-                user_id, user_name, username, clock_type, clock_time = row
-                if clock_type == 'in':
-                    attendance['clock_in'][str(user_id)] = {
-                        'name': user_name,
-                        'username': username,
-                        'time': clock_time
-                    }
-                else:
-                    attendance['clock_out'][str(user_id)] = {
-                        'name': user_name,
-                        'username': username,
-                        'time': clock_time
-                    }
-
-            return attendance
+            with self._pool.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(self.TODAY_ATTENDANCE_QUERY, (chat_id, day_number(date)))
+
+                results = cursor.fetchall()
+                names = self._get_user_names(conn, {row[0] for row in results})
+                attendance = {'clock_in': {}, 'clock_out': {}}
+
+                for row in results:
+                    user_id, clock_type, clock_ts = row
+                    user_name, username = names.get(user_id, ('Unknown', None))
+                    if clock_type == 'in':
+                        attendance['clock_in'][str(user_id)] = {
+                            'name': user_name,
+                            'username': username,
+                            'time': clock_ts
+                        }
+                    else:
+                        attendance['clock_out'][str(user_id)] = {
+                            'name': user_name,
+                            'username': username,
+                            'time': clock_ts
+                        }
+
+                return attendance
         except sqlite3.Error as e:
             logger.error(f"Database error getting today's attendance: {e}")
             return {'clock_in': {}, 'clock_out': {}}
@@ -206,58 +384,238 @@ class Database:
             logger.error(f"Error getting today's attendance: {e}")
             return {'clock_in': {}, 'clock_out': {}}
 
-    def save_configuration(self, chat_id: int, config_type: str, start_time: str, 
-                          end_time: str, reminder_interval: int, enabled_days: List[int]):
-        """Save clock in/out configuration and invalidate cache"""
+    def _get_user_names(self, conn: sqlite3.Connection, user_ids) -> Dict[int, UserName]:
+        """Get the latest names of users, reading only cache misses from the users table"""
+        names = {}
+        missing = []
+        for user_id in user_ids:
+            name = self._users.get(user_id)
+            if name is None:
+                missing.append(user_id)
+            else:
+                names[user_id] = name
+
+        # Chunked to stay under SQLite's bound parameter limit
+        for offset in range(0, len(missing), 500):
+            chunk = missing[offset:offset + 500]
+            placeholders = ', '.join('?' * len(chunk))
+            for user_id, user_name, username in conn.execute(
+                f'SELECT user_id, user_name, username FROM users WHERE user_id IN ({placeholders})',
+                chunk
+            ):
+                self._users.put(user_id, user_name, username)
+                names[user_id] = (user_name, username)
+
+        return names
+
+    def get_user_names(self, user_ids: List[int]) -> Dict[int, UserName]:
+        """Get the latest (user_name, username) of users by Telegram user id"""
+        try:
+            with self._pool.connection() as conn:
+                return self._get_user_names(conn, user_ids)
+        except sqlite3.Error as e:
+            logger.error(f"Database error getting user names: {e}")
+            return {}
+
+    def get_daily_summary(self, chat_id: int, date: datetime) -> DailySummary:
+        """Get a chat's attendance counts for a date with a single-row lookup"""
+        day_num = day_number(date)
+        try:
+            with self._pool.connection() as conn:
+                row = conn.execute(self.SUMMARY_QUERY, (chat_id, day_num)).fetchone()
+        except sqlite3.Error as e:
+            logger.error(f"Database error getting daily summary: {e}")
+            row = None
+
+        if row is None:
+            return DailySummary(chat_id, day_num)
+        return DailySummary(chat_id, day_num, *row)
+
+    def backfill_daily_summary(self) -> int:
+        """Rebuild daily_summary for past days from every partition, one chat per transaction"""
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
+            with self._pool.connection() as conn:
+                chat_ids = [row[0] for row in conn.execute(
+                    f'SELECT DISTINCT chat_id FROM {partitions.HISTORY_VIEW}'
+                )]
+
+                # Days from yesterday on are maintained live by clock_batch
+                # and were seeded by the migration, so they are left alone
+                before_day = day_number(get_current_time().date()) - 1
+                total = 0
+                for chat_id in chat_ids:
+                    cursor = conn.execute(f'''
+                        INSERT INTO daily_summary
+                        (chat_id, day_num, in_count, out_count, first_in, last_out)
+                        SELECT chat_id, day_num,
+                               SUM(clock_type = 'in'), SUM(clock_type = 'out'),
+                               MIN(CASE WHEN clock_type = 'in' THEN clock_ts END),
+                               MAX(CASE WHEN clock_type = 'out' THEN clock_ts END)
+                        FROM {partitions.HISTORY_VIEW}
+                        WHERE chat_id = ? AND day_num < ?
+                        GROUP BY chat_id, day_num
+                        ON CONFLICT (chat_id, day_num) DO UPDATE SET
+                            in_count = excluded.in_count,
+                            out_count = excluded.out_count,
+                            first_in = excluded.first_in,
+                            last_out = excluded.last_out
+                    ''', (chat_id, before_day))
+                    total += cursor.rowcount
+                    conn.commit()
+
+                logger.info(f"Backfilled {total} daily summaries for {len(chat_ids)} chats")
+                return total
+        except Exception as e:
+            logger.error(f"❌ Error backfilling daily summary: {e}")
+            raise
+
+    def iter_attendance_report(self, chat_id: int, start: date, end: date,
+                               utc_offset: int = 0, fetch_size: int = 500) -> Iterator[Tuple]:
+        """Yield per-user attendance totals for a date range, one page of fetch_size users at a time.
+
+        Rows are (user_id, user_name, in_days, out_days, earliest_in, latest_in),
+        aggregated in SQL over every partition the range touches and joined to
+        each user's latest name; clock-in times are HH:MM at utc_offset seconds
+        from UTC. The whole report is read in one transaction on a dedicated
+        read-only connection, so every page comes from the same snapshot and
+        a slow consumer never holds a pooled connection. Database errors
+        propagate.
+        """
+        # Rows a migration has not moved into the live tables yet carry their own names
+        sources = [(table, 'NULL') for table in self.partition_tables(start, end)]
+        sources.extend((f'({select})', 'legacy_name') for select in self._legacy_sources)
+        union = ' UNION ALL '.join(
+            f'SELECT user_id, clock_type, clock_ts, {name} AS legacy_name FROM {source} '
+            f'WHERE chat_id = ? AND day_num BETWEEN ? AND ?'
+            for source, name in sources
+        )
+        query = f'''
+            SELECT t.user_id, COALESCE(u.user_name, MAX(t.legacy_name), 'Unknown') AS name,
+                   SUM(t.clock_type = 'in'), SUM(t.clock_type = 'out'),
+                   strftime('%H:%M', MIN(CASE WHEN t.clock_type = 'in' THEN (t.clock_ts + ?) % 86400 END), 'unixepoch'),
+                   strftime('%H:%M', MAX(CASE WHEN t.clock_type = 'in' THEN (t.clock_ts + ?) % 86400 END), 'unixepoch')
+            FROM ({union}) AS t
+            LEFT JOIN users AS u ON u.user_id = t.user_id
+            GROUP BY t.user_id
+            ORDER BY name COLLATE NOCASE, t.user_id
+        '''
+        params = (utc_offset, utc_offset) + (chat_id, day_number(start), day_number(end)) * len(sources)
 
-            # Check if configuration already exists
-            cursor.execute('''
-                SELECT id FROM configurations 
-                WHERE chat_id = ? AND config_type = ?
-            ''', (chat_id, config_type))
+        try:
+            with self._read_pool.dedicated_connection() as conn:
+                conn.execute('BEGIN')
+                cursor = conn.execute(query, params)
+                while True:
+                    rows = cursor.fetchmany(fetch_size)
+                    if not rows:
+                        break
+                    yield from rows
+        except sqlite3.Error as e:
+            logger.error(f"Database error building attendance report: {e}")
+            raise
 
-            existing = cursor.fetchone()
+    def read_query(self, sql: str, params: Tuple = ()) -> List[Tuple]:
+        """Run an ad-hoc read-only query on a snapshot connection, returning every row"""
+        with self._read_pool.connection() as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def peek_roster(self, chat_id: int, date: datetime) -> Optional[DailyRoster]:
+        """Get a chat's roster for a date if it is already in memory"""
+        roster = self._rosters.get(chat_id)
+        if roster is not None and roster.day_num == day_number(date):
+            return roster
+        return None
+
+    def get_roster(self, chat_id: int, date: datetime) -> DailyRoster:
+        """Get a chat's attendance roster for a date, loading it from the database once"""
+        roster = self.peek_roster(chat_id, date)
+        if roster is not None:
+            return roster
+
+        day_num = day_number(date)
+        roster = DailyRoster(chat_id, day_num)
+        # Loading under the lock orders it against clock_batch, which adds its
+        # rows to cached rosters under the same lock after committing: a row
+        # committed after this read is added once the roster is cached
+        with self._roster_lock:
+            cached = self.peek_roster(chat_id, date)
+            if cached is not None:
+                return cached
+
+            try:
+                with self._pool.connection() as conn:
+                    cursor = conn.cursor()
+                    cursor.execute(self.TODAY_ATTENDANCE_QUERY, (chat_id, day_num))
+
+                    for user_id, clock_type, clock_ts in cursor.fetchall():
+                        roster.add(user_id, clock_type, clock_ts)
+            except sqlite3.Error as e:
+                # Don't cache a roster we couldn't load completely
+                logger.error(f"Database error loading attendance roster: {e}")
+                return roster
+
+            # Roll over at local midnight: the first roster of a new day drops
+            # every roster of the previous one
+            if self._roster_date != day_num:
+                self._rosters.clear()
+                self._roster_date = day_num
+
+            self._rosters[chat_id] = roster
+            return roster
 
-            if existing:
-                # Update existing configuration
-                enabled_days_json = json.dumps(enabled_days)
+    def save_configuration(self, chat_id: int, config_type: str, start_time: str, 
+                          end_time: str, reminder_interval: int, enabled_days: List[int]):
+        """Save clock in/out configuration and publish a new configuration snapshot"""
+        try:
+            config = ScheduleConfig(
+                chat_id=chat_id,
+                config_type=config_type,
+                start_time=self._parse_time(start_time),
+                end_time=self._parse_time(end_time),
+                reminder_interval=reminder_interval,
+                enabled_days_mask=days_to_mask(enabled_days)
+            )
+
+            with self._pool.connection() as conn:
+                cursor = conn.cursor()
+
+                # Check if configuration already exists
                 cursor.execute('''
-                    UPDATE configurations 
-                    SET start_time = ?, end_time = ?, reminder_interval = ?, 
-                        enabled_days = ?, updated_at = CURRENT_TIMESTAMP
+                    SELECT id FROM configurations 
                     WHERE chat_id = ? AND config_type = ?
-                ''', (start_time, end_time, reminder_interval, enabled_days_json, chat_id, config_type))
-                logger.info(f"✅ Configuration updated: Chat={chat_id}, Type={config_type}, Time={start_time}-{end_time}, Interval={reminder_interval}min, Days={enabled_days}")
-            else:
-                # Insert new configuration
-                enabled_days_json = json.dumps(enabled_days)
-                cursor.execute('''
-                    INSERT INTO configurations 
-                    (chat_id, config_type, start_time, end_time, reminder_interval, 
-                     enabled_days, updated_at)
-                    VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-                ''', (chat_id, config_type, start_time, end_time, reminder_interval, enabled_days_json))
-                logger.info(f"✅ Configuration created: Chat={chat_id}, Type={config_type}, Time={start_time}-{end_time}, Interval={reminder_interval}min, Days={enabled_days}")
-
-            conn.commit()
-
-            # Invalidate cache for this configuration and all active configurations
-            with self._lock:
-                # Remove specific configuration from cache
-                cache_key = f"{chat_id}_{config_type}"
-                if cache_key in self._config_cache:
-                    del self._config_cache[cache_key]
-                    if cache_key in self._last_cache_update:
-                        del self._last_cache_update[cache_key]
-
-                # Remove all active configurations from cache
-                if "all_active_configs" in self._config_cache:
-                    del self._config_cache["all_active_configs"]
-                    if "all_active_configs" in self._last_cache_update:
-                        del self._last_cache_update["all_active_configs"]
+                ''', (chat_id, config_type))
+
+                existing = cursor.fetchone()
+
+                if existing:
+                    # Update existing configuration
+                    enabled_days_json = json.dumps(enabled_days)
+                    cursor.execute('''
+                        UPDATE configurations 
+                        SET start_time = ?, end_time = ?, reminder_interval = ?, 
+                            enabled_days = ?, updated_at = CURRENT_TIMESTAMP
+                        WHERE chat_id = ? AND config_type = ?
+                    ''', (start_time, end_time, reminder_interval, enabled_days_json, chat_id, config_type))
+                    logger.info(f"✅ Configuration updated: Chat={chat_id}, Type={config_type}, Time={start_time}-{end_time}, Interval={reminder_interval}min, Days={enabled_days}")
+                else:
+                    # Insert new configuration
+                    enabled_days_json = json.dumps(enabled_days)
+                    cursor.execute('''
+                        INSERT INTO configurations 
+                        (chat_id, config_type, start_time, end_time, reminder_interval, 
+                         enabled_days, updated_at)
+                        VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                    ''', (chat_id, config_type, start_time, end_time, reminder_interval, enabled_days_json))
+                    logger.info(f"✅ Configuration created: Chat={chat_id}, Type={config_type}, Time={start_time}-{end_time}, Interval={reminder_interval}min, Days={enabled_days}")
+
+                conn.commit()
+
+            # Swap in a new snapshot; readers keep whichever snapshot they already hold
+            with self._config_lock:
+                current = self._config_snapshot.get(chat_id, config_type)
+                if current is not None and not current.is_active:
+                    config = replace(config, is_active=False)
+                self._config_snapshot = self._config_snapshot.with_config(config)
 
             return True
 
@@ -268,131 +626,88 @@ class Database:
             logger.error(f"❌ Error saving configuration: {e}")
             return False
 
-    def get_configuration(self, chat_id: int, config_type: str) -> Optional[Dict]:
-        """Get configuration for a chat and type with caching"""
-        import time
-
-        # Create a cache key
-        cache_key = f"{chat_id}_{config_type}"
-
-        # Check if we have a valid cached configuration
-        current_time = time.time()
-        with self._lock:
-            if (cache_key in self._config_cache and 
-                current_time - self._last_cache_update.get(cache_key, 0) < self._cache_timeout):
-                logger.debug(f"Using cached configuration for {cache_key}")
-                return self._config_cache[cache_key]
-
-        # If not in cache or expired, get from database
+    def load_configurations(self) -> ConfigSnapshot:
+        """Load every configuration into a fresh snapshot and publish it"""
+        configs = {}
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT start_time, end_time, reminder_interval, enabled_days, is_active
-                FROM configurations 
-                WHERE chat_id = ? AND config_type = ?
-            ''', (chat_id, config_type))
-
-            result = cursor.fetchone()
-            if result:
-                start_time, end_time, reminder_interval, enabled_days_json, is_active = result
-                config = {
-                    'config_type': config_type,
-                    'start_time': start_time,
-                    'end_time': end_time,
-                    'reminder_interval': reminder_interval,
-                    'enabled_days': json.loads(enabled_days_json),
-                    'is_active': bool(is_active)
-                }
+            with self._pool.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT chat_id, config_type, start_time, end_time,
+                           reminder_interval, enabled_days, is_active
+                    FROM configurations
+                ''')
 
-                # Update cache
-                with self._lock:
-                    self._config_cache[cache_key] = config
-                    self._last_cache_update[cache_key] = current_time
+                for row in cursor.fetchall():
+                    chat_id, config_type, start_time, end_time, reminder_interval, enabled_days_json, is_active = row
+                    try:
+                        configs[(chat_id, config_type)] = ScheduleConfig(
+                            chat_id=chat_id,
+                            config_type=config_type,
+                            start_time=self._parse_time(start_time),
+                            end_time=self._parse_time(end_time),
+                            reminder_interval=reminder_interval,
+                            enabled_days_mask=days_to_mask(json.loads(enabled_days_json)),
+                            is_active=bool(is_active)
+                        )
+                    except (ValueError, TypeError) as e:
+                        logger.warning(f"⚠️ Skipping invalid configuration: Chat={chat_id}, Type={config_type}: {e}")
 
-                return config
+        except sqlite3.Error as e:
+            logger.error(f"Database error loading configurations: {e}")
+            return self._config_snapshot
 
-            # If no configuration found, cache None result too to avoid repeated lookups
-            with self._lock:
-                self._config_cache[cache_key] = None
-                self._last_cache_update[cache_key] = current_time
+        snapshot = ConfigSnapshot(configs)
+        with self._config_lock:
+            self._config_snapshot = snapshot
 
-            return None
+        logger.info(f"Loaded {len(snapshot)} configurations")
+        return snapshot
 
-        except sqlite3.Error as e:
-            logger.error(f"Database error getting configuration: {e}")
-            return None
-        except Exception as e:
-            logger.error(f"Error getting configuration: {e}")
-            return None
+    def get_configuration(self, chat_id: int, config_type: str) -> Optional[ScheduleConfig]:
+        """Get configuration for a chat and type from the in-memory snapshot"""
+        return self._config_snapshot.get(chat_id, config_type)
 
-    def get_all_active_configurations(self) -> List[Dict]:
-        """Get all active configurations with caching"""
-        import time
+    def get_all_active_configurations(self) -> List[ScheduleConfig]:
+        """Get all active configurations from the in-memory snapshot"""
+        return list(self._config_snapshot.active())
 
-        # Cache key for all active configurations
-        cache_key = "all_active_configs"
+    MARKER_UPSERT = '''
+        INSERT INTO schedule_markers (chat_id, config_type, last_fired) VALUES (?, ?, ?)
+        ON CONFLICT (chat_id, config_type) DO UPDATE SET
+            last_fired = MAX(last_fired, excluded.last_fired)
+    '''
 
-        # Check if we have a valid cached result
-        current_time = time.time()
-        with self._lock:
-            if (cache_key in self._config_cache and 
-                current_time - self._last_cache_update.get(cache_key, 0) < self._cache_timeout):
-                logger.debug("Using cached active configurations")
-                return self._config_cache[cache_key]
+    def save_schedule_markers(self, last_tick: int, fired: List[Tuple[int, str, int]]) -> bool:
+        """Record the dispatcher's last tick and last-fired markers in one transaction"""
+        try:
+            with self._pool.connection() as conn:
+                conn.executemany(self.MARKER_UPSERT, fired)
+                conn.execute('''
+                    INSERT INTO scheduler_state (name, value) VALUES ('last_tick', ?)
+                    ON CONFLICT (name) DO UPDATE SET value = MAX(value, excluded.value)
+                ''', (last_tick,))
+                conn.commit()
+            return True
+        except sqlite3.Error as e:
+            logger.error(f"❌ Database error saving schedule markers: {e}")
+            return False
 
-        # If not in cache or expired, get from database
+    def get_schedule_markers(self) -> Tuple[Optional[int], ScheduleMarkers]:
+        """Load the dispatcher's last tick and every last-fired marker"""
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT chat_id, config_type, start_time, end_time, 
-                       reminder_interval, enabled_days
-                FROM configurations 
-                WHERE is_active = 1
-            ''')
-
-            results = cursor.fetchall()
-            configurations = []
-
-            for row in results:
-                chat_id, config_type, start_time, end_time, reminder_interval, enabled_days_json = row
-                config = {
-                    'chat_id': chat_id,
-                    'config_type': config_type,
-                    'start_time': start_time,
-                    'end_time': end_time,
-                    'reminder_interval': reminder_interval,
-                    'enabled_days': json.loads(enabled_days_json)
+            with self._pool.connection() as conn:
+                row = conn.execute("SELECT value FROM scheduler_state WHERE name = 'last_tick'").fetchone()
+                markers = {
+                    (chat_id, config_type): last_fired
+                    for chat_id, config_type, last_fired in conn.execute(
+                        'SELECT chat_id, config_type, last_fired FROM schedule_markers'
+                    )
                 }
-                configurations.append(config)
-
-                # Also update individual configuration cache
-                individual_cache_key = f"{chat_id}_{config_type}"
-                with self._lock:
-                    self._config_cache[individual_cache_key] = {
-                        'config_type': config_type,
-                        'start_time': start_time,
-                        'end_time': end_time,
-                        'reminder_interval': reminder_interval,
-                        'enabled_days': json.loads(enabled_days_json),
-                        'is_active': True
-                    }
-                    self._last_cache_update[individual_cache_key] = current_time
-
-            # Update cache for all configurations
-            with self._lock:
-                self._config_cache[cache_key] = configurations
-                self._last_cache_update[cache_key] = current_time
-
-            return configurations
-
+            return (row[0] if row else None), markers
         except sqlite3.Error as e:
-            logger.error(f"Database error getting all configurations: {e}")
-            return []
-        except Exception as e:
-            logger.error(f"Error getting all configurations: {e}")
-            return []
+            logger.error(f"Database error loading schedule markers: {e}")
+            return None, {}
 
     def get_members_without_attendance(self, chat_id: int, clock_type: str, 
                                      date: datetime, member_ids: List[int]) -> List[int]:
@@ -401,17 +716,14 @@ class Database:
             return []
 
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            date_str = date.strftime('%Y-%m-%d')
+            with self._pool.connection() as conn:
+                cursor = conn.cursor()
+                day_num = day_number(date)
 
-            cursor.execute('''
-                SELECT user_id FROM attendance 
-                WHERE chat_id = ? AND clock_type = ? AND DATE(clock_time) = ?
-            ''', (chat_id, clock_type, date_str))
+                cursor.execute(self.ATTENDED_USERS_QUERY, (chat_id, day_num, clock_type))
 
-            attended_user_ids = {row[0] for row in cursor.fetchall()}
-            return [user_id for user_id in member_ids if user_id not in attended_user_ids]
+                attended_user_ids = {row[0] for row in cursor.fetchall()}
+                return [user_id for user_id in member_ids if user_id not in attended_user_ids]
 
         except sqlite3.Error as e:
             logger.error(f"Database error getting members without attendance: {e}")
@@ -423,27 +735,27 @@ class Database:
     def get_all_chat_groups(self):
         """Get all chat groups"""
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT chat_id, chat_title, chat_type, created_at
-                FROM chat_groups
-                WHERE is_active = 1
-                ORDER BY created_at DESC
-            """)
-
-            rows = cursor.fetchall()
-            chat_groups = []
-
-            for row in rows:
-                chat_groups.append({
-                    'chat_id': row[0],
-                    'chat_title': row[1],
-                    'chat_type': row[2],
-                    'created_at': row[3]
-                })
-
-            return chat_groups
+            with self._pool.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    SELECT chat_id, chat_title, chat_type, created_at
+                    FROM chat_groups
+                    WHERE is_active = 1
+                    ORDER BY created_at DESC
+                """)
+
+                rows = cursor.fetchall()
+                chat_groups = []
+
+                for row in rows:
+                    chat_groups.append({
+                        'chat_id': row[0],
+                        'chat_title': row[1],
+                        'chat_type': row[2],
+                        'created_at': row[3]
+                    })
+
+                return chat_groups
 
         except sqlite3.Error as e:
             logger.error(f"Database error getting all chat groups: {e}")
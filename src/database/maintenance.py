@@ -0,0 +1,71 @@
+import sqlite3
+import logging
+import time
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+AUTO_VACUUM_INCREMENTAL = 2
+
+def checkpoint(conn: sqlite3.Connection) -> Dict:
+    """Copy the WAL into the database and truncate the -wal file"""
+    started = time.monotonic()
+    busy, wal_pages, checkpointed = conn.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchone()
+    return {
+        'busy': bool(busy),  # a reader kept the WAL from being truncated
+        'wal_pages': wal_pages,
+        'checkpointed_pages': checkpointed,
+        'seconds': time.monotonic() - started
+    }
+
+def optimize(conn: sqlite3.Connection) -> Dict:
+    """Refresh planner statistics, running a full ANALYZE only the first time"""
+    started = time.monotonic()
+    has_stats = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'"
+    ).fetchone() is not None
+
+    if has_stats:
+        # Re-analyzes only the tables whose statistics have drifted
+        conn.execute('PRAGMA optimize')
+    else:
+        conn.execute('ANALYZE')
+    conn.commit()
+
+    return {
+        'analyzed': not has_stats,
+        'seconds': time.monotonic() - started
+    }
+
+def free_pages(conn: sqlite3.Connection) -> int:
+    """Pages on the freelist, i.e. reclaimable by a vacuum"""
+    return conn.execute('PRAGMA freelist_count').fetchone()[0]
+
+def incremental_vacuum_step(conn: sqlite3.Connection, pages: int) -> int:
+    """Return up to pages free pages to the filesystem, returning how many were reclaimed.
+
+    Only works when auto_vacuum is INCREMENTAL; databases created before that
+    setting need a one-off `python manage.py vacuum`.
+    """
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != AUTO_VACUUM_INCREMENTAL:
+        return 0
+
+    before = free_pages(conn)
+    if not before:
+        return 0
+    # execute() steps incremental_vacuum only once (one page); executescript
+    # steps it to completion and commits
+    conn.executescript(f'PRAGMA incremental_vacuum({int(pages)});')
+    return before - free_pages(conn)
+
+def full_vacuum(conn: sqlite3.Connection) -> Dict:
+    """Rebuild the file and switch it to incremental auto_vacuum; blocks all writers"""
+    started = time.monotonic()
+    before = conn.execute('PRAGMA page_count').fetchone()[0]
+    conn.execute(f'PRAGMA auto_vacuum = {AUTO_VACUUM_INCREMENTAL}')
+    conn.execute('VACUUM')
+    after = conn.execute('PRAGMA page_count').fetchone()[0]
+    return {
+        'reclaimed_pages': max(before - after, 0),
+        'seconds': time.monotonic() - started
+    }
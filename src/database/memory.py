@@ -0,0 +1,199 @@
+import logging
+import string
+import threading
+from dataclasses import replace
+from datetime import date, datetime, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from src.database.config_snapshot import ConfigSnapshot, ScheduleConfig, days_to_mask
+from src.database.roster import DailyRoster
+from src.database.storage import AttendanceStorage, ClockStatus, DailySummary, ScheduleMarkers
+from src.database.timecodes import day_number, epoch_seconds
+from src.database.users import UserName
+
+logger = logging.getLogger(__name__)
+
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+class MemoryStorage(AttendanceStorage):
+    """Storage engine keeping everything in process memory.
+
+    Nothing survives a restart; meant for benchmarks, tests and trying the
+    bot out without a database file.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (chat_id, day_num) -> {(user_id, clock_type): clock_ts}, in insertion order
+        self._days = {}
+        self._users = {}  # user_id -> (user_name, username)
+        self._chat_groups = {}  # chat_id -> chat group dict
+        self._config_snapshot = ConfigSnapshot()
+        self._last_tick = None  # last dispatched minute since the epoch
+        self._markers = {}  # (chat_id, config_type) -> last fired minute since the epoch
+
+    def close(self):
+        """Nothing to release"""
+
+    def add_chat_group(self, chat_id: int, chat_title: str, chat_type: str) -> bool:
+        """Add or update a chat group"""
+        with self._lock:
+            group = self._chat_groups.get(chat_id)
+            if group is None:
+                self._chat_groups[chat_id] = {
+                    'chat_id': chat_id,
+                    'chat_title': chat_title,
+                    'chat_type': chat_type,
+                    'created_at': datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+                }
+            else:
+                group.update(chat_title=chat_title, chat_type=chat_type)
+        return True
+
+    def get_all_chat_groups(self) -> List[Dict]:
+        """Get all chat groups, newest first"""
+        with self._lock:
+            groups = [dict(group) for group in self._chat_groups.values()]
+        return list(reversed(groups))
+
+    def clock_batch(self, records: List[Tuple]) -> List[ClockStatus]:
+        """Clock several users, returning a status per record"""
+        results = []
+        with self._lock:
+            for chat_id, user_id, user_name, username, clock_type, clock_time, filed_day in records:
+                self._users[user_id] = (user_name, username)
+                day = self._days.setdefault((chat_id, day_number(filed_day)), {})
+                if (user_id, clock_type) in day:
+                    results.append(ClockStatus.ALREADY_CLOCKED)
+                elif clock_type == 'out' and (user_id, 'in') not in day:
+                    results.append(ClockStatus.NOT_CLOCKED_IN)
+                else:
+                    day[(user_id, clock_type)] = epoch_seconds(clock_time)
+                    results.append(ClockStatus.INSERTED)
+        return results
+
+    def get_today_attendance(self, chat_id: int, date: datetime) -> Dict:
+        """Get attendance for a specific date"""
+        attendance = {'clock_in': {}, 'clock_out': {}}
+        with self._lock:
+            day = dict(self._days.get((chat_id, day_number(date)), {}))
+            for (user_id, clock_type), clock_ts in sorted(day.items(), key=lambda item: item[1]):
+                user_name, username = self._users.get(user_id, ('Unknown', None))
+                key = 'clock_in' if clock_type == 'in' else 'clock_out'
+                attendance[key][str(user_id)] = {
+                    'name': user_name,
+                    'username': username,
+                    'time': clock_ts
+                }
+        return attendance
+
+    def get_user_names(self, user_ids: List[int]) -> Dict[int, UserName]:
+        """Get the latest (user_name, username) of users"""
+        with self._lock:
+            return {user_id: self._users[user_id] for user_id in user_ids if user_id in self._users}
+
+    def get_daily_summary(self, chat_id: int, date: datetime) -> DailySummary:
+        """Get a chat's attendance counts for a date"""
+        day_num = day_number(date)
+        with self._lock:
+            day = self._days.get((chat_id, day_num), {})
+            ins = [clock_ts for (_, clock_type), clock_ts in day.items() if clock_type == 'in']
+            outs = [clock_ts for (_, clock_type), clock_ts in day.items() if clock_type == 'out']
+        return DailySummary(
+            chat_id, day_num, len(ins), len(outs),
+            min(ins) if ins else None, max(outs) if outs else None
+        )
+
+    def iter_attendance_report(self, chat_id: int, start: date, end: date,
+                               utc_offset: int = 0, fetch_size: int = 500) -> Iterator[Tuple]:
+        """Yield per-user attendance totals for a date range"""
+        first, last = day_number(start), day_number(end)
+        totals = {}  # user_id -> [in_days, out_days, earliest_in, latest_in] in seconds of day
+        with self._lock:
+            for (day_chat, day_num), day in self._days.items():
+                if day_chat != chat_id or not first <= day_num <= last:
+                    continue
+                for (user_id, clock_type), clock_ts in day.items():
+                    total = totals.setdefault(user_id, [0, 0, None, None])
+                    if clock_type == 'out':
+                        total[1] += 1
+                        continue
+                    total[0] += 1
+                    seconds = (clock_ts + utc_offset) % 86400
+                    total[2] = seconds if total[2] is None else min(total[2], seconds)
+                    total[3] = seconds if total[3] is None else max(total[3], seconds)
+            names = {user_id: self._users.get(user_id, ('Unknown', None))[0] for user_id in totals}
+
+        def hhmm(seconds: Optional[int]) -> Optional[str]:
+            return None if seconds is None else f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}"
+
+        # Same order as SQLite's ORDER BY name COLLATE NOCASE, user_id; NOCASE only folds ASCII
+        for user_id in sorted(totals, key=lambda user_id: (names[user_id].translate(_ASCII_LOWER), user_id)):
+            in_days, out_days, earliest, latest = totals[user_id]
+            yield user_id, names[user_id], in_days, out_days, hhmm(earliest), hhmm(latest)
+
+    def peek_roster(self, chat_id: int, date: datetime) -> Optional[DailyRoster]:
+        """Build a chat's roster for a date; always available in memory"""
+        return self.get_roster(chat_id, date)
+
+    def get_roster(self, chat_id: int, date: datetime) -> DailyRoster:
+        """Build a chat's attendance roster for a date"""
+        day_num = day_number(date)
+        roster = DailyRoster(chat_id, day_num)
+        with self._lock:
+            day = dict(self._days.get((chat_id, day_num), {}))
+        for (user_id, clock_type), clock_ts in sorted(day.items(), key=lambda item: item[1]):
+            roster.add(user_id, clock_type, clock_ts)
+        return roster
+
+    def get_members_without_attendance(self, chat_id: int, clock_type: str,
+                                       date: datetime, member_ids: List[int]) -> List[int]:
+        """Get member IDs who haven't clocked in/out on a specific date"""
+        with self._lock:
+            day = self._days.get((chat_id, day_number(date)), {})
+            return [user_id for user_id in member_ids if (user_id, clock_type) not in day]
+
+    def save_configuration(self, chat_id: int, config_type: str, start_time: str,
+                           end_time: str, reminder_interval: int, enabled_days: List[int]) -> bool:
+        """Save clock in/out configuration into a new snapshot"""
+        try:
+            config = ScheduleConfig(
+                chat_id=chat_id,
+                config_type=config_type,
+                start_time=self._parse_time(start_time),
+                end_time=self._parse_time(end_time),
+                reminder_interval=reminder_interval,
+                enabled_days_mask=days_to_mask(enabled_days)
+            )
+        except (ValueError, TypeError) as e:
+            logger.error(f"❌ Error saving configuration: {e}")
+            return False
+
+        with self._lock:
+            current = self._config_snapshot.get(chat_id, config_type)
+            if current is not None and not current.is_active:
+                config = replace(config, is_active=False)
+            self._config_snapshot = self._config_snapshot.with_config(config)
+        return True
+
+    def get_configuration(self, chat_id: int, config_type: str) -> Optional[ScheduleConfig]:
+        """Get configuration for a chat and type"""
+        return self._config_snapshot.get(chat_id, config_type)
+
+    def get_all_active_configurations(self) -> List[ScheduleConfig]:
+        """Get all active configurations"""
+        return list(self._config_snapshot.active())
+
+    def save_schedule_markers(self, last_tick: int, fired: List[Tuple[int, str, int]]) -> bool:
+        """Record the dispatcher's last tick and last-fired markers"""
+        with self._lock:
+            self._last_tick = max(last_tick, self._last_tick or last_tick)
+            for chat_id, config_type, minute in fired:
+                key = (chat_id, config_type)
+                self._markers[key] = max(minute, self._markers.get(key, minute))
+        return True
+
+    def get_schedule_markers(self) -> Tuple[Optional[int], ScheduleMarkers]:
+        """Get the dispatcher's last tick and every last-fired marker"""
+        with self._lock:
+            return self._last_tick, dict(self._markers)
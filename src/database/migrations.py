@@ -0,0 +1,651 @@
+import sqlite3
+import logging
+from typing import Callable, Iterable, List, Optional, Sequence, Set, Tuple, Union
+
+from src.config.settings import Settings
+from src.database import partitions
+from src.database.timecodes import LEGACY_CLOCK_TS_SQL, day_date, day_number, local_day_number
+from src.utils.helpers import get_current_time
+
+logger = logging.getLogger(__name__)
+
+class BatchedStep:
+    """Online DML step repeated until a batch changes fewer rows than the batch size.
+
+    The SQL takes the batch size as its only parameter, e.g.
+    ``UPDATE t SET c = ... WHERE rowid IN (SELECT rowid FROM t WHERE c IS NULL LIMIT ?)``,
+    so every batch is a short transaction and the bot keeps serving between them.
+    Batches that need Python pass a function of (connection, batch size)
+    returning the number of rows it changed instead.
+    """
+
+    def __init__(self, sql: Union[str, Callable[[sqlite3.Connection, int], int]]):
+        self.sql = sql
+
+    def run(self, conn: sqlite3.Connection, batch_size: int) -> int:
+        """Run one batch, returning the number of rows changed"""
+        if callable(self.sql):
+            return self.sql(conn, batch_size)
+        return conn.execute(self.sql, (batch_size,)).rowcount
+
+# SQL text, or a function for steps that depend on what is in the database
+Statement = Union[str, Callable[[sqlite3.Connection], None]]
+OnlineStep = Union[Statement, BatchedStep]
+
+class Migration:
+    """One schema version.
+
+    ``statements`` run at startup in a single transaction and must be cheap
+    (CREATE TABLE, ALTER TABLE ADD COLUMN, which SQLite does without rewriting rows).
+    ``online_steps`` (index builds, backfills) run afterwards in the background,
+    one step per transaction; code must not depend on them for correctness.
+    A ``rebuild`` migration recreates tables with all their indexes, so online
+    steps of earlier versions still pending are marked done instead of run.
+    """
+
+    def __init__(self, version: int, description: str, statements: Sequence[Statement] = (),
+                 online_steps: Sequence[OnlineStep] = (), rebuild: bool = False):
+        self.version = version
+        self.description = description
+        self.statements = list(statements)
+        self.online_steps = list(online_steps)
+        self.rebuild = rebuild
+
+# Rebuilds that change the attendance layout rename the live tables out of the
+# way (see partitions.LEGACY_TABLE_GLOB), create them anew and move only the
+# days that can still take clock-ins at startup. The other rows follow in
+# background batches that read any earlier layout, so startup stays cheap
+# however much history there is.
+
+# Fields of one moved row, whatever the layout it is read from or written to
+_ROW_FIELDS = (
+    'id', 'chat_id', 'user_id', 'user_name', 'username', 'clock_type', 'clock_ts', 'day_num', 'created_at'
+)
+
+def _set_aside_name(table: str, version: int) -> str:
+    """Name a table is renamed to while migration version drains it"""
+    return f"{table}_pre{version}"
+
+def _set_aside_tables(conn: sqlite3.Connection, version: int) -> List[str]:
+    """Tables set aside by a migration: the hot table first, then partitions newest first"""
+    suffix = _set_aside_name('', version)
+    return sorted(
+        (table for table in partitions.legacy_tables(conn) if table.endswith(suffix)), reverse=True
+    )
+
+def _table_exists(conn: sqlite3.Connection, table: str) -> bool:
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+    ).fetchone() is not None
+
+def _refresh_summaries(conn: sqlite3.Connection, keys: Iterable[Tuple[int, int]], months: Set[str]):
+    """Recompute the daily_summary rows of (chat_id, day_num) keys from the live tables"""
+    for chat_id, day_num in keys:
+        month = partitions.month_key(day_date(day_num))
+        tables = [partitions.HOT_TABLE]
+        if month in months:
+            tables.append(partitions.partition_table_name(month))
+        union = ' UNION ALL '.join(
+            f'SELECT clock_type, clock_ts FROM {table} WHERE chat_id = ? AND day_num = ?' for table in tables
+        )
+        total, in_count, out_count, first_in, last_out = conn.execute(f'''
+            SELECT COUNT(*), SUM(clock_type = 'in'), SUM(clock_type = 'out'),
+                   MIN(CASE WHEN clock_type = 'in' THEN clock_ts END),
+                   MAX(CASE WHEN clock_type = 'out' THEN clock_ts END)
+            FROM ({union})
+        ''', (chat_id, day_num) * len(tables)).fetchone()
+        if total:
+            conn.execute('''
+                INSERT OR REPLACE INTO daily_summary
+                (chat_id, day_num, in_count, out_count, first_in, last_out)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (chat_id, day_num, in_count, out_count, first_in, last_out))
+        else:
+            conn.execute('DELETE FROM daily_summary WHERE chat_id = ? AND day_num = ?', (chat_id, day_num))
+
+def _move_set_aside_rows(conn: sqlite3.Connection, source: str, limit: int, min_id: int = 0) -> int:
+    """Move up to limit rows (-1 for all) with id >= min_id from a set-aside table, newest first.
+
+    day_num is recomputed from clock_ts in the configured timezone, and each
+    row goes to the partition of its month, or the hot table when that month
+    has none. When two rows now fall on the same day the earlier clock wins,
+    as it would have when clocking. Names seed users newest first, so the
+    latest name sticks, and daily_summary is recomputed for every day touched.
+    Returns the number of rows taken from source.
+    """
+    columns = partitions.table_columns(conn, source)
+    select = ', '.join(
+        LEGACY_CLOCK_TS_SQL if field == 'clock_ts' and field not in columns
+        else field if field in columns else 'NULL'
+        for field in _ROW_FIELDS
+    )
+    rows = conn.execute(
+        f'SELECT {select} FROM {source} WHERE id >= ? ORDER BY id DESC LIMIT ?', (min_id, limit)
+    ).fetchall()
+    if not rows:
+        return 0
+
+    tz = Settings.get_timezone()
+    months = set(partitions.load_partitions(conn))
+    has_users = _table_exists(conn, 'users')
+    target_fields = {}  # live table -> fields it stores
+    touched = set()  # (chat_id, day_num) whose summary changes
+
+    for row in rows:
+        record = dict(zip(_ROW_FIELDS, row))
+        chat_id = record['chat_id']
+        day_num = local_day_number(record['clock_ts'], tz)
+        if record['day_num'] is not None and record['day_num'] != day_num:
+            touched.add((chat_id, record['day_num']))
+        record['day_num'] = day_num
+        touched.add((chat_id, day_num))
+
+        month = partitions.month_key(day_date(day_num))
+        target = partitions.partition_table_name(month) if month in months else partitions.HOT_TABLE
+        fields = target_fields.get(target)
+        if fields is None:
+            stored = partitions.table_columns(conn, target)
+            fields = target_fields[target] = [field for field in _ROW_FIELDS if field in stored]
+
+        existing = conn.execute(f'''
+            SELECT id, clock_ts FROM {target}
+            WHERE chat_id = ? AND day_num = ? AND clock_type = ? AND user_id = ?
+        ''', (chat_id, day_num, record['clock_type'], record['user_id'])).fetchone()
+        if existing is not None:
+            if record['clock_ts'] >= existing[1]:
+                continue
+            conn.execute(f'DELETE FROM {target} WHERE id = ?', (existing[0],))
+        conn.execute(
+            f"INSERT OR IGNORE INTO {target} ({', '.join(fields)}) VALUES ({', '.join('?' * len(fields))})",
+            [record[field] for field in fields]
+        )
+
+        if has_users and 'user_name' not in fields and record['user_name'] is not None:
+            conn.execute(
+                'INSERT OR IGNORE INTO users (user_id, user_name, username) VALUES (?, ?, ?)',
+                (record['user_id'], record['user_name'], record['username'])
+            )
+
+    # The batch is the newest rows of source at or above min_id, so an id
+    # range deletes exactly those
+    conn.execute(f'DELETE FROM {source} WHERE id BETWEEN ? AND ?', (rows[-1][0], rows[0][0]))
+    _refresh_summaries(conn, sorted(touched), months)
+    return len(rows)
+
+def _set_aside_attendance(conn: sqlite3.Connection, version: int, hot_filter: str, hot_params: Tuple,
+                          create_live: Callable[[sqlite3.Connection, List[str]], None]) -> List[str]:
+    """Rename attendance and its partitions out of the way and recreate them with create_live.
+
+    Rows from the first one matching hot_filter on are moved right away; the
+    rest wait for _drain_set_aside. Returns the partition months.
+    """
+    first_hot_id = conn.execute(
+        f'SELECT MIN(id) FROM {partitions.HOT_TABLE} WHERE {hot_filter}', hot_params
+    ).fetchone()[0]
+    # Keep AUTOINCREMENT ids above anything already archived into partitions
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'attendance'").fetchone()
+    last_id = row[0] if row else 0
+
+    months = partitions.load_partitions(conn)
+    conn.execute(f'DROP VIEW IF EXISTS {partitions.HISTORY_VIEW}')
+    tables = [partitions.HOT_TABLE] + [partitions.partition_table_name(month) for month in months]
+    for table in tables:
+        set_aside = _set_aside_name(table, version)
+        conn.execute(f'ALTER TABLE {table} RENAME TO {set_aside}')
+        # Indexes follow the renamed table and would block their re-creation;
+        # set-aside tables are only read by id
+        for (index,) in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+            (set_aside,)
+        ).fetchall():
+            conn.execute(f'DROP INDEX {index}')
+
+    create_live(conn, months)
+    conn.execute(
+        "UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'attendance'", (last_id,)
+    )
+    conn.execute(
+        "INSERT INTO sqlite_sequence (name, seq) SELECT 'attendance', ? "
+        "WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'attendance')", (last_id,)
+    )
+
+    if first_hot_id is not None:
+        _move_set_aside_rows(conn, _set_aside_name(partitions.HOT_TABLE, version), -1, first_hot_id)
+    return months
+
+def _hot_day() -> int:
+    """First local day whose rows move at startup: yesterday, which can still take clock-outs"""
+    return day_number(get_current_time()) - 1
+
+def _drain_set_aside(version: int) -> BatchedStep:
+    """Online step moving the rows a migration set aside into the live tables"""
+    def drain(conn: sqlite3.Connection, batch_size: int) -> int:
+        moved = 0
+        for table in _set_aside_tables(conn, version):
+            moved += _move_set_aside_rows(conn, table, batch_size - moved)
+            if moved >= batch_size:
+                break
+        return moved
+    return BatchedStep(drain)
+
+def _drop_set_aside(version: int) -> Callable[[sqlite3.Connection], None]:
+    """Online step dropping a migration's drained tables and the view over them"""
+    def drop(conn: sqlite3.Connection):
+        for table in _set_aside_tables(conn, version):
+            conn.execute(f'DROP TABLE {table}')
+        partitions.refresh_history_view(conn, partitions.load_partitions(conn))
+    return drop
+
+# Layout written by migration 5; later migrations change the live layout in
+# partitions.py, so this one keeps its own copy
+_V5_COLUMNS = 'id, chat_id, user_id, user_name, username, clock_type, clock_ts, day_num, created_at'
+
+def _create_v5_partition_table(conn: sqlite3.Connection, table: str):
+    """Create a partition table in the migration 5 layout"""
+    conn.execute(f'''
+        CREATE TABLE {table} (
+            id INTEGER PRIMARY KEY,
+            chat_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            user_name TEXT NOT NULL,
+            username TEXT,
+            clock_type TEXT NOT NULL,
+            clock_ts INTEGER NOT NULL,
+            day_num INTEGER NOT NULL,
+            created_at DATETIME
+        )
+    ''')
+    conn.execute(f'''
+        CREATE INDEX idx_{table}_chat_day_type_user
+        ON {table}(chat_id, day_num, clock_type, user_id)
+    ''')
+
+def _create_v5_history_view(conn: sqlite3.Connection, months: List[str]):
+    """Create attendance_history over the migration 5 layout and any set-aside table"""
+    selects = [f'SELECT {_V5_COLUMNS} FROM attendance']
+    selects.extend(
+        f'SELECT {_V5_COLUMNS} FROM {partitions.partition_table_name(month)}' for month in months
+    )
+    selects.extend(
+        f'SELECT id, chat_id, user_id, legacy_name, legacy_username, clock_type, clock_ts, day_num, created_at '
+        f'FROM ({partitions.legacy_select(conn, table, partitions.utc_offset())})'
+        for table in partitions.legacy_tables(conn)
+    )
+    conn.execute(f'''
+        CREATE VIEW {partitions.HISTORY_VIEW} AS
+        SELECT {_V5_COLUMNS},
+               date(day_num * 86400, 'unixepoch') AS date_only,
+               datetime(clock_ts, 'unixepoch') AS clock_time
+        FROM ({' UNION ALL '.join(selects)})
+    ''')
+
+def _create_v5_tables(conn: sqlite3.Connection, months: List[str]):
+    """Create empty attendance, partitions and daily_summary in the migration 5 layout"""
+    conn.execute('''
+        CREATE TABLE attendance (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            chat_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            user_name TEXT NOT NULL,
+            username TEXT,
+            clock_type TEXT NOT NULL, -- 'in' or 'out'
+            clock_ts INTEGER NOT NULL, -- epoch seconds (UTC)
+            day_num INTEGER NOT NULL, -- local calendar day, days since 1970-01-01
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(chat_id, user_id, clock_type, day_num)
+        )
+    ''')
+    # The clock_type index is gone for good: two values never narrow a scan
+    conn.execute('''
+        CREATE INDEX idx_attendance_chat_day_type_user
+        ON attendance(chat_id, day_num, clock_type, user_id)
+    ''')
+    conn.execute('CREATE INDEX idx_attendance_day ON attendance(day_num)')
+    conn.execute('CREATE INDEX idx_attendance_user ON attendance(user_id)')
+    for month in months:
+        _create_v5_partition_table(conn, partitions.partition_table_name(month))
+
+    # The old summary counted UTC days; it is rebuilt from the moved rows
+    conn.execute('DROP TABLE daily_summary')
+    conn.execute('''
+        CREATE TABLE daily_summary (
+            chat_id INTEGER NOT NULL,
+            day_num INTEGER NOT NULL, -- same as attendance.day_num
+            in_count INTEGER NOT NULL DEFAULT 0,
+            out_count INTEGER NOT NULL DEFAULT 0,
+            first_in INTEGER, -- epoch seconds
+            last_out INTEGER, -- epoch seconds
+            PRIMARY KEY (chat_id, day_num)
+        ) WITHOUT ROWID
+    ''')
+
+def _rebuild_with_integer_time(conn: sqlite3.Connection):
+    """Convert attendance and its partitions to epoch seconds and local day numbers.
+
+    Only the last few days are converted here; _drain_set_aside(5) converts
+    the rest online and daily_summary is rebuilt as rows arrive.
+    """
+    # date_only may be the UTC day, up to a day behind the local one
+    hot_since = day_date(_hot_day() - 1).isoformat()
+    months = _set_aside_attendance(conn, 5, 'date_only >= ?', (hot_since,), _create_v5_tables)
+    _create_v5_history_view(conn, months)
+
+def _create_v6_tables(conn: sqlite3.Connection, months: List[str]):
+    """Create empty attendance and partitions without names, which live in users"""
+    conn.execute('''
+        CREATE TABLE attendance (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            chat_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL, -- users.user_id
+            clock_type TEXT NOT NULL, -- 'in' or 'out'
+            clock_ts INTEGER NOT NULL, -- epoch seconds (UTC)
+            day_num INTEGER NOT NULL, -- local calendar day, days since 1970-01-01
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(chat_id, user_id, clock_type, day_num)
+        )
+    ''')
+    conn.execute('''
+        CREATE INDEX idx_attendance_chat_day_type_user
+        ON attendance(chat_id, day_num, clock_type, user_id)
+    ''')
+    conn.execute('CREATE INDEX idx_attendance_day ON attendance(day_num)')
+    conn.execute('CREATE INDEX idx_attendance_user ON attendance(user_id)')
+    for month in months:
+        partitions.create_partition_table(conn, partitions.partition_table_name(month))
+
+def _rebuild_with_users_table(conn: sqlite3.Connection):
+    """Drop names from attendance and its partitions, seeding users from the rows moved.
+
+    Only the last few days move here; _drain_set_aside(6) moves the
+    rest online, newest first, so each user keeps their latest name. Every
+    row's day_num is recomputed on the way, since earlier conversions filed
+    it under the UTC day.
+    """
+    # day_num may be the UTC day, up to a day behind the local one
+    months = _set_aside_attendance(conn, 6, 'day_num >= ?', (_hot_day() - 1,), _create_v6_tables)
+    partitions.refresh_history_view(conn, months)
+
+MIGRATIONS = [
+    Migration(1, "Initial schema", [
+        '''
+        CREATE TABLE IF NOT EXISTS attendance (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            chat_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            user_name TEXT NOT NULL,
+            username TEXT,
+            clock_type TEXT NOT NULL, -- 'in' or 'out'
+            clock_time DATETIME NOT NULL,
+            date_only TEXT NOT NULL, -- YYYY-MM-DD format for unique constraint
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(chat_id, user_id, clock_type, date_only)
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_attendance_user ON attendance(user_id)',
+        'CREATE INDEX IF NOT EXISTS idx_attendance_type ON attendance(clock_type)',
+        '''
+        CREATE TABLE IF NOT EXISTS configurations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            chat_id INTEGER NOT NULL,
+            config_type TEXT NOT NULL, -- 'clock_in' or 'clock_out'
+            start_time TEXT NOT NULL, -- HH:MM format
+            end_time TEXT NOT NULL, -- HH:MM format
+            reminder_interval INTEGER NOT NULL, -- minutes
+            enabled_days TEXT NOT NULL, -- JSON array of days [0,1,2,3,4,5,6]
+            is_active BOOLEAN DEFAULT 1,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(chat_id, config_type)
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_config_chat ON configurations(chat_id)',
+        'CREATE INDEX IF NOT EXISTS idx_config_active ON configurations(is_active)',
+        '''
+        CREATE TABLE IF NOT EXISTS chat_groups (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            chat_id INTEGER UNIQUE NOT NULL,
+            chat_title TEXT,
+            chat_type TEXT,
+            is_active BOOLEAN DEFAULT 1,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_chat_groups_active ON chat_groups(is_active)'
+    ]),
+    # The covering index serves the daily read paths without touching table
+    # rows; it supersedes the (chat_id, date_only) index of older databases,
+    # which is a prefix of it. Fresh databases never create the old index.
+    Migration(2, "Covering index for daily attendance reads", online_steps=[
+        '''
+        CREATE INDEX IF NOT EXISTS idx_attendance_chat_date_type_user
+        ON attendance(chat_id, date_only, clock_type, user_id)
+        ''',
+        'DROP INDEX IF EXISTS idx_attendance_chat_date'
+    ]),
+    # Closed months move to attendance_YYYYMM tables (see partitions.py); the
+    # registry lists them and attendance_history spans all of them
+    Migration(3, "Monthly attendance partitions", [
+        '''
+        CREATE TABLE IF NOT EXISTS attendance_partitions (
+            month TEXT PRIMARY KEY, -- YYYY-MM
+            table_name TEXT NOT NULL,
+            row_count INTEGER NOT NULL DEFAULT 0,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            archived_at DATETIME -- last batch moved into the partition
+        )
+        ''',
+        '''
+        CREATE VIEW IF NOT EXISTS attendance_history AS
+        SELECT id, chat_id, user_id, user_name, username, clock_type, clock_time, date_only, created_at
+        FROM attendance
+        '''
+    ], online_steps=[
+        # Lets the archiver find the oldest closed month without a scan
+        'CREATE INDEX IF NOT EXISTS idx_attendance_date ON attendance(date_only)'
+    ]),
+    # Per chat per day counts, maintained by Database.clock_batch. Only the days
+    # that can still receive clock-ins are seeded here; older days are filled in
+    # by `python manage.py backfill-summary`
+    Migration(4, "Daily attendance summary", [
+        '''
+        CREATE TABLE IF NOT EXISTS daily_summary (
+            chat_id INTEGER NOT NULL,
+            date_only TEXT NOT NULL, -- YYYY-MM-DD, same as attendance.date_only
+            in_count INTEGER NOT NULL DEFAULT 0,
+            out_count INTEGER NOT NULL DEFAULT 0,
+            first_in DATETIME,
+            last_out DATETIME,
+            PRIMARY KEY (chat_id, date_only)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        INSERT OR REPLACE INTO daily_summary
+        (chat_id, date_only, in_count, out_count, first_in, last_out)
+        SELECT chat_id, date_only,
+               SUM(clock_type = 'in'), SUM(clock_type = 'out'),
+               MIN(CASE WHEN clock_type = 'in' THEN clock_time END),
+               MAX(CASE WHEN clock_type = 'out' THEN clock_time END)
+        FROM attendance
+        WHERE date_only >= date('now', '-1 day')
+        GROUP BY chat_id, date_only
+        '''
+    ]),
+    # Epoch seconds and integer day numbers instead of datetime and date
+    # strings: smaller rows and indexes, integer range scans. Recent days are
+    # converted at startup, the rest in the background
+    Migration(5, "Integer time encoding", [_rebuild_with_integer_time], online_steps=[
+        _drain_set_aside(5),
+        _drop_set_aside(5)
+    ], rebuild=True),
+    # Names live once per user instead of on every attendance row; the
+    # attendance tables keep only integer ids. Users are seeded as rows move
+    Migration(6, "Normalized users table", [
+        '''
+        CREATE TABLE IF NOT EXISTS users (
+            user_id INTEGER PRIMARY KEY, -- Telegram user id
+            user_name TEXT NOT NULL,
+            username TEXT,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP -- last name change
+        )
+        ''',
+        _rebuild_with_users_table
+    ], online_steps=[
+        _drain_set_aside(6),
+        _drop_set_aside(6)
+    ]),
+    # Where the reminder dispatcher got to, so a restart can send what it missed
+    Migration(7, "Scheduler markers", [
+        '''
+        CREATE TABLE IF NOT EXISTS schedule_markers (
+            chat_id INTEGER NOT NULL,
+            config_type TEXT NOT NULL, -- 'clock_in' or 'clock_out'
+            last_fired INTEGER NOT NULL, -- minutes since the epoch of the last event sent
+            PRIMARY KEY (chat_id, config_type)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS scheduler_state (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        ) WITHOUT ROWID
+        '''
+    ])
+]
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+class MigrationRunner:
+    """Apply versioned migrations tracked by PRAGMA user_version"""
+
+    def __init__(self, migrations: List[Migration] = None, batch_size: int = 1000):
+        self.migrations = migrations if migrations is not None else MIGRATIONS
+        self.batch_size = batch_size
+        self.latest_version = self.migrations[-1].version if self.migrations else 0
+
+    def _ensure_history_table(self, conn: sqlite3.Connection):
+        """Create the table recording applied migrations and online progress"""
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                description TEXT NOT NULL,
+                applied_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                online_step INTEGER NOT NULL DEFAULT 0, -- next online step to run
+                completed_at DATETIME -- set once every online step has run
+            )
+        ''')
+
+    def current_version(self, conn: sqlite3.Connection) -> int:
+        """Schema version stored in the database header"""
+        return conn.execute('PRAGMA user_version').fetchone()[0]
+
+    def migrate(self, conn: sqlite3.Connection) -> int:
+        """Apply the startup statements of every pending migration, returning how many ran"""
+        current = self.current_version(conn)
+        if current >= self.latest_version:
+            return 0
+
+        applied = 0
+        for migration in self.migrations:
+            if migration.version <= current:
+                continue
+
+            # DDL, the history row and user_version commit or roll back together
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                self._ensure_history_table(conn)
+                for statement in migration.statements:
+                    if callable(statement):
+                        statement(conn)
+                    else:
+                        conn.execute(statement)
+                if migration.rebuild:
+                    conn.execute(
+                        '''UPDATE schema_migrations SET completed_at = CURRENT_TIMESTAMP
+                           WHERE version < ? AND completed_at IS NULL''',
+                        (migration.version,)
+                    )
+                conn.execute(
+                    '''INSERT OR REPLACE INTO schema_migrations
+                       (version, description, online_step, completed_at)
+                       VALUES (?, ?, 0, CASE WHEN ? THEN NULL ELSE CURRENT_TIMESTAMP END)''',
+                    (migration.version, migration.description, bool(migration.online_steps))
+                )
+                conn.execute(f'PRAGMA user_version = {int(migration.version)}')
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+            applied += 1
+            logger.info(f"Applied migration {migration.version}: {migration.description}")
+
+        return applied
+
+    def _next_online_step(self, conn: sqlite3.Connection) -> Optional[Tuple[Migration, int]]:
+        """Oldest migration with online work left, and the index of its next step"""
+        try:
+            rows = conn.execute('''
+                SELECT version, online_step FROM schema_migrations
+                WHERE completed_at IS NULL
+                ORDER BY version
+            ''').fetchall()
+        except sqlite3.OperationalError:
+            return None  # nothing migrated yet
+
+        by_version = {migration.version: migration for migration in self.migrations}
+        for version, step in rows:
+            migration = by_version.get(version)
+            if migration is not None:
+                return migration, step
+        return None
+
+    def has_online_work(self, conn: sqlite3.Connection) -> bool:
+        """Check whether any background migration step is still pending"""
+        return self._next_online_step(conn) is not None
+
+    def run_online_step(self, conn: sqlite3.Connection) -> bool:
+        """Run one online step or one batch of it, returning True while work remains"""
+        pending = self._next_online_step(conn)
+        if pending is None:
+            return False
+
+        migration, index = pending
+        if index >= len(migration.online_steps):
+            conn.execute(
+                'UPDATE schema_migrations SET completed_at = CURRENT_TIMESTAMP WHERE version = ?',
+                (migration.version,)
+            )
+            conn.commit()
+            logger.info(f"Completed online steps of migration {migration.version}: {migration.description}")
+            return self.has_online_work(conn)
+
+        step = migration.online_steps[index]
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if isinstance(step, BatchedStep):
+                changed = step.run(conn, self.batch_size)
+                finished = changed < self.batch_size
+            elif callable(step):
+                step(conn)
+                finished = True
+            else:
+                conn.execute(step)
+                finished = True
+
+            if finished:
+                conn.execute(
+                    'UPDATE schema_migrations SET online_step = ? WHERE version = ?',
+                    (index + 1, migration.version)
+                )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+        return True
+
+    def run_all(self, conn: sqlite3.Connection):
+        """Apply every pending migration including online steps, blocking until done"""
+        self.migrate(conn)
+        while self.run_online_step(conn):
+            pass
@@ -0,0 +1,206 @@
+import sqlite3
+import logging
+from datetime import date
+from typing import List, Optional, Tuple
+
+from src.database.timecodes import LEGACY_CLOCK_TS_SQL, day_date, day_number
+from src.utils.helpers import get_current_time
+
+logger = logging.getLogger(__name__)
+
+HOT_TABLE = 'attendance'
+HISTORY_VIEW = 'attendance_history'
+
+# Columns copied verbatim into month partitions; ids are kept so a move can
+# be resumed with INSERT OR IGNORE after a crash
+ATTENDANCE_COLUMNS = (
+    'id, chat_id, user_id, clock_type, clock_ts, day_num, created_at'
+)
+
+# Attendance tables a rebuild migration set aside under a _pre<version>
+# suffix, e.g. attendance_202403_pre5; their rows are moved into the live
+# tables in the background and they are dropped once empty
+LEGACY_TABLE_GLOB = 'attendance*_pre[0-9]*'
+
+def month_key(day: date) -> str:
+    """Month of a date as YYYY-MM"""
+    return day.strftime('%Y-%m')
+
+def next_month(month: str) -> str:
+    """The month after a YYYY-MM month"""
+    year, mon = map(int, month.split('-'))
+    return f"{year + mon // 12:04d}-{mon % 12 + 1:02d}"
+
+def month_days(month: str) -> Tuple[int, int]:
+    """Day numbers of the first day of a month and of the month after it"""
+    start = date.fromisoformat(f"{month}-01")
+    end = date.fromisoformat(f"{next_month(month)}-01")
+    return day_number(start), day_number(end)
+
+def partition_table_name(month: str) -> str:
+    """Table holding the archived rows of a YYYY-MM month"""
+    return f"attendance_{month.replace('-', '')}"
+
+def archive_cutoff(today: date, keep_months: int) -> int:
+    """First day_num that stays in the hot table: the start of the oldest kept month"""
+    index = today.year * 12 + today.month - 1 - keep_months
+    return day_number(date(index // 12, index % 12 + 1, 1))
+
+def load_partitions(conn: sqlite3.Connection) -> List[str]:
+    """Months that have a partition table, oldest first"""
+    try:
+        return [row[0] for row in conn.execute(
+            'SELECT month FROM attendance_partitions ORDER BY month'
+        )]
+    except sqlite3.OperationalError:
+        return []  # registry not migrated yet
+
+def utc_offset() -> int:
+    """Current offset of the configured timezone from UTC in seconds"""
+    return int(get_current_time().utcoffset().total_seconds())
+
+def table_columns(conn: sqlite3.Connection, table: str) -> List[str]:
+    """Column names of a table"""
+    return [row[1] for row in conn.execute(f'PRAGMA table_info({table})')]
+
+def legacy_tables(conn: sqlite3.Connection) -> List[str]:
+    """Set-aside attendance tables still waiting to be drained into the live ones"""
+    return [row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name GLOB ? ORDER BY name",
+        (LEGACY_TABLE_GLOB,)
+    )]
+
+def legacy_select(conn: sqlite3.Connection, table: str, utc_offset: int) -> str:
+    """SELECT reading a set-aside table as ATTENDANCE_COLUMNS plus legacy_name and legacy_username.
+
+    Older layouts keep text times and a name on every row. day_num is
+    derived from the time at utc_offset seconds from UTC, since the stored
+    day of older rows may be the UTC one.
+    """
+    columns = table_columns(conn, table)
+    clock_ts = 'clock_ts' if 'clock_ts' in columns else LEGACY_CLOCK_TS_SQL
+    user_name = 'user_name' if 'user_name' in columns else 'NULL'
+    username = 'username' if 'username' in columns else 'NULL'
+    return (
+        f'SELECT id, chat_id, user_id, clock_type, {clock_ts} AS clock_ts, '
+        f'({clock_ts} + {int(utc_offset)}) / 86400 AS day_num, created_at, '
+        f'{user_name} AS legacy_name, {username} AS legacy_username FROM {table}'
+    )
+
+def refresh_history_view(conn: sqlite3.Connection, months: List[str]):
+    """Recreate the view spanning the hot table, every partition and any set-aside table.
+
+    Besides the stored integer columns it joins the latest names from users
+    and derives the legacy text date_only and clock_time (UTC), so ad-hoc
+    queries written against the old format keep working. Rows of set-aside
+    tables fall back to their own names until they are drained, and take
+    their day from the configured timezone like the drain does.
+    """
+    selects = [f'SELECT {ATTENDANCE_COLUMNS}, NULL AS legacy_name, NULL AS legacy_username FROM {HOT_TABLE}']
+    selects.extend(
+        f'SELECT {ATTENDANCE_COLUMNS}, NULL, NULL FROM {partition_table_name(month)}' for month in months
+    )
+    selects.extend(legacy_select(conn, table, utc_offset()) for table in legacy_tables(conn))
+    conn.execute(f'DROP VIEW IF EXISTS {HISTORY_VIEW}')
+    conn.execute(f'''
+        CREATE VIEW {HISTORY_VIEW} AS
+        SELECT a.id, a.chat_id, a.user_id, a.clock_type, a.clock_ts, a.day_num, a.created_at,
+               CASE WHEN u.user_id IS NULL THEN a.legacy_name ELSE u.user_name END AS user_name,
+               CASE WHEN u.user_id IS NULL THEN a.legacy_username ELSE u.username END AS username,
+               date(a.day_num * 86400, 'unixepoch') AS date_only,
+               datetime(a.clock_ts, 'unixepoch') AS clock_time
+        FROM ({' UNION ALL '.join(selects)}) AS a
+        LEFT JOIN users AS u ON u.user_id = a.user_id
+    ''')
+
+def create_partition_table(conn: sqlite3.Connection, table: str):
+    """Create an empty partition table with its covering index"""
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS {table} (
+            id INTEGER PRIMARY KEY,
+            chat_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            clock_type TEXT NOT NULL,
+            clock_ts INTEGER NOT NULL,
+            day_num INTEGER NOT NULL,
+            created_at DATETIME
+        )
+    ''')
+    conn.execute(f'''
+        CREATE INDEX IF NOT EXISTS idx_{table}_chat_day_type_user
+        ON {table}(chat_id, day_num, clock_type, user_id)
+    ''')
+
+def ensure_partition(conn: sqlite3.Connection, month: str, months: List[str]) -> List[str]:
+    """Create a month partition inside the caller's transaction, returning the new month list"""
+    if month in months:
+        return months
+
+    table = partition_table_name(month)
+    create_partition_table(conn, table)
+    conn.execute(
+        'INSERT OR IGNORE INTO attendance_partitions (month, table_name) VALUES (?, ?)',
+        (month, table)
+    )
+
+    months = sorted(months + [month])
+    refresh_history_view(conn, months)
+    return months
+
+def archive_batch(conn: sqlite3.Connection, cutoff: int, months: List[str],
+                  batch_size: int) -> Tuple[Optional[str], int, List[str]]:
+    """Move one batch of the oldest closed month out of the hot table.
+
+    Returns the month touched (None when nothing is left before the cutoff),
+    the number of rows moved and the possibly extended partition list.
+    """
+    row = conn.execute(
+        f'SELECT MIN(day_num) FROM {HOT_TABLE} WHERE day_num < ?', (cutoff,)
+    ).fetchone()
+    if row[0] is None:
+        return None, 0, months
+
+    month = month_key(day_date(row[0]))
+    start, end = month_days(month)
+    table = partition_table_name(month)
+
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        months = ensure_partition(conn, month, months)
+
+        # The same ordered subquery selects the batch for the copy and the delete;
+        # BEGIN IMMEDIATE keeps writers out in between
+        batch = f'''
+            SELECT id FROM {HOT_TABLE}
+            WHERE day_num >= ? AND day_num < ?
+            ORDER BY id LIMIT ?
+        '''
+        conn.execute(f'''
+            INSERT OR IGNORE INTO {table} ({ATTENDANCE_COLUMNS})
+            SELECT {ATTENDANCE_COLUMNS} FROM {HOT_TABLE} WHERE id IN ({batch})
+        ''', (start, end, batch_size))
+        moved = conn.execute(
+            f'DELETE FROM {HOT_TABLE} WHERE id IN ({batch})', (start, end, batch_size)
+        ).rowcount
+        conn.execute('''
+            UPDATE attendance_partitions
+            SET row_count = row_count + ?, archived_at = CURRENT_TIMESTAMP
+            WHERE month = ?
+        ''', (moved, month))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    return month, moved, months
+
+def partition_tables(months: List[str], start: date, end: date) -> List[str]:
+    """Tables that can hold rows dated between start and end inclusive.
+
+    The hot table is always included: a month is only partially moved while
+    the archiver is running, and open months never leave it.
+    """
+    first, last = month_key(start), month_key(end)
+    return [HOT_TABLE] + [
+        partition_table_name(month) for month in months if first <= month <= last
+    ]
@@ -0,0 +1,221 @@
+import sqlite3
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict
+from urllib.parse import quote
+
+logger = logging.getLogger(__name__)
+
+class PoolTimeoutError(sqlite3.OperationalError):
+    """Raised when no pooled connection becomes free in time"""
+
+class _PooledConnection:
+    """A connection plus the bookkeeping needed to recycle it"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        self.created_at = time.monotonic()
+        self.uses = 0
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of SQLite connections to a single database file"""
+
+    def __init__(self, db_path: str, max_size: int = 4, max_age: float = 3600,
+                 max_uses: int = 10000, statement_cache_size: int = 256,
+                 checkout_timeout: float = 30.0, read_only: bool = False):
+        self.db_path = db_path
+        self.read_only = read_only
+        self.max_size = max_size
+        self.max_age = max_age  # seconds before a connection is recycled
+        self.max_uses = max_uses  # checkouts before a connection is recycled
+        self.statement_cache_size = statement_cache_size
+        self.checkout_timeout = checkout_timeout
+
+        self._idle = deque()
+        self._size = 0  # open connections, idle or checked out
+        self._closed = False
+        self._condition = threading.Condition()
+
+        # Checkout metrics
+        self._checkouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._timeouts = 0
+        self._created = 0
+        self._recycled = 0
+
+    def _connect(self) -> _PooledConnection:
+        """Open and configure a new connection"""
+        # Connections move between threads, but the pool guarantees only one
+        # thread uses a connection at a time. sqlite3 keeps a per-connection
+        # prepared statement cache of cached_statements entries.
+        if self.read_only:
+            # mode=ro refuses writes at the file level and query_only at the
+            # statement level; the writer already put the database in WAL mode,
+            # so readers see committed snapshots without blocking it
+            conn = sqlite3.connect(
+                f"file:{quote(self.db_path)}?mode=ro",
+                uri=True,
+                check_same_thread=False,
+                cached_statements=self.statement_cache_size
+            )
+            conn.execute("PRAGMA query_only = ON")
+        else:
+            conn = sqlite3.connect(
+                self.db_path,
+                check_same_thread=False,
+                cached_statements=self.statement_cache_size
+            )
+            # Enable foreign keys
+            conn.execute("PRAGMA foreign_keys = ON")
+            # Let maintenance return free pages in steps; only takes effect on a
+            # new database or after a full VACUUM
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            # Set journal mode to WAL for better concurrency
+            conn.execute("PRAGMA journal_mode = WAL")
+            # Set synchronous mode to NORMAL for better performance
+            conn.execute("PRAGMA synchronous = NORMAL")
+
+        with self._condition:
+            self._created += 1
+        return _PooledConnection(conn)
+
+    def _is_healthy(self, pooled: _PooledConnection) -> bool:
+        """Check that an idle connection is still fresh and usable"""
+        if time.monotonic() - pooled.created_at > self.max_age or pooled.uses >= self.max_uses:
+            return False
+
+        try:
+            pooled.conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _discard(self, pooled: _PooledConnection):
+        """Close a connection that is leaving the pool"""
+        try:
+            pooled.conn.close()
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Error closing pooled connection: {e}")
+
+    def _acquire(self) -> _PooledConnection:
+        """Check out an idle connection, opening a new one while under max_size"""
+        started = time.monotonic()
+        deadline = started + self.checkout_timeout
+
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise sqlite3.ProgrammingError(f"Connection pool for {self.db_path} is closed")
+
+                if self._idle:
+                    pooled = self._idle.pop()
+                    break
+
+                if self._size < self.max_size:
+                    self._size += 1
+                    pooled = None
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeoutError(
+                        f"Timed out after {self.checkout_timeout}s waiting for a connection to {self.db_path}"
+                    )
+                self._condition.wait(remaining)
+
+            waited = time.monotonic() - started
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+
+        # Health checks and connects happen outside the lock
+        if pooled is not None and not self._is_healthy(pooled):
+            self._discard(pooled)
+            with self._condition:
+                self._recycled += 1
+            pooled = None
+
+        if pooled is None:
+            try:
+                pooled = self._connect()
+            except Exception:
+                with self._condition:
+                    self._size -= 1
+                    self._condition.notify()
+                raise
+
+        return pooled
+
+    def _release(self, pooled: _PooledConnection):
+        """Return a connection to the pool"""
+        pooled.uses += 1
+
+        # Never hand out a connection with a transaction left open
+        if pooled.conn.in_transaction:
+            try:
+                pooled.conn.rollback()
+            except sqlite3.Error:
+                pooled.uses = self.max_uses  # force a recycle on next checkout
+
+        with self._condition:
+            if self._closed:
+                self._size -= 1
+                self._discard(pooled)
+            else:
+                self._idle.append(pooled)
+            self._condition.notify()
+
+    @contextmanager
+    def connection(self):
+        """Check out a connection for the duration of a with block"""
+        pooled = self._acquire()
+        try:
+            yield pooled.conn
+        finally:
+            self._release(pooled)
+
+    @contextmanager
+    def dedicated_connection(self):
+        """Open a connection configured like the pooled ones but outside the pool.
+
+        For callers that hold a connection across yields: it takes no pool
+        slot, so short checkouts never wait behind it.
+        """
+        pooled = self._connect()
+        try:
+            yield pooled.conn
+        finally:
+            self._discard(pooled)
+
+    def stats(self) -> Dict:
+        """Pool size and checkout wait metrics"""
+        with self._condition:
+            checkouts = self._checkouts
+            return {
+                'size': self._size,
+                'idle': len(self._idle),
+                'max_size': self.max_size,
+                'checkouts': checkouts,
+                'wait_avg_ms': (self._wait_total / checkouts * 1000) if checkouts else 0.0,
+                'wait_max_ms': self._wait_max * 1000,
+                'timeouts': self._timeouts,
+                'created': self._created,
+                'recycled': self._recycled
+            }
+
+    def close_all(self):
+        """Close idle connections now and checked-out ones when they are returned"""
+        with self._condition:
+            self._closed = True
+            while self._idle:
+                self._size -= 1
+                self._discard(self._idle.pop())
+            self._condition.notify_all()
+
+        kind = "Read-only connection pool" if self.read_only else "Connection pool"
+        logger.info(f"{kind} for {self.db_path} closed: {self.stats()}")
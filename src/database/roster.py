@@ -0,0 +1,64 @@
+from typing import Optional
+
+class DailyRoster:
+    """Attendance of one chat for one local day, kept as bitsets over dense user indexes"""
+
+    def __init__(self, chat_id: int, day_num: int):
+        self.chat_id = chat_id
+        self.day_num = day_num  # local day number, same as attendance.day_num
+
+        self._index = {}  # user_id -> dense index
+        self._users = []  # dense index -> user_id
+        self._times = {}  # (clock_type, dense index) -> clock time in epoch seconds
+        self._clock_in = 0  # bit i set when user i clocked in
+        self._clock_out = 0  # bit i set when user i clocked out
+        self._clock_in_count = 0
+        self._clock_out_count = 0
+
+    def add(self, user_id: int, clock_type: str, clock_ts: int) -> bool:
+        """Mark a user as clocked in/out, returning False if already marked"""
+        index = self._index.get(user_id)
+        if index is None:
+            index = len(self._users)
+            self._index[user_id] = index
+            self._users.append(user_id)
+
+        bit = 1 << index
+        if clock_type == 'in':
+            if self._clock_in & bit:
+                return False
+            self._clock_in |= bit
+            self._clock_in_count += 1
+        else:
+            if self._clock_out & bit:
+                return False
+            self._clock_out |= bit
+            self._clock_out_count += 1
+
+        self._times[(clock_type, index)] = clock_ts
+        return True
+
+    def has_clocked_in(self, user_id: int) -> bool:
+        """Check whether a user clocked in on this day"""
+        index = self._index.get(user_id)
+        return index is not None and bool(self._clock_in >> index & 1)
+
+    def has_clocked_out(self, user_id: int) -> bool:
+        """Check whether a user clocked out on this day"""
+        index = self._index.get(user_id)
+        return index is not None and bool(self._clock_out >> index & 1)
+
+    def get_clock_time(self, user_id: int, clock_type: str) -> Optional[int]:
+        """Get the recorded clock in/out time of a user in epoch seconds"""
+        index = self._index.get(user_id)
+        if index is None:
+            return None
+        return self._times.get((clock_type, index))
+
+    @property
+    def clock_in_count(self) -> int:
+        return self._clock_in_count
+
+    @property
+    def clock_out_count(self) -> int:
+        return self._clock_out_count
@@ -0,0 +1,269 @@
+import logging
+import os
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from src.database.config_snapshot import ScheduleConfig
+from src.database.database import Database
+from src.database.roster import DailyRoster
+from src.database.storage import AttendanceStorage, ClockStatus, DailySummary, ScheduleMarkers
+from src.database.users import UserName
+
+logger = logging.getLogger(__name__)
+
+def shard_path(db_path: str, index: int) -> str:
+    """File of one shard: attendance.db -> attendance.shard0.db"""
+    root, ext = os.path.splitext(db_path)
+    return f"{root}.shard{index}{ext or '.db'}"
+
+def shard_index(chat_id: int, shards: int) -> int:
+    """Shard holding a chat; stable across restarts and Python versions"""
+    return zlib.crc32(str(chat_id).encode()) % shards
+
+class ShardedDatabase(AttendanceStorage):
+    """SQLite storage spread over several database files by chat_id.
+
+    Every chat lives entirely in one shard, so per-chat reads and writes touch
+    a single file and the parts of a clock batch that land on different
+    shards commit in parallel instead of queueing for one writer lock. The
+    shard of a chat depends on the shard count: changing it needs the data
+    moved by hand.
+
+    Behind AsyncDatabase every call, batches included, still passes through
+    its single database thread one at a time: batches never overlap each
+    other or other queries, so the gain is limited to the fsyncs within one
+    batch.
+    """
+
+    def __init__(self, db_path: str = "attendance.db", shards: int = 2, **database_options):
+        if shards < 1:
+            raise ValueError(f"shards must be at least 1, got {shards}")
+
+        self.db_path = db_path
+        self.shards = [
+            Database(shard_path(db_path, index), **database_options) for index in range(shards)
+        ]
+        # One writer thread per shard, like AsyncDatabase's single writer for one file
+        self._executors = [
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"database-shard{index}")
+            for index in range(shards)
+        ]
+        logger.info(f"Sharded storage ready: {shards} shards of {db_path}")
+
+    def shard_for(self, chat_id: int) -> Database:
+        """Shard holding a chat's data"""
+        return self.shards[shard_index(chat_id, len(self.shards))]
+
+    def map_shards(self, func: Callable[[Database], object]) -> List:
+        """Call func on every shard concurrently, returning the results in shard order"""
+        futures = [
+            executor.submit(func, shard) for executor, shard in zip(self._executors, self.shards)
+        ]
+        return [future.result() for future in futures]
+
+    def query_all(self, sql: str, params: Tuple = ()) -> List[Tuple]:
+        """Run a read-only query on every shard concurrently and concatenate the rows.
+
+        Meant for organisation-wide reports; aggregates have to be combined by
+        the caller, since each shard only sees its own chats.
+        """
+        rows = []
+        for shard_rows in self.map_shards(lambda shard: shard.read_query(sql, params)):
+            rows.extend(shard_rows)
+        return rows
+
+    def close(self):
+        """Close every shard and stop the shard writer threads"""
+        for executor in self._executors:
+            executor.shutdown(wait=True)
+        for shard in self.shards:
+            shard.close()
+
+    def add_chat_group(self, chat_id: int, chat_title: str, chat_type: str) -> bool:
+        """Add or update a chat group in its shard"""
+        return self.shard_for(chat_id).add_chat_group(chat_id, chat_title, chat_type)
+
+    def get_all_chat_groups(self) -> List[Dict]:
+        """Get the chat groups of every shard, newest first"""
+        groups = []
+        for shard_groups in self.map_shards(lambda shard: shard.get_all_chat_groups()):
+            groups.extend(shard_groups)
+        return sorted(groups, key=lambda group: group['created_at'] or '', reverse=True)
+
+    def clock_batch(self, records: List[Tuple]) -> List[ClockStatus]:
+        """Clock a batch, committing each shard's part in parallel on its writer thread"""
+        if not records:
+            return []
+
+        by_shard = {}  # shard index -> [(position, record)]
+        for position, record in enumerate(records):
+            index = shard_index(record[0], len(self.shards))
+            by_shard.setdefault(index, []).append((position, record))
+
+        futures = {
+            index: self._executors[index].submit(
+                self.shards[index].clock_batch, [record for _, record in items]
+            )
+            for index, items in by_shard.items()
+        }
+
+        results = [ClockStatus.FAILED] * len(records)
+        for index, items in by_shard.items():
+            for (position, _), status in zip(items, futures[index].result()):
+                results[position] = status
+        return results
+
+    def get_today_attendance(self, chat_id: int, date: datetime) -> Dict:
+        """Get attendance for a specific date from the chat's shard"""
+        return self.shard_for(chat_id).get_today_attendance(chat_id, date)
+
+    def get_user_names(self, user_ids: List[int]) -> Dict[int, UserName]:
+        """Get the latest names of users; a user in chats on several shards has a row in each"""
+        names = {}
+        for shard_names in self.map_shards(lambda shard: shard.get_user_names(user_ids)):
+            names.update(shard_names)
+        return names
+
+    def get_daily_summary(self, chat_id: int, date: datetime) -> DailySummary:
+        """Get a chat's attendance counts for a date"""
+        return self.shard_for(chat_id).get_daily_summary(chat_id, date)
+
+    def iter_attendance_report(self, chat_id: int, start: date, end: date,
+                               utc_offset: int = 0, fetch_size: int = 500) -> Iterator[Tuple]:
+        """Yield per-user attendance totals for a date range from the chat's shard"""
+        return self.shard_for(chat_id).iter_attendance_report(
+            chat_id, start, end, utc_offset=utc_offset, fetch_size=fetch_size
+        )
+
+    def peek_roster(self, chat_id: int, date: datetime) -> Optional[DailyRoster]:
+        """Get a chat's roster for a date if it is already in memory"""
+        return self.shard_for(chat_id).peek_roster(chat_id, date)
+
+    def get_roster(self, chat_id: int, date: datetime) -> DailyRoster:
+        """Get a chat's attendance roster for a date, loaded on the shard's writer thread.
+
+        The shard's clock_batch commits on that thread too, so a load never
+        interleaves with a commit of the same shard.
+        """
+        roster = self.peek_roster(chat_id, date)
+        if roster is not None:
+            return roster
+        index = shard_index(chat_id, len(self.shards))
+        return self._executors[index].submit(self.shards[index].get_roster, chat_id, date).result()
+
+    def get_members_without_attendance(self, chat_id: int, clock_type: str,
+                                       date: datetime, member_ids: List[int]) -> List[int]:
+        """Get member IDs who haven't clocked in/out on a specific date"""
+        return self.shard_for(chat_id).get_members_without_attendance(
+            chat_id, clock_type, date, member_ids
+        )
+
+    def save_configuration(self, chat_id: int, config_type: str, start_time: str,
+                           end_time: str, reminder_interval: int, enabled_days: List[int]) -> bool:
+        """Save clock in/out configuration in the chat's shard"""
+        return self.shard_for(chat_id).save_configuration(
+            chat_id, config_type, start_time, end_time, reminder_interval, enabled_days
+        )
+
+    def get_configuration(self, chat_id: int, config_type: str) -> Optional[ScheduleConfig]:
+        """Get configuration for a chat and type from the shard's snapshot"""
+        return self.shard_for(chat_id).get_configuration(chat_id, config_type)
+
+    def get_all_active_configurations(self) -> List[ScheduleConfig]:
+        """Get the active configurations of every shard"""
+        configs = []
+        for shard in self.shards:
+            configs.extend(shard.get_all_active_configurations())
+        return configs
+
+    def save_schedule_markers(self, last_tick: int, fired: List[Tuple[int, str, int]]) -> bool:
+        """Record each chat's markers in its shard and the last tick in every shard"""
+        by_shard = {}  # shard index -> [(chat_id, config_type, minute)]
+        for marker in fired:
+            by_shard.setdefault(shard_index(marker[0], len(self.shards)), []).append(marker)
+        futures = [
+            executor.submit(shard.save_schedule_markers, last_tick, by_shard.get(index, []))
+            for index, (executor, shard) in enumerate(zip(self._executors, self.shards))
+        ]
+        return all([future.result() for future in futures])
+
+    def get_schedule_markers(self) -> Tuple[Optional[int], ScheduleMarkers]:
+        """Get the markers of every shard; the last tick is the oldest any shard recorded"""
+        ticks, markers = [], {}
+        for last_tick, shard_markers in self.map_shards(lambda shard: shard.get_schedule_markers()):
+            if last_tick is not None:
+                ticks.append(last_tick)
+            markers.update(shard_markers)
+        return (min(ticks) if ticks else None), markers
+
+    def has_pending_migrations(self) -> bool:
+        """Check whether any shard still has online migration steps"""
+        return any(shard.has_pending_migrations() for shard in self.shards)
+
+    def run_online_migration_step(self) -> bool:
+        """Run one online migration step on every shard that has one"""
+        pending = self.map_shards(
+            lambda shard: shard.has_pending_migrations() and shard.run_online_migration_step()
+        )
+        return any(pending)
+
+    def archive_step(self, keep_months: int = 1, batch_size: int = 1000) -> Tuple[Optional[str], int]:
+        """Archive one batch on every shard, returning the oldest month touched and the rows moved"""
+        results = self.map_shards(lambda shard: shard.archive_step(keep_months, batch_size))
+        months = [month for month, _ in results if month is not None]
+        return (min(months) if months else None), sum(moved for _, moved in results)
+
+    def backfill_daily_summary(self) -> int:
+        """Rebuild daily_summary for past days on every shard"""
+        return sum(self.map_shards(lambda shard: shard.backfill_daily_summary()))
+
+    def checkpoint(self) -> Dict:
+        """Checkpoint the WAL of every shard"""
+        results = [result for result in self.map_shards(lambda shard: shard.checkpoint()) if result]
+        if not results:
+            return {}
+        return {
+            'busy': any(result['busy'] for result in results),
+            'wal_pages': sum(result['wal_pages'] for result in results),
+            'checkpointed_pages': sum(result['checkpointed_pages'] for result in results),
+            'seconds': max(result['seconds'] for result in results)
+        }
+
+    def optimize(self) -> Dict:
+        """Refresh query planner statistics on every shard"""
+        results = [result for result in self.map_shards(lambda shard: shard.optimize()) if result]
+        if not results:
+            return {}
+        return {
+            'analyzed': any(result['analyzed'] for result in results),
+            'seconds': max(result['seconds'] for result in results)
+        }
+
+    def incremental_vacuum_step(self, pages: int = 1000) -> int:
+        """Reclaim up to pages free pages on every shard, returning the most any shard reclaimed"""
+        return max(self.map_shards(lambda shard: shard.incremental_vacuum_step(pages)))
+
+    def full_vacuum(self) -> Dict:
+        """Rebuild every shard file"""
+        results = self.map_shards(lambda shard: shard.full_vacuum())
+        return {
+            'reclaimed_pages': sum(result['reclaimed_pages'] for result in results),
+            'seconds': max(result['seconds'] for result in results)
+        }
+
+    def backup(self, backup_dir: str, keep: int = 7, pages: int = 256, sleep: float = 0.01) -> Dict:
+        """Back up every shard into its own subdirectory of backup_dir"""
+        results = [
+            shard.backup(os.path.join(backup_dir, f"shard{index}"), keep=keep, pages=pages, sleep=sleep)
+            for index, shard in enumerate(self.shards)
+        ]
+        return {
+            'path': backup_dir,
+            'raw_bytes': sum(result['raw_bytes'] for result in results),
+            'compressed_bytes': sum(result['compressed_bytes'] for result in results),
+            'steps': sum(result['steps'] for result in results),
+            'rotated': sum(result['rotated'] for result in results),
+            'seconds': sum(result['seconds'] for result in results)
+        }
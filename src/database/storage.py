@@ -0,0 +1,162 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import date, datetime, time
+from enum import Enum
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from src.database.config_snapshot import ScheduleConfig
+from src.database.roster import DailyRoster
+from src.database.users import UserName
+
+ScheduleMarkers = Dict[Tuple[int, str], int]  # (chat_id, config_type) -> last fired epoch minute
+
+class ClockStatus(Enum):
+    """Outcome of a clock in/out attempt"""
+    INSERTED = 'inserted'
+    ALREADY_CLOCKED = 'already_clocked'
+    NOT_CLOCKED_IN = 'not_clocked_in'
+    FAILED = 'failed'
+
+@dataclass(frozen=True)
+class DailySummary:
+    """Attendance counts of one chat for one day"""
+    chat_id: int
+    day_num: int
+    in_count: int = 0
+    out_count: int = 0
+    first_in: Optional[int] = None  # epoch seconds
+    last_out: Optional[int] = None  # epoch seconds
+
+class AttendanceStorage(ABC):
+    """Storage engine behind AsyncDatabase.
+
+    Methods are blocking and are called from the database threads of
+    AsyncDatabase. Engines without migrations, archiving or file maintenance
+    keep the no-op defaults at the bottom.
+    """
+
+    @abstractmethod
+    def close(self):
+        """Release every resource held by the engine"""
+
+    @abstractmethod
+    def add_chat_group(self, chat_id: int, chat_title: str, chat_type: str) -> bool:
+        """Add or update a chat group"""
+
+    @abstractmethod
+    def get_all_chat_groups(self) -> List[Dict]:
+        """Get all active chat groups, newest first"""
+
+    @abstractmethod
+    def clock_batch(self, records: List[Tuple]) -> List[ClockStatus]:
+        """Clock several (chat_id, user_id, user_name, username, clock_type, clock_time, day) records.
+
+        day is the local calendar day (a date or datetime) the clock is filed
+        under, normally that of clock_time. A clock out needs the same day's
+        clock in, each user clocks in and out at most once per day, and the
+        result has one status per record in order.
+        """
+
+    def clock(self, chat_id: int, user_id: int, user_name: str, username: str,
+              clock_type: str, clock_time: datetime, day: Optional[date] = None) -> ClockStatus:
+        """Clock a user in or out, filed under day or else the day of clock_time"""
+        return self.clock_batch([
+            (chat_id, user_id, user_name, username, clock_type, clock_time, day or clock_time)
+        ])[0]
+
+    def record_attendance(self, chat_id: int, user_id: int, user_name: str,
+                          username: str, clock_type: str, clock_time: datetime) -> bool:
+        """Record attendance, returning True when a new record was stored"""
+        status = self.clock(chat_id, user_id, user_name, username, clock_type, clock_time)
+        return status == ClockStatus.INSERTED
+
+    @abstractmethod
+    def get_today_attendance(self, chat_id: int, date: datetime) -> Dict:
+        """Get {'clock_in': {...}, 'clock_out': {...}} keyed by user id string for a date"""
+
+    @abstractmethod
+    def get_user_names(self, user_ids: List[int]) -> Dict[int, UserName]:
+        """Get the latest (user_name, username) of users by Telegram user id"""
+
+    @abstractmethod
+    def get_daily_summary(self, chat_id: int, date: datetime) -> DailySummary:
+        """Get a chat's attendance counts for a date"""
+
+    @abstractmethod
+    def iter_attendance_report(self, chat_id: int, start: date, end: date,
+                               utc_offset: int = 0, fetch_size: int = 500) -> Iterator[Tuple]:
+        """Yield (user_id, user_name, in_days, out_days, earliest_in, latest_in) per user.
+
+        Ordered by name ignoring case; earliest_in and latest_in are HH:MM at
+        utc_offset seconds from UTC, or None without clock-ins.
+        """
+
+    @abstractmethod
+    def peek_roster(self, chat_id: int, date: datetime) -> Optional[DailyRoster]:
+        """Get a chat's roster for a date if it is available without I/O"""
+
+    @abstractmethod
+    def get_roster(self, chat_id: int, date: datetime) -> DailyRoster:
+        """Get a chat's attendance roster for a date"""
+
+    @abstractmethod
+    def get_members_without_attendance(self, chat_id: int, clock_type: str,
+                                       date: datetime, member_ids: List[int]) -> List[int]:
+        """Get member IDs who haven't clocked in/out on a specific date"""
+
+    @abstractmethod
+    def save_configuration(self, chat_id: int, config_type: str, start_time: str,
+                           end_time: str, reminder_interval: int, enabled_days: List[int]) -> bool:
+        """Save clock in/out configuration"""
+
+    @abstractmethod
+    def get_configuration(self, chat_id: int, config_type: str) -> Optional[ScheduleConfig]:
+        """Get configuration for a chat and type without I/O"""
+
+    @abstractmethod
+    def get_all_active_configurations(self) -> List[ScheduleConfig]:
+        """Get all active configurations without I/O"""
+
+    @abstractmethod
+    def save_schedule_markers(self, last_tick: int, fired: List[Tuple[int, str, int]]) -> bool:
+        """Record the last dispatched minute and the (chat_id, config_type, minute) events just fired.
+
+        Minutes are counted since the epoch; a marker never moves backwards.
+        """
+
+    @abstractmethod
+    def get_schedule_markers(self) -> Tuple[Optional[int], ScheduleMarkers]:
+        """Get the last dispatched minute, None before the first tick, and every last-fired marker"""
+
+    @staticmethod
+    def _parse_time(time_str: str) -> time:
+        """Parse a stored HH:MM string"""
+        return datetime.strptime(time_str.strip(), '%H:%M').time()
+
+    def has_pending_migrations(self) -> bool:
+        """Check whether online migration steps are still waiting to run"""
+        return False
+
+    def run_online_migration_step(self) -> bool:
+        """Run one online migration step, returning True while work remains"""
+        return False
+
+    def archive_step(self, keep_months: int = 1, batch_size: int = 1000) -> Tuple[Optional[str], int]:
+        """Move one batch of closed attendance out of the hot set, returning (month, rows moved)"""
+        return None, 0
+
+    def checkpoint(self) -> Dict:
+        """Flush the write-ahead log"""
+        return {}
+
+    def optimize(self) -> Dict:
+        """Refresh query planner statistics"""
+        return {}
+
+    def incremental_vacuum_step(self, pages: int = 1000) -> int:
+        """Reclaim up to pages free pages, returning how many were reclaimed"""
+        return 0
+
+    def backup(self, backup_dir: str, keep: int = 7, pages: int = 256, sleep: float = 0.01) -> Dict:
+        """Write a compressed backup, returning {} when the engine has nothing to back up"""
+        return {}
@@ -0,0 +1,35 @@
+from datetime import date, datetime, timedelta
+
+# attendance.day_num counts local calendar days from this date, so
+# date(day_num * 86400, 'unixepoch') turns it back into YYYY-MM-DD in SQL
+EPOCH_DATE = date(1970, 1, 1)
+
+def day_number(day: date) -> int:
+    """Local calendar day as an integer day number"""
+    if isinstance(day, datetime):
+        day = day.date()
+    return (day - EPOCH_DATE).days
+
+def day_date(day_num: int) -> date:
+    """Calendar date of a day number"""
+    return EPOCH_DATE + timedelta(days=day_num)
+
+def epoch_seconds(moment: datetime) -> int:
+    """Moment as whole seconds since the Unix epoch (UTC)"""
+    return int(moment.timestamp())
+
+def from_epoch(seconds: int, tz) -> datetime:
+    """Epoch seconds as an aware datetime in a timezone"""
+    return datetime.fromtimestamp(seconds, tz)
+
+def local_day_number(seconds: int, tz) -> int:
+    """Local calendar day number of a moment given in epoch seconds"""
+    return day_number(from_epoch(seconds, tz))
+
+# SQL converting the legacy text clock_time (stored with its UTC offset) to
+# epoch seconds; rows whose clock_time can't be parsed fall back to midnight
+# UTC of their date_only. date_only itself is not trusted: older rows carry
+# the UTC day, so day numbers are always derived from the converted time
+LEGACY_CLOCK_TS_SQL = (
+    "COALESCE(CAST(strftime('%s', clock_time) AS INTEGER), CAST(strftime('%s', date_only) AS INTEGER))"
+)
@@ -0,0 +1,32 @@
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+UserName = Tuple[str, Optional[str]]  # (user_name, username)
+
+class UserCache:
+    """Latest names of recently seen users, evicting the least recently used"""
+
+    def __init__(self, max_size: int = 10000):
+        self.max_size = max_size
+        self._names = OrderedDict()  # user_id -> (user_name, username)
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> Optional[UserName]:
+        """Get a cached name, marking it as recently used"""
+        with self._lock:
+            name = self._names.get(user_id)
+            if name is not None:
+                self._names.move_to_end(user_id)
+            return name
+
+    def put(self, user_id: int, user_name: str, username: Optional[str]):
+        """Cache the current name of a user"""
+        with self._lock:
+            self._names[user_id] = (user_name, username)
+            self._names.move_to_end(user_id)
+            while len(self._names) > self.max_size:
+                self._names.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._names)
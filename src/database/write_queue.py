@@ -0,0 +1,68 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+class AttendanceWriteQueue:
+    """Write-behind queue that commits attendance bursts as one transaction"""
+
+    def __init__(self, flush: Callable[[List[Tuple]], Awaitable[List[Any]]],
+                 window_ms: int = 5, max_batch: int = 200, failed_result: Any = False):
+        self._flush = flush
+        self._failed_result = failed_result
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+
+        self._pending = []  # (record, future) pairs waiting for the next flush
+        self._timer = None
+        self._flush_tasks = set()
+
+    async def submit(self, record: Tuple) -> Any:
+        """Queue an attendance record and wait for its own commit result"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((record, future))
+
+        if len(self._pending) >= self.max_batch:
+            self._start_flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._start_flush)
+
+        return await future
+
+    def _start_flush(self):
+        """Hand the pending batch to a background flush task"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        if not self._pending:
+            return
+
+        batch, self._pending = self._pending, []
+        task = asyncio.ensure_future(self._flush_batch(batch))
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+
+    async def _flush_batch(self, batch: List[Tuple]):
+        """Commit a batch and resolve every caller's future"""
+        records = [record for record, _ in batch]
+        try:
+            results = await self._flush(records)
+        except Exception as e:
+            logger.error(f"❌ Error flushing {len(records)} attendance records: {e}")
+            results = [self._failed_result] * len(records)
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+        if len(records) > 1:
+            logger.info(f"Committed {len(records)} attendance records in one transaction")
+
+    async def close(self):
+        """Flush everything still queued and wait for in-flight commits"""
+        self._start_flush()
+        if self._flush_tasks:
+            await asyncio.gather(*self._flush_tasks, return_exceptions=True)
@@ -4,7 +4,7 @@ from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 from telegram.constants import ParseMode
 
-from src.database.database import Database
+from src.database.async_database import AsyncDatabase
 from src.config.settings import Settings
 from src.utils.helpers import (
     get_current_time, format_configuration_display, 
@@ -14,7 +14,7 @@ from src.utils.helpers import (
 logger = logging.getLogger(__name__)
 
 class CallbackHandlers:
-    def __init__(self, database: Database, scheduled_handlers=None):
+    def __init__(self, database: AsyncDatabase, scheduled_handlers=None):
         self.db = database
         self.scheduled_handlers = scheduled_handlers
         self.config_states = {}  # Store configuration state for each user
@@ -110,10 +110,10 @@ class CallbackHandlers:
         current_config = self.db.get_configuration(chat_id, 'clock_in')
 
         if current_config:
-            start_time = current_config['start_time']
-            end_time = current_config['end_time']
-            interval = current_config['reminder_interval']
-            enabled_days = current_config['enabled_days']
+            start_time = current_config.start_time_str
+            end_time = current_config.end_time_str
+            interval = current_config.reminder_interval
+            enabled_days = current_config.enabled_days
         else:
             start_time = Settings.DEFAULT_CLOCK_IN_START
             end_time = Settings.DEFAULT_CLOCK_IN_END
@@ -150,10 +150,10 @@ class CallbackHandlers:
         current_config = self.db.get_configuration(chat_id, 'clock_out')
 
         if current_config:
-            start_time = current_config['start_time']
-            end_time = current_config['end_time']
-            interval = current_config['reminder_interval']
-            enabled_days = current_config['enabled_days']
+            start_time = current_config.start_time_str
+            end_time = current_config.end_time_str
+            interval = current_config.reminder_interval
+            enabled_days = current_config.enabled_days
         else:
             start_time = Settings.DEFAULT_CLOCK_OUT_START
             end_time = Settings.DEFAULT_CLOCK_OUT_END
@@ -201,6 +201,15 @@ class CallbackHandlers:
         else:
             message += "🔴 **Clock Out:** Belum dikonfigurasi\n\n"
 
+        next_event = self.scheduled_handlers.dispatcher.next_event(chat_id) if self.scheduled_handlers else None
+        if next_event:
+            when, events = next_event
+            names = ", ".join(sorted({Settings.get_clock_type_name(event.config_type) for event in events}))
+            message += (
+                f"⏭️ **Jadwal berikutnya:** {Settings.get_day_name(when.weekday())} "
+                f"{when.strftime('%H:%M')} ({names})\n\n"
+            )
+
         keyboard = [
             [InlineKeyboardButton("🔙 Kembali", callback_data="config_main")]
         ]
@@ -291,8 +300,8 @@ class CallbackHandlers:
             current_config = self.db.get_configuration(chat_id, config_type)
 
             # Initialize enabled_days with default or current value
-            if current_config and 'enabled_days' in current_config:
-                enabled_days = current_config['enabled_days']
+            if current_config:
+                enabled_days = current_config.enabled_days
             else:
                 enabled_days = [0, 1, 2, 3, 4]  # Monday to Friday
 
@@ -361,8 +370,8 @@ class CallbackHandlers:
             current_config = self.db.get_configuration(chat_id, config_type)
 
             # Initialize enabled_days with default or current value
-            if current_config and 'enabled_days' in current_config:
-                enabled_days = current_config['enabled_days'].copy()
+            if current_config:
+                enabled_days = current_config.enabled_days
             else:
                 enabled_days = [0, 1, 2, 3, 4].copy()  # Monday to Friday
 
@@ -377,9 +386,9 @@ class CallbackHandlers:
 
             # Update configuration
             if current_config:
-                start_time = current_config['start_time']
-                end_time = current_config['end_time']
-                interval = current_config['reminder_interval']
+                start_time = current_config.start_time_str
+                end_time = current_config.end_time_str
+                interval = current_config.reminder_interval
             else:
                 if config_type == 'clock_in':
                     start_time = "07:00"
@@ -390,7 +399,7 @@ class CallbackHandlers:
                 interval = 15
 
             # Save configuration
-            success = self.db.save_configuration(chat_id, config_type, start_time, end_time, interval, enabled_days)
+            success = await self.db.save_configuration(chat_id, config_type, start_time, end_time, interval, enabled_days)
 
             if success:
                 day_name = Settings.get_day_name(day_num)
@@ -399,7 +408,7 @@ class CallbackHandlers:
 
                 # Reload scheduler with new configuration
                 if self.scheduled_handlers:
-                    self.scheduled_handlers.schedule_daily_messages(chat_id, context)
+                    await self.scheduled_handlers.schedule_daily_messages(chat_id, context)
                     logger.info(f"Reloaded scheduler for chat {chat_id} after configuration change")
 
                 # Refresh the days setup interface
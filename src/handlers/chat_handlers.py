@@ -3,14 +3,14 @@ from telegram import Update
 from telegram.ext import ContextTypes, ChatMemberHandler
 from telegram.constants import ParseMode
 
-from src.database.database import Database
+from src.database.async_database import AsyncDatabase
 from src.config.settings import Settings
 from src.handlers.scheduled_handlers import ScheduledHandlers
 
 logger = logging.getLogger(__name__)
 
 class ChatHandlers:
-    def __init__(self, database: Database, scheduled_handlers: ScheduledHandlers):
+    def __init__(self, database: AsyncDatabase, scheduled_handlers: ScheduledHandlers):
         self.db = database
         self.scheduled_handlers = scheduled_handlers
 
@@ -29,11 +29,22 @@ class ChatHandlers:
                 # Bot admin rights were removed
                 await self._handle_bot_removed_as_admin(chat, context)
 
+    async def handle_chat_member(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Resume suppressed reminders when the administrators reminders are sent to change"""
+        result = update.chat_member
+        admin_statuses = ['administrator', 'creator']
+        was_admin = result.old_chat_member.status in admin_statuses
+        is_admin = result.new_chat_member.status in admin_statuses
+
+        if was_admin != is_admin and not result.new_chat_member.user.is_bot:
+            logger.info(f"Administrators of chat {result.chat.id} changed")
+            self.scheduled_handlers.dispatcher.resume_chat(result.chat.id)
+
     async def _handle_bot_added_as_admin(self, chat, context: ContextTypes.DEFAULT_TYPE):
         """Handle when bot is added as admin"""
         try:
             # Add chat group to database
-            self.db.add_chat_group(chat.id, chat.title, chat.type)
+            await self.db.add_chat_group(chat.id, chat.title, chat.type)
 
             # Set up default configurations if none exist
             clock_in_config = self.db.get_configuration(chat.id, 'clock_in')
@@ -41,7 +52,7 @@ class ChatHandlers:
 
             if not clock_in_config:
                 # Set default clock in configuration
-                self.db.save_configuration(
+                await self.db.save_configuration(
                     chat_id=chat.id,
                     config_type='clock_in',
                     start_time=Settings.DEFAULT_CLOCK_IN_START,
@@ -52,7 +63,7 @@ class ChatHandlers:
 
             if not clock_out_config:
                 # Set default clock out configuration
-                self.db.save_configuration(
+                await self.db.save_configuration(
                     chat_id=chat.id,
                     config_type='clock_out',
                     start_time=Settings.DEFAULT_CLOCK_OUT_START,
@@ -62,7 +73,7 @@ class ChatHandlers:
                 )
 
             # Schedule daily messages and reminders
-            self.scheduled_handlers.schedule_daily_messages(chat.id, context)
+            await self.scheduled_handlers.schedule_daily_messages(chat.id, context)
 
             # Send welcome message
             welcome_message = (
@@ -96,35 +107,7 @@ class ChatHandlers:
     async def _handle_bot_removed_as_admin(self, chat, context: ContextTypes.DEFAULT_TYPE):
         """Handle when bot admin rights are removed"""
         try:
-            job_queue = context.job_queue
-
-            # Remove all scheduled jobs for this chat
-            job_patterns = [
-                f"clock_in_{chat.id}",
-                f"clock_out_{chat.id}",
-                f"clock_in_reminder_{chat.id}",
-                f"clock_out_reminder_{chat.id}"
-            ]
-
-            for pattern in job_patterns:
-                current_jobs = job_queue.get_jobs_by_name(pattern)
-                for job in current_jobs:
-                    job.schedule_removal()
-
-            # Also remove numbered reminder jobs
-            for hour in range(8, 22):
-                job_name = f"clock_in_reminder_{chat.id}_{hour}"
-                current_jobs = job_queue.get_jobs_by_name(job_name)
-                for job in current_jobs:
-                    job.schedule_removal()
-
-                job_name = f"clock_out_reminder_{chat.id}_{hour}"
-                current_jobs = job_queue.get_jobs_by_name(job_name)
-                for job in current_jobs:
-                    job.schedule_removal()
-
-            logger.info(f"Removed all scheduled jobs for chat {chat.id}")
-
+            self.scheduled_handlers.unschedule_chat(chat.id)
         except Exception as e:
             logger.error(f"Error handling bot removed as admin for chat {chat.id}: {e}")
 
@@ -158,7 +141,7 @@ class ChatHandlers:
 
             # Add chat group to database
             try:
-                self.db.add_chat_group(chat.id, chat.title, chat.type)
+                await self.db.add_chat_group(chat.id, chat.title, chat.type)
                 logger.info(f"Chat group {chat.id} ({chat.title}) added to database via /setup")
             except Exception as e:
                 logger.error(f"Error adding chat group to database: {e}")
@@ -171,7 +154,7 @@ class ChatHandlers:
 
             if not clock_in_config:
                 # Set default clock in configuration
-                success = self.db.save_configuration(
+                success = await self.db.save_configuration(
                     chat_id=chat.id,
                     config_type='clock_in',
                     start_time=Settings.DEFAULT_CLOCK_IN_START,
@@ -186,7 +169,7 @@ class ChatHandlers:
 
             if not clock_out_config:
                 # Set default clock out configuration
-                success = self.db.save_configuration(
+                success = await self.db.save_configuration(
                     chat_id=chat.id,
                     config_type='clock_out',
                     start_time=Settings.DEFAULT_CLOCK_OUT_START,
@@ -200,7 +183,7 @@ class ChatHandlers:
                     logger.error(f"Failed to create default clock_out config for chat {chat.id}")
 
             # Setup scheduling
-            self.scheduled_handlers.schedule_daily_messages(chat.id, context)
+            await self.scheduled_handlers.schedule_daily_messages(chat.id, context)
 
             # Get current configurations (refresh after creating defaults)
             clock_in_config = self.db.get_configuration(chat.id, 'clock_in')
@@ -211,12 +194,12 @@ class ChatHandlers:
             message += f"🆔 **Chat ID:** {chat.id}\n\n"
 
             if clock_in_config:
-                message += f"🟢 **Clock In:** {clock_in_config['start_time']} - {clock_in_config['end_time']}\n"
+                message += f"🟢 **Clock In:** {clock_in_config.start_time_str} - {clock_in_config.end_time_str}\n"
             else:
                 message += f"🟢 **Clock In:** {Settings.DEFAULT_CLOCK_IN_START} - {Settings.DEFAULT_CLOCK_IN_END}\n"
 
             if clock_out_config:
-                message += f"🔴 **Clock Out:** {clock_out_config['start_time']} - {clock_out_config['end_time']}\n"
+                message += f"🔴 **Clock Out:** {clock_out_config.start_time_str} - {clock_out_config.end_time_str}\n"
             else:
                 message += f"🔴 **Clock Out:** {Settings.DEFAULT_CLOCK_OUT_START} - {Settings.DEFAULT_CLOCK_OUT_END}\n"
 
@@ -1,20 +1,24 @@
 import logging
+import os
 from datetime import datetime
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 from telegram.constants import ParseMode
 
-from src.database.database import Database
+from src.database.async_database import AsyncDatabase
+from src.database.database import ClockStatus
 from src.config.settings import Settings
+from src.scheduler.index import attendance_day
 from src.utils.helpers import (
     get_current_time, format_attendance_report, 
-    format_configuration_display, get_enabled_days_display
+    format_configuration_display, get_enabled_days_display, parse_date_string,
+    format_clock_time
 )
 
 logger = logging.getLogger(__name__)
 
 class CommandHandlers:
-    def __init__(self, database: Database):
+    def __init__(self, database: AsyncDatabase):
         self.db = database
     
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -58,27 +62,30 @@ class CommandHandlers:
             return
         
         current_time = get_current_time()
-        today_attendance = self.db.get_today_attendance(chat.id, current_time)
+        # After midnight an overnight window still files under the day it started
+        day = attendance_day(self.db.get_configuration(chat.id, 'clock_in'), current_time)
         
-        # Check if already clocked in today
-        if str(user.id) in today_attendance.get('clock_in', {}):
-            clock_in_time = today_attendance['clock_in'][str(user.id)]['time']
-            await update.message.reply_text(
-                f"⚠️ {user.first_name}, Anda sudah clock in hari ini pada {clock_in_time}"
-            )
-            return
-        
-        # Record clock in
-        success = self.db.record_attendance(
+        # Record clock in; duplicates are detected in the same statement
+        status = await self.db.clock(
             chat_id=chat.id,
             user_id=user.id,
             user_name=user.first_name or user.username or 'Unknown',
             username=user.username,
             clock_type='in',
-            clock_time=current_time
+            clock_time=current_time,
+            day=day
         )
         
-        if success:
+        # Check if already clocked in today
+        if status == ClockStatus.ALREADY_CLOCKED:
+            roster = await self.db.get_roster(chat.id, day)
+            clock_in_time = roster.get_clock_time(user.id, 'in')
+            await update.message.reply_text(
+                f"⚠️ {user.first_name}, Anda sudah clock in hari ini pada {format_clock_time(clock_in_time)}"
+            )
+            return
+        
+        if status == ClockStatus.INSERTED:
             await update.message.reply_text(
                 f"✅ **{user.first_name}** berhasil clock in pada {current_time.strftime('%H:%M:%S')}"
             )
@@ -95,34 +102,37 @@ class CommandHandlers:
             return
         
         current_time = get_current_time()
-        today_attendance = self.db.get_today_attendance(chat.id, current_time)
+        # After midnight an overnight window still files under the day it started
+        day = attendance_day(self.db.get_configuration(chat.id, 'clock_out'), current_time)
+        
+        # Record clock out; the clock in and duplicate checks run in the same statement
+        status = await self.db.clock(
+            chat_id=chat.id,
+            user_id=user.id,
+            user_name=user.first_name or user.username or 'Unknown',
+            username=user.username,
+            clock_type='out',
+            clock_time=current_time,
+            day=day
+        )
         
         # Check if already clocked in
-        if str(user.id) not in today_attendance.get('clock_in', {}):
+        if status == ClockStatus.NOT_CLOCKED_IN:
             await update.message.reply_text(
                 f"⚠️ {user.first_name}, Anda harus clock in terlebih dahulu!"
             )
             return
         
         # Check if already clocked out
-        if str(user.id) in today_attendance.get('clock_out', {}):
-            clock_out_time = today_attendance['clock_out'][str(user.id)]['time']
+        if status == ClockStatus.ALREADY_CLOCKED:
+            roster = await self.db.get_roster(chat.id, day)
+            clock_out_time = roster.get_clock_time(user.id, 'out')
             await update.message.reply_text(
-                f"⚠️ {user.first_name}, Anda sudah clock out hari ini pada {clock_out_time}"
+                f"⚠️ {user.first_name}, Anda sudah clock out hari ini pada {format_clock_time(clock_out_time)}"
             )
             return
         
-        # Record clock out
-        success = self.db.record_attendance(
-            chat_id=chat.id,
-            user_id=user.id,
-            user_name=user.first_name or user.username or 'Unknown',
-            username=user.username,
-            clock_type='out',
-            clock_time=current_time
-        )
-        
-        if success:
+        if status == ClockStatus.INSERTED:
             await update.message.reply_text(
                 f"✅ **{user.first_name}** berhasil clock out pada {current_time.strftime('%H:%M:%S')}"
             )
@@ -138,10 +148,10 @@ class CommandHandlers:
             return
         
         current_time = get_current_time()
-        today_attendance = self.db.get_today_attendance(chat.id, current_time)
+        summary = await self.db.get_daily_summary(chat.id, current_time)
         
-        clock_in_count = len(today_attendance.get('clock_in', {}))
-        clock_out_count = len(today_attendance.get('clock_out', {}))
+        clock_in_count = summary.in_count
+        clock_out_count = summary.out_count
         
         await update.message.reply_text(
             f"📊 **Status Kehadiran Hari Ini**\n\n"
@@ -171,11 +181,85 @@ class CommandHandlers:
             return
         
         current_time = get_current_time()
-        today_attendance = self.db.get_today_attendance(chat.id, current_time)
+        today_attendance = await self.db.get_today_attendance(chat.id, current_time)
         
         report = format_attendance_report(today_attendance, current_time)
         await update.message.reply_text(report, parse_mode=ParseMode.MARKDOWN)
     
+    async def report_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handle /report <from> <to> command"""
+        chat = update.effective_chat
+        
+        if chat.type == 'private':
+            await update.message.reply_text("❌ Perintah ini hanya berfungsi di grup!")
+            return
+        
+        if not await self.is_admin(update, context):
+            await update.message.reply_text("⚠️ Hanya administrator yang dapat menggunakan perintah ini.")
+            return
+        
+        usage = (
+            "📋 Penggunaan: /report <dari> <sampai>\n"
+            "Contoh: /report 2024-01-01 2024-01-31 atau /report 01/01/2024 31/01/2024"
+        )
+        if len(context.args) != 2:
+            await update.message.reply_text(usage)
+            return
+        
+        start_date = parse_date_string(context.args[0])
+        end_date = parse_date_string(context.args[1])
+        if not start_date or not end_date:
+            await update.message.reply_text(f"❌ Format tanggal tidak valid.\n\n{usage}")
+            return
+        if start_date > end_date:
+            await update.message.reply_text("❌ Tanggal awal harus sebelum tanggal akhir.")
+            return
+        
+        header = (
+            f"📊 Laporan Kehadiran {start_date.strftime('%d/%m/%Y')} - {end_date.strftime('%d/%m/%Y')}\n"
+        )
+        # Pages are fetched and sent one at a time, so memory stays flat
+        # however long the range is
+        pages = self.db.iter_report_pages(chat.id, start_date, end_date, header)
+        try:
+            async for page in pages:
+                await update.message.reply_text(page)
+        except Exception as e:
+            logger.error(f"Error in report_command: {e}")
+            await update.message.reply_text("❌ Terjadi kesalahan saat membuat laporan.")
+        finally:
+            await pages.aclose()
+    
+    async def backup_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handle /backup command - online database backup for bot administrators"""
+        user = update.effective_user
+        
+        if user.id not in Settings.BOT_ADMIN_IDS:
+            await update.message.reply_text("⚠️ Hanya admin bot yang dapat menggunakan perintah ini.")
+            return
+        
+        await update.message.reply_text("💾 Membuat backup database...")
+        try:
+            result = await self.db.backup(
+                Settings.BACKUP_DIR,
+                keep=Settings.BACKUP_KEEP,
+                pages=Settings.BACKUP_PAGES_PER_STEP,
+                sleep=Settings.BACKUP_STEP_SLEEP_MS / 1000
+            )
+            if not result:
+                await update.message.reply_text("ℹ️ Penyimpanan ini tidak memiliki file database untuk di-backup.")
+                return
+            await update.message.reply_text(
+                f"✅ Backup selesai: {os.path.basename(result['path'])}\n"
+                f"📦 Ukuran: {result['compressed_bytes'] / 1024:.1f} KB "
+                f"(asli {result['raw_bytes'] / 1024:.1f} KB)\n"
+                f"⏱️ Waktu: {result['seconds']:.1f} detik"
+            )
+            logger.info(f"Manual backup triggered by {user.first_name} ({user.id})")
+        except Exception as e:
+            logger.error(f"Error in backup_command: {e}")
+            await update.message.reply_text("❌ Gagal membuat backup database.")
+    
     async def config_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /config command"""
         chat = update.effective_chat
@@ -227,6 +311,7 @@ class CommandHandlers:
 /clockout - Clock out manual
 /check - Cek kehadiran hari ini
 /status - Laporan kehadiran detail
+/report - Laporan kehadiran periode (admin)
 /config - Konfigurasi clock in/out
 /setup - Setup pengingat otomatis
 /trigger_clockin - Kirim pengingat clock in manual
@@ -261,8 +346,8 @@ class CommandHandlers:
                 return
             
             # Get today's attendance
-            today_attendance = self.db.get_today_attendance(chat.id, current_time)
-            clock_in_count = len(today_attendance.get('clock_in', {}))
+            summary = await self.db.get_daily_summary(chat.id, current_time)
+            clock_in_count = summary.in_count
             
             # Create reminder message
             message = (
@@ -310,9 +395,9 @@ class CommandHandlers:
                 return
             
             # Get today's attendance
-            today_attendance = self.db.get_today_attendance(chat.id, current_time)
-            clock_in_count = len(today_attendance.get('clock_in', {}))
-            clock_out_count = len(today_attendance.get('clock_out', {}))
+            summary = await self.db.get_daily_summary(chat.id, current_time)
+            clock_in_count = summary.in_count
+            clock_out_count = summary.out_count
             
             # Create reminder message
             message = (
@@ -1,10 +1,10 @@
 import logging
 from datetime import datetime, timedelta
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram import Bot, Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 from telegram.constants import ParseMode
 
-from src.database.database import Database
+from src.database.async_database import AsyncDatabase
 from src.config.settings import Settings
 from src.utils.helpers import (
     get_current_time, parse_time_string, validate_configuration,
@@ -14,7 +14,7 @@ from src.utils.helpers import (
 logger = logging.getLogger(__name__)
 
 class MessageHandlers:
-    def __init__(self, database: Database, callback_handlers, scheduled_handlers=None):
+    def __init__(self, database: AsyncDatabase, callback_handlers, scheduled_handlers=None):
         self.db = database
         self.callback_handlers = callback_handlers
         self.scheduled_handlers = scheduled_handlers
@@ -88,9 +88,10 @@ class MessageHandlers:
             )
             return
 
-        if start_time >= end_time:
+        # A window ending before it starts runs past midnight, e.g. a night shift 22:00 - 06:00
+        if start_time == end_time:
             await update.message.reply_text(
-                "❌ Waktu mulai harus lebih awal dari waktu selesai!"
+                "❌ Waktu mulai dan waktu selesai tidak boleh sama!"
             )
             return
 
@@ -98,14 +99,14 @@ class MessageHandlers:
         current_config = self.db.get_configuration(chat_id, config_type)
 
         if current_config:
-            interval = current_config['reminder_interval']
-            enabled_days = current_config['enabled_days']
+            interval = current_config.reminder_interval
+            enabled_days = current_config.enabled_days
         else:
             interval = Settings.DEFAULT_REMINDER_INTERVAL
             enabled_days = Settings.DEFAULT_ENABLED_DAYS
 
         # Save configuration
-        success = self.db.save_configuration(
+        success = await self.db.save_configuration(
             chat_id, config_type, 
             start_time_str.strip(), end_time_str.strip(), 
             interval, enabled_days
@@ -114,7 +115,7 @@ class MessageHandlers:
         if success:
             # Reload scheduler with new configuration
             if self.scheduled_handlers:
-                self.scheduled_handlers.schedule_daily_messages(chat_id, context)
+                await self.scheduled_handlers.schedule_daily_messages(chat_id, context)
                 logger.info(f"Reloaded scheduler for chat {chat_id} after time configuration change")
 
             await update.message.reply_text(
@@ -153,9 +154,9 @@ class MessageHandlers:
         current_config = self.db.get_configuration(chat_id, config_type)
 
         if current_config:
-            start_time = current_config['start_time']
-            end_time = current_config['end_time']
-            enabled_days = current_config['enabled_days']
+            start_time = current_config.start_time_str
+            end_time = current_config.end_time_str
+            enabled_days = current_config.enabled_days
         else:
             if config_type == 'clock_in':
                 start_time = Settings.DEFAULT_CLOCK_IN_START
@@ -166,14 +167,14 @@ class MessageHandlers:
             enabled_days = Settings.DEFAULT_ENABLED_DAYS
 
         # Save configuration
-        success = self.db.save_configuration(
+        success = await self.db.save_configuration(
             chat_id, config_type, start_time, end_time, interval, enabled_days
         )
 
         if success:
             # Reload scheduler with new configuration
             if self.scheduled_handlers:
-                self.scheduled_handlers.schedule_daily_messages(chat_id, context)
+                await self.scheduled_handlers.schedule_daily_messages(chat_id, context)
                 logger.info(f"Reloaded scheduler for chat {chat_id} after interval configuration change")
 
             await update.message.reply_text(
@@ -185,156 +186,108 @@ class MessageHandlers:
         else:
             await update.message.reply_text("❌ Gagal menyimpan konfigurasi")
 
-    async def send_clock_in_reminder(self, context: ContextTypes.DEFAULT_TYPE):
-        """Send clock in reminder to all active chats"""
-        current_time = get_current_time()
-        logger.info(f"=== DEBUG: send_clock_in_reminder called at {current_time} ===")
-
-        # Get all chat groups
-        chat_groups = self.db.get_all_chat_groups()
-        logger.info(f"DEBUG: Found {len(chat_groups)} chat groups")
-
-        for chat_group in chat_groups:
-            chat_id = chat_group['chat_id']
-            logger.info(f"DEBUG: Processing chat {chat_id}")
-
-            try:
-                # Get configuration
-                config = self.db.get_configuration(chat_id, 'clock_in')
-                if not config:
-                    logger.info(f"DEBUG: No clock_in config for chat {chat_id}")
-                    continue
-
-                logger.info(f"DEBUG: Config found for chat {chat_id}: {config}")
-
-                # Check if today is enabled day
-                current_weekday = current_time.weekday()
-                logger.info(f"DEBUG: Current weekday: {current_weekday}, Enabled days: {config['enabled_days']}")
-
-                if current_weekday not in config['enabled_days']:
-                    logger.info(f"DEBUG: Today ({current_weekday}) not in enabled days for chat {chat_id}")
-                    continue
-
-                # Check if current time is within the configured time range
-                start_time = parse_time_string(config['start_time'])
-                end_time = parse_time_string(config['end_time'])
-                current_time_obj = current_time.time()
-
-                logger.info(f"DEBUG: Time check - Current: {current_time_obj}, Start: {start_time}, End: {end_time}")
-
-                if not (start_time <= current_time_obj <= end_time):
-                    logger.info(f"DEBUG: Current time not in range for chat {chat_id}")
-                    continue
-
-                # Get today's attendance
-                today_attendance = self.db.get_today_attendance(chat_id, current_time)
-
-                # Check if reminder should be sent (simplified logic)
-                clock_in_count = len(today_attendance.get('clock_in', {}))
-                logger.info(f"DEBUG: Clock in count for chat {chat_id}: {clock_in_count}")
-
-                if clock_in_count == 0:
-                    # No one has clocked in yet, send reminder
-                    message = (
-                        f"⏰ **Pengingat Clock In** - {current_time.strftime('%H:%M')}\n\n"
-                        f"Belum ada yang clock in hari ini!\n\n"
-                        f"Silakan gunakan /clockin untuk mencatat kehadiran."
-                    )
-
-                    keyboard = [
-                        [InlineKeyboardButton("🕐 Clock In", callback_data="clock_in_button")],
-                        [InlineKeyboardButton("📊 Cek Status", callback_data="refresh_attendance")]
-                    ]
-                    reply_markup = InlineKeyboardMarkup(keyboard)
-
-                    await context.bot.send_message(
-                        chat_id=chat_id,
-                        text=message,
-                        reply_markup=reply_markup,
-                        parse_mode=ParseMode.MARKDOWN
-                    )
-                    logger.info(f"✅ Clock-in reminder sent to chat {chat_id}")
-                else:
-                    logger.info(f"DEBUG: Skipping reminder for chat {chat_id} - already {clock_in_count} people clocked in")
-
-            except Exception as e:
-                logger.error(f"Error sending clock-in reminder to {chat_id}: {e}")
-
-        logger.info("=== DEBUG: send_clock_in_reminder completed ===")
+    def _active_chats(self, config_type: str, current_time: datetime) -> list:
+        """Chats whose clock in/out window covers current_time, from the schedule index"""
+        if not self.scheduled_handlers:
+            logger.warning(f"No scheduler available to look up active {config_type} windows")
+            return []
+        configs = self.scheduled_handlers.dispatcher.active_configs(config_type, current_time)
+        return [config.chat_id for config in configs]
 
-    async def send_clock_out_reminder(self, context: ContextTypes.DEFAULT_TYPE):
-        """Send clock out reminder to all active chats"""
+    async def send_clock_in_reminder(self, context: ContextTypes.DEFAULT_TYPE):
+        """Send clock in reminder to all chats inside their clock in window"""
         current_time = get_current_time()
-        logger.info(f"=== DEBUG: send_clock_out_reminder called at {current_time} ===")
-
-        # Get all chat groups
-        chat_groups = self.db.get_all_chat_groups()
-        logger.info(f"DEBUG: Found {len(chat_groups)} chat groups")
-
-        for chat_group in chat_groups:
-            chat_id = chat_group['chat_id']
-            logger.info(f"DEBUG: Processing chat {chat_id}")
-
-            try:
-                # Get configuration
-                config = self.db.get_configuration(chat_id, 'clock_out')
-                if not config:
-                    logger.info(f"DEBUG: No clock_out config for chat {chat_id}")
-                    continue
-
-                logger.info(f"DEBUG: Config found for chat {chat_id}: {config}")
-
-                # Check if today is enabled day
-                current_weekday = current_time.weekday()
-                logger.info(f"DEBUG: Current weekday: {current_weekday}, Enabled days: {config['enabled_days']}")
-
-                if current_weekday not in config['enabled_days']:
-                    logger.info(f"DEBUG: Today ({current_weekday}) not in enabled days for chat {chat_id}")
-                    continue
-
-                # Check if current time is within the configured time range
-                start_time = parse_time_string(config['start_time'])
-                end_time = parse_time_string(config['end_time'])
-                current_time_obj = current_time.time()
-
-                logger.info(f"DEBUG: Time check - Current: {current_time_obj}, Start: {start_time}, End: {end_time}")
+        chat_ids = self._active_chats('clock_in', current_time)
+        logger.info(f"Clock-in reminder at {current_time.strftime('%H:%M')}: {len(chat_ids)} chats in their window")
+        if not chat_ids:
+            return
 
-                if not (start_time <= current_time_obj <= end_time):
-                    logger.info(f"DEBUG: Current time not in range for chat {chat_id}")
-                    continue
+        await self.scheduled_handlers.fanout.run([
+            (chat_id, lambda chat_id=chat_id: self._send_clock_in_reminder(context.bot, chat_id, current_time))
+            for chat_id in chat_ids
+        ], delay=self.scheduled_handlers.dispatcher.jitter)
 
-                # Get today's attendance
-                today_attendance = self.db.get_today_attendance(chat_id, current_time)
+    async def _send_clock_in_reminder(self, bot: Bot, chat_id: int, current_time: datetime):
+        """Send one chat's clock in reminder while nobody has clocked in yet"""
+        try:
+            # Get today's attendance
+            summary = await self.db.get_daily_summary(chat_id, current_time)
 
-                # Check if reminder should be sent
-                clock_in_count = len(today_attendance.get('clock_in', {}))
-                clock_out_count = len(today_attendance.get('clock_out', {}))
-                logger.info(f"DEBUG: Attendance for chat {chat_id} - Clock in: {clock_in_count}, Clock out: {clock_out_count}")
+            # Check if reminder should be sent (simplified logic)
+            clock_in_count = summary.in_count
 
-                # Send reminder if it's time for clock out, regardless of clock in status
+            if clock_in_count == 0:
+                # No one has clocked in yet, send reminder
                 message = (
-                    f"🌆 **Pengingat Clock Out** - {current_time.strftime('%H:%M')}\n\n"
-                    f"Jangan lupa clock out!\n\n"
-                    f"🟢 Clock In: {clock_in_count} orang\n"
-                    f"🔴 Clock Out: {clock_out_count} orang\n\n"
-                    f"Gunakan /clockout untuk mencatat pulang."
+                    f"⏰ **Pengingat Clock In** - {current_time.strftime('%H:%M')}\n\n"
+                    f"Belum ada yang clock in hari ini!\n\n"
+                    f"Silakan gunakan /clockin untuk mencatat kehadiran."
                 )
 
                 keyboard = [
-                    [InlineKeyboardButton("🕕 Clock Out", callback_data="clock_out_button")],
+                    [InlineKeyboardButton("🕐 Clock In", callback_data="clock_in_button")],
                     [InlineKeyboardButton("📊 Cek Status", callback_data="refresh_attendance")]
                 ]
                 reply_markup = InlineKeyboardMarkup(keyboard)
 
-                await context.bot.send_message(
-                    chat_id=chat_id,
+                await self.scheduled_handlers.fanout.send_message(
+                    bot, chat_id,
                     text=message,
                     reply_markup=reply_markup,
                     parse_mode=ParseMode.MARKDOWN
                 )
-                logger.info(f"✅ Clock-out reminder sent to chat {chat_id}")
+                logger.info(f"✅ Clock-in reminder sent to chat {chat_id}")
+            else:
+                logger.debug(f"Skipping reminder for chat {chat_id} - already {clock_in_count} people clocked in")
 
-            except Exception as e:
-                logger.error(f"Error sending clock-out reminder to {chat_id}: {e}")
+        except Exception as e:
+            logger.error(f"Error sending clock-in reminder to {chat_id}: {e}")
+
+    async def send_clock_out_reminder(self, context: ContextTypes.DEFAULT_TYPE):
+        """Send clock out reminder to all chats inside their clock out window"""
+        current_time = get_current_time()
+        chat_ids = self._active_chats('clock_out', current_time)
+        logger.info(f"Clock-out reminder at {current_time.strftime('%H:%M')}: {len(chat_ids)} chats in their window")
+        if not chat_ids:
+            return
+
+        await self.scheduled_handlers.fanout.run([
+            (chat_id, lambda chat_id=chat_id: self._send_clock_out_reminder(context.bot, chat_id, current_time))
+            for chat_id in chat_ids
+        ], delay=self.scheduled_handlers.dispatcher.jitter)
+
+    async def _send_clock_out_reminder(self, bot: Bot, chat_id: int, current_time: datetime):
+        """Send one chat's clock out reminder with today's counts"""
+        try:
+            # Get today's attendance
+            summary = await self.db.get_daily_summary(chat_id, current_time)
+
+            # Check if reminder should be sent
+            clock_in_count = summary.in_count
+            clock_out_count = summary.out_count
+
+            # Send reminder if it's time for clock out, regardless of clock in status
+            message = (
+                f"🌆 **Pengingat Clock Out** - {current_time.strftime('%H:%M')}\n\n"
+                f"Jangan lupa clock out!\n\n"
+                f"🟢 Clock In: {clock_in_count} orang\n"
+                f"🔴 Clock Out: {clock_out_count} orang\n\n"
+                f"Gunakan /clockout untuk mencatat pulang."
+            )
 
-        logger.info("=== DEBUG: send_clock_out_reminder completed ===") 
+            keyboard = [
+                [InlineKeyboardButton("🕕 Clock Out", callback_data="clock_out_button")],
+                [InlineKeyboardButton("📊 Cek Status", callback_data="refresh_attendance")]
+            ]
+            reply_markup = InlineKeyboardMarkup(keyboard)
+
+            await self.scheduled_handlers.fanout.send_message(
+                bot, chat_id,
+                text=message,
+                reply_markup=reply_markup,
+                parse_mode=ParseMode.MARKDOWN
+            )
+            logger.info(f"✅ Clock-out reminder sent to chat {chat_id}")
+
+        except Exception as e:
+            logger.error(f"Error sending clock-out reminder to {chat_id}: {e}")
@@ -1,23 +1,48 @@
 import logging
-from datetime import datetime, time
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram import Bot, Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 from telegram.constants import ParseMode
 
-from src.database.database import Database
+from src.database.async_database import AsyncDatabase
+from src.database.database import ClockStatus
 from src.config.settings import Settings
-from src.utils.helpers import get_current_time, parse_time_string
+from src.scheduler.dispatcher import ReminderDispatcher
+from src.scheduler.fanout import FanOut
+from src.scheduler.index import MESSAGE, ScheduleEvent, attendance_day
+from src.utils.helpers import get_current_time
 
 logger = logging.getLogger(__name__)
 
 class ScheduledHandlers:
-    def __init__(self, database: Database):
+    def __init__(self, database: AsyncDatabase):
         self.db = database
+        # Every scheduled send goes through one fan-out sharing Telegram's rate limits
+        self.fanout = FanOut(
+            concurrency=Settings.FANOUT_CONCURRENCY,
+            messages_per_second=Settings.TELEGRAM_MESSAGES_PER_SECOND,
+            chat_messages_per_minute=Settings.TELEGRAM_CHAT_MESSAGES_PER_MINUTE,
+            max_retries=Settings.FANOUT_MAX_RETRIES
+        )
+        # One minute tick sends every chat's messages and reminders
+        self.dispatcher = ReminderDispatcher(
+            database, self.send_scheduled_event, self.fanout,
+            jitter_seconds=Settings.DISPATCH_JITTER_SECONDS
+        )
 
-    async def send_clock_in_message(self, context: ContextTypes.DEFAULT_TYPE):
-        """Send daily clock in message with interactive buttons"""
-        chat_id = context.job.chat_id
+    async def send_scheduled_event(self, bot: Bot, event: ScheduleEvent):
+        """Send a message or reminder picked by the dispatcher"""
+        if event.kind == MESSAGE:
+            if event.config_type == 'clock_in':
+                await self.send_clock_in_message(bot, event.chat_id)
+            else:
+                await self.send_clock_out_message(bot, event.chat_id)
+        elif event.config_type == 'clock_in':
+            await self.send_clock_in_reminder(bot, event.chat_id)
+        else:
+            await self.send_clock_out_reminder(bot, event.chat_id)
 
+    async def send_clock_in_message(self, bot: Bot, chat_id: int):
+        """Send daily clock in message with interactive buttons"""
         try:
             current_time = get_current_time().strftime("%H:%M")
             message = (
@@ -32,8 +57,8 @@ class ScheduledHandlers:
             ]
             reply_markup = InlineKeyboardMarkup(keyboard)
 
-            await context.bot.send_message(
-                chat_id=chat_id,
+            await self.fanout.send_message(
+                bot, chat_id,
                 text=message,
                 reply_markup=reply_markup,
                 parse_mode=ParseMode.MARKDOWN
@@ -43,10 +68,8 @@ class ScheduledHandlers:
         except Exception as e:
             logger.error(f"Error sending clock-in message to {chat_id}: {e}")
 
-    async def send_clock_out_message(self, context: ContextTypes.DEFAULT_TYPE):
+    async def send_clock_out_message(self, bot: Bot, chat_id: int):
         """Send daily clock out message with interactive buttons"""
-        chat_id = context.job.chat_id
-
         try:
             current_time = get_current_time().strftime("%H:%M")
             message = (
@@ -61,8 +84,8 @@ class ScheduledHandlers:
             ]
             reply_markup = InlineKeyboardMarkup(keyboard)
 
-            await context.bot.send_message(
-                chat_id=chat_id,
+            await self.fanout.send_message(
+                bot, chat_id,
                 text=message,
                 reply_markup=reply_markup,
                 parse_mode=ParseMode.MARKDOWN
@@ -72,142 +95,128 @@ class ScheduledHandlers:
         except Exception as e:
             logger.error(f"Error sending clock-out message to {chat_id}: {e}")
 
-    async def _get_chat_members(self, context, chat_id):
+    async def _get_chat_members(self, bot: Bot, chat_id: int):
         """Get all non-bot chat administrators"""
-        chat_members = []
         try:
-            async for member in context.bot.get_chat_administrators(chat_id):
-                if not member.user.is_bot:
-                    chat_members.append(member.user)
-            return chat_members
+            administrators = await bot.get_chat_administrators(chat_id)
+            return [member.user for member in administrators if not member.user.is_bot]
         except Exception as e:
             logger.error(f"Error getting chat members: {e}")
             return []
 
-    async def _check_reminder_conditions(self, chat_id, clock_type, current_time):
-        """Check if reminder should be sent based on configuration and time"""
-        # Get configuration for this chat
-        config = self.db.get_configuration(chat_id, clock_type)
-        if not config:
-            return None  # No configuration set
+    def _is_configured(self, chat_id: int, config_type: str) -> bool:
+        """Check that a chat still has an active configuration of a type.
 
-        # Check if today is enabled day
-        if current_time.weekday() not in config['enabled_days']:
-            return None
+        The dispatcher only fires inside the configured days and window; this
+        catches a configuration deactivated since the schedule was built.
+        """
+        config = self.db.get_configuration(chat_id, config_type)
+        return config is not None and config.is_active
 
-        # Check if current time is within the configured time range
-        start_time = parse_time_string(config['start_time'])
-        end_time = parse_time_string(config['end_time'])
-        current_time_obj = current_time.time()
-
-        if not is_time_between(current_time_obj, start_time, end_time):
-            return None
-
-        return config
-
-    async def send_clock_in_reminder(self, context: ContextTypes.DEFAULT_TYPE):
+    async def send_clock_in_reminder(self, bot: Bot, chat_id: int):
         """Send reminder for members who haven't clocked in"""
-        chat_id = context.job.chat_id
         current_time = get_current_time()
 
         try:
-            # Check if reminder should be sent
-            config = await self._check_reminder_conditions(chat_id, 'clock_in', current_time)
-            if not config:
+            if not self._is_configured(chat_id, 'clock_in'):
                 return
 
             # Get chat members
-            chat_members = await self._get_chat_members(context, chat_id)
+            chat_members = await self._get_chat_members(bot, chat_id)
             if not chat_members:
                 return
 
-            # Get today's attendance
-            today_attendance = self.db.get_today_attendance(chat_id, current_time)
+            # Get the attendance of the day the window started on
+            day = attendance_day(self.db.get_configuration(chat_id, 'clock_in'), current_time)
+            roster = await self.db.get_roster(chat_id, day)
             not_clocked_in = []
 
             # Check who hasn't clocked in
             for member in chat_members:
-                user_id_str = str(member.id)
-                if user_id_str not in today_attendance.get('clock_in', {}):
+                if not roster.has_clocked_in(member.id):
                     mention = f"@{member.username}" if member.username else member.first_name
                     not_clocked_in.append(mention)
 
-            if not_clocked_in:
-                current_time_str = current_time.strftime("%H:%M")
-                message = (
-                    f"⏰ **Pengingat Clock In** - {current_time_str}\n\n"
-                    f"❗ Anggota yang belum clock in:\n"
-                    f"{' '.join(not_clocked_in)}\n\n"
-                    f"Silakan gunakan /clockin atau klik tombol di bawah!"
-                )
-
-                keyboard = [
-                    [InlineKeyboardButton("🕐 Clock In", callback_data="clock_in_button")],
-                    [InlineKeyboardButton("📊 Cek Status", callback_data="refresh_attendance")]
-                ]
-                reply_markup = InlineKeyboardMarkup(keyboard)
-
-                await context.bot.send_message(
-                    chat_id=chat_id,
-                    text=message,
-                    reply_markup=reply_markup,
-                    parse_mode=ParseMode.MARKDOWN
-                )
-                logger.info(f"Clock-in reminder sent to chat {chat_id}")
+            if not not_clocked_in:
+                # Everyone is in: skip the remaining reminders until the roster changes
+                self.dispatcher.mark_complete(chat_id, 'clock_in', roster)
+                return
+
+            current_time_str = current_time.strftime("%H:%M")
+            message = (
+                f"⏰ **Pengingat Clock In** - {current_time_str}\n\n"
+                f"❗ Anggota yang belum clock in:\n"
+                f"{' '.join(not_clocked_in)}\n\n"
+                f"Silakan gunakan /clockin atau klik tombol di bawah!"
+            )
+
+            keyboard = [
+                [InlineKeyboardButton("🕐 Clock In", callback_data="clock_in_button")],
+                [InlineKeyboardButton("📊 Cek Status", callback_data="refresh_attendance")]
+            ]
+            reply_markup = InlineKeyboardMarkup(keyboard)
+
+            await self.fanout.send_message(
+                bot, chat_id,
+                text=message,
+                reply_markup=reply_markup,
+                parse_mode=ParseMode.MARKDOWN
+            )
+            logger.info(f"Clock-in reminder sent to chat {chat_id}")
 
         except Exception as e:
             logger.error(f"Error sending clock-in reminder to {chat_id}: {e}")
 
-    async def send_clock_out_reminder(self, context: ContextTypes.DEFAULT_TYPE):
+    async def send_clock_out_reminder(self, bot: Bot, chat_id: int):
         """Send reminder for members who haven't clocked out"""
-        chat_id = context.job.chat_id
         current_time = get_current_time()
 
         try:
-            # Check if reminder should be sent
-            config = await self._check_reminder_conditions(chat_id, 'clock_out', current_time)
-            if not config:
+            if not self._is_configured(chat_id, 'clock_out'):
                 return
 
             # Get chat members
-            chat_members = await self._get_chat_members(context, chat_id)
+            chat_members = await self._get_chat_members(bot, chat_id)
             if not chat_members:
                 return
 
-            # Get today's attendance
-            today_attendance = self.db.get_today_attendance(chat_id, current_time)
+            # Get the attendance of the day the window started on
+            day = attendance_day(self.db.get_configuration(chat_id, 'clock_out'), current_time)
+            roster = await self.db.get_roster(chat_id, day)
             not_clocked_out = []
 
             # Check who has clocked in but not clocked out
             for member in chat_members:
-                user_id_str = str(member.id)
-                if (user_id_str in today_attendance.get('clock_in', {}) and 
-                    user_id_str not in today_attendance.get('clock_out', {})):
+                if roster.has_clocked_in(member.id) and not roster.has_clocked_out(member.id):
                     mention = f"@{member.username}" if member.username else member.first_name
                     not_clocked_out.append(mention)
 
-            if not_clocked_out:
-                current_time_str = current_time.strftime("%H:%M")
-                message = (
-                    f"🌆 **Pengingat Clock Out** - {current_time_str}\n\n"
-                    f"❗ Anggota yang belum clock out:\n"
-                    f"{' '.join(not_clocked_out)}\n\n"
-                    f"Jangan lupa clock out! Gunakan /clockout atau klik tombol!"
-                )
-
-                keyboard = [
-                    [InlineKeyboardButton("🕕 Clock Out", callback_data="clock_out_button")],
-                    [InlineKeyboardButton("📊 Cek Status", callback_data="refresh_attendance")]
-                ]
-                reply_markup = InlineKeyboardMarkup(keyboard)
-
-                await context.bot.send_message(
-                    chat_id=chat_id,
-                    text=message,
-                    reply_markup=reply_markup,
-                    parse_mode=ParseMode.MARKDOWN
-                )
-                logger.info(f"Clock-out reminder sent to chat {chat_id}")
+            if not not_clocked_out:
+                # Nobody is waiting to clock out: skip until someone else clocks in
+                self.dispatcher.mark_complete(chat_id, 'clock_out', roster)
+                return
+
+            current_time_str = current_time.strftime("%H:%M")
+            message = (
+                f"🌆 **Pengingat Clock Out** - {current_time_str}\n\n"
+                f"❗ Anggota yang belum clock out:\n"
+                f"{' '.join(not_clocked_out)}\n\n"
+                f"Jangan lupa clock out! Gunakan /clockout atau klik tombol!"
+            )
+
+            keyboard = [
+                [InlineKeyboardButton("🕕 Clock Out", callback_data="clock_out_button")],
+                [InlineKeyboardButton("📊 Cek Status", callback_data="refresh_attendance")]
+            ]
+            reply_markup = InlineKeyboardMarkup(keyboard)
+
+            await self.fanout.send_message(
+                bot, chat_id,
+                text=message,
+                reply_markup=reply_markup,
+                parse_mode=ParseMode.MARKDOWN
+            )
+            logger.info(f"Clock-out reminder sent to chat {chat_id}")
 
         except Exception as e:
             logger.error(f"Error sending clock-out reminder to {chat_id}: {e}")
@@ -223,52 +232,40 @@ class ScheduledHandlers:
 
         if query.data == "clock_in_button":
             # Handle clock in button
-            today_attendance = self.db.get_today_attendance(chat_id, current_time)
-            user_id_str = str(user.id)
-
-            if user_id_str in today_attendance.get('clock_in', {}):
-                await query.answer("Anda sudah clock in hari ini!", show_alert=True)
-                return
-
-            # Record clock in
-            success = self.db.record_attendance(
+            status = await self.db.clock(
                 chat_id=chat_id,
                 user_id=user.id,
                 user_name=user.first_name or user.username or 'Unknown',
                 username=user.username,
                 clock_type='in',
-                clock_time=current_time
+                clock_time=current_time,
+                day=attendance_day(self.db.get_configuration(chat_id, 'clock_in'), current_time)
             )
 
-            if success:
+            if status == ClockStatus.ALREADY_CLOCKED:
+                await query.answer("Anda sudah clock in hari ini!", show_alert=True)
+            elif status == ClockStatus.INSERTED:
                 await query.answer(f"✅ Clock in berhasil pada {current_time.strftime('%H:%M:%S')}")
             else:
                 await query.answer("❌ Gagal mencatat clock in", show_alert=True)
 
         elif query.data == "clock_out_button":
             # Handle clock out button
-            today_attendance = self.db.get_today_attendance(chat_id, current_time)
-            user_id_str = str(user.id)
-
-            if user_id_str not in today_attendance.get('clock_in', {}):
-                await query.answer("Anda harus clock in terlebih dahulu!", show_alert=True)
-                return
-
-            if user_id_str in today_attendance.get('clock_out', {}):
-                await query.answer("Anda sudah clock out hari ini!", show_alert=True)
-                return
-
-            # Record clock out
-            success = self.db.record_attendance(
+            status = await self.db.clock(
                 chat_id=chat_id,
                 user_id=user.id,
                 user_name=user.first_name or user.username or 'Unknown',
                 username=user.username,
                 clock_type='out',
-                clock_time=current_time
+                clock_time=current_time,
+                day=attendance_day(self.db.get_configuration(chat_id, 'clock_out'), current_time)
             )
 
-            if success:
+            if status == ClockStatus.NOT_CLOCKED_IN:
+                await query.answer("Anda harus clock in terlebih dahulu!", show_alert=True)
+            elif status == ClockStatus.ALREADY_CLOCKED:
+                await query.answer("Anda sudah clock out hari ini!", show_alert=True)
+            elif status == ClockStatus.INSERTED:
                 await query.answer(f"✅ Clock out berhasil pada {current_time.strftime('%H:%M:%S')}")
             else:
                 await query.answer("❌ Gagal mencatat clock out", show_alert=True)
@@ -280,10 +277,10 @@ class ScheduledHandlers:
 
         chat_id = query.message.chat.id
         current_time = get_current_time()
-        today_attendance = self.db.get_today_attendance(chat_id, current_time)
+        summary = await self.db.get_daily_summary(chat_id, current_time)
 
-        clock_in_count = len(today_attendance.get('clock_in', {}))
-        clock_out_count = len(today_attendance.get('clock_out', {}))
+        clock_in_count = summary.in_count
+        clock_out_count = summary.out_count
 
         message = (
             f"📊 **Status Kehadiran Hari Ini**\n\n"
@@ -295,94 +292,11 @@ class ScheduledHandlers:
 
         await query.edit_message_text(message, parse_mode=ParseMode.MARKDOWN)
 
-    def schedule_daily_messages(self, chat_id: int, context: ContextTypes.DEFAULT_TYPE):
-        """Schedule daily clock-in and clock-out messages plus reminders"""
-        job_queue = context.job_queue
-
-        # Remove existing jobs for this chat if any
-        job_names = [
-            f"clock_in_{chat_id}",
-            f"clock_out_{chat_id}",
-            f"clock_in_reminder_{chat_id}",
-            f"clock_out_reminder_{chat_id}"
-        ]
-
-        for job_name in job_names:
-            current_jobs = job_queue.get_jobs_by_name(job_name)
-            for job in current_jobs:
-                job.schedule_removal()
-
-        # Get configurations
-        clock_in_config = self.db.get_configuration(chat_id, 'clock_in')
-        clock_out_config = self.db.get_configuration(chat_id, 'clock_out')
-
-        # Schedule clock-in message
-        if clock_in_config:
-            start_time = parse_time_string(clock_in_config['start_time'])
-            if start_time:
-                job_queue.run_daily(
-                    self.send_clock_in_message,
-                    start_time,
-                    chat_id=chat_id,
-                    name=f"clock_in_{chat_id}"
-                )
-
-        # Schedule clock-out message
-        if clock_out_config:
-            start_time = parse_time_string(clock_out_config['start_time'])
-            if start_time:
-                job_queue.run_daily(
-                    self.send_clock_out_message,
-                    start_time,
-                    chat_id=chat_id,
-                    name=f"clock_out_{chat_id}"
-                )
-
-        # Schedule reminders based on configuration
-        if clock_in_config:
-            self._schedule_reminders(chat_id, context, 'clock_in', clock_in_config)
-
-        if clock_out_config:
-            self._schedule_reminders(chat_id, context, 'clock_out', clock_out_config)
-
-        logger.info(f"Scheduled daily messages and reminders for chat {chat_id}")
-
-    def _schedule_reminders(self, chat_id: int, context: ContextTypes.DEFAULT_TYPE, 
-                          config_type: str, config: dict):
-        """Schedule reminders based on configuration"""
-        job_queue = context.job_queue
-        interval = config['reminder_interval']
-
-        # Calculate reminder times based on start and end time
-        start_time = parse_time_string(config['start_time'])
-        end_time = parse_time_string(config['end_time'])
-
-        if not start_time or not end_time:
-            return
-
-        # Schedule reminders at regular intervals
-        current_time = start_time
-        reminder_count = 0
-
-        while current_time <= end_time and reminder_count < 10:  # Max 10 reminders
-            if config_type == 'clock_in':
-                job_queue.run_daily(
-                    self.send_clock_in_reminder,
-                    current_time,
-                    chat_id=chat_id,
-                    name=f"clock_in_reminder_{chat_id}_{reminder_count}"
-                )
-            else:
-                job_queue.run_daily(
-                    self.send_clock_out_reminder,
-                    current_time,
-                    chat_id=chat_id,
-                    name=f"clock_out_reminder_{chat_id}_{reminder_count}"
-                )
-
-            # Add interval minutes
-            current_time = time(
-                hour=(current_time.hour + (current_time.minute + interval) // 60) % 24,
-                minute=(current_time.minute + interval) % 60
-            )
-            reminder_count += 1 
+    async def schedule_daily_messages(self, chat_id: int, context: ContextTypes.DEFAULT_TYPE):
+        """Schedule daily clock-in and clock-out messages plus reminders from the chat's configuration"""
+        self.dispatcher.update_chat(chat_id)
+
+    def unschedule_chat(self, chat_id: int):
+        """Stop every scheduled message and reminder of a chat"""
+        counts = self.dispatcher.remove_chat(chat_id)
+        logger.info(f"Removed {counts['removed']} scheduled messages and reminders for chat {chat_id}")
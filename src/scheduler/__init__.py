@@ -0,0 +1 @@
+# Scheduler module 
\ No newline at end of file
@@ -0,0 +1,254 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from telegram import Bot
+from telegram.ext import ContextTypes, JobQueue
+
+from src.config.settings import Settings
+from src.database.async_database import AsyncDatabase
+from src.database.config_snapshot import ScheduleConfig
+from src.database.roster import DailyRoster
+from src.scheduler.fanout import FanOut, stagger_delay
+from src.scheduler.index import (
+    MINUTES_PER_DAY, REMINDER, ConfigKey, ScheduleEvent, ScheduleIndex, attendance_day, minute_of_week
+)
+from src.utils.helpers import get_current_time
+
+logger = logging.getLogger(__name__)
+
+CONFIG_TYPES = ('clock_in', 'clock_out')
+
+class ReminderDispatcher:
+    """Sends every scheduled message and reminder from a single job ticking once a minute.
+
+    Events live in a ScheduleIndex keyed by local minute of the week, so a
+    tick costs a dictionary lookup plus the events actually due, whatever the
+    number of chats. Rescheduling compares configurations with the ones
+    already indexed and only re-indexes those that changed. The last tick
+    and the last event fired per configuration are persisted, so after a
+    restart the first tick sends what was missed while its window is open.
+
+    Once a reminder finds nobody left to remind, the chat's remaining
+    reminders of that type are skipped for the day. They resume as soon as
+    the day's attendance roster changes, the day rolls over, the
+    configuration changes or the chat's administrators change.
+    """
+
+    JOB_NAME = 'reminder_dispatcher'
+    # A tick delayed past the next minute also covers the minutes it skipped;
+    # anything older was missed while the bot was down and is only sent while
+    # its window is still open
+    MAX_CATCHUP_MINUTES = 5
+
+    def __init__(self, database: AsyncDatabase,
+                 send_event: Callable[[Bot, ScheduleEvent], Awaitable[None]],
+                 fanout: Optional[FanOut] = None, jitter_seconds: float = 0.0):
+        self.db = database
+        self.send_event = send_event
+        self.fanout = fanout or FanOut()
+        # Each chat's sends wait a fixed share of this, so chats sharing a
+        # start time spread over the window instead of all hitting second 0
+        self.jitter_seconds = jitter_seconds
+        self.index = ScheduleIndex()
+        self._scheduled = {}  # (chat_id, config_type) -> ScheduleConfig currently indexed
+        self._last_minute = None  # last dispatched minute, in minutes since the epoch
+        self._fired = {}  # (chat_id, config_type) -> minute since the epoch of its last event sent
+        # (chat_id, config_type) -> (day_num, clock in count, clock out count) of the roster found complete
+        self._complete = {}
+
+    def start(self, job_queue: JobQueue):
+        """Register the minute tick, aligned to the start of the next minute"""
+        now = datetime.now()
+        first = 60 - now.second - now.microsecond / 1_000_000
+        job_queue.run_repeating(self._tick, interval=60, first=first, name=self.JOB_NAME)
+        logger.info(f"Reminder dispatcher starts in {first:.1f}s")
+
+    def _sync(self, desired: Dict[ConfigKey, ScheduleConfig], keys: Iterable[ConfigKey]) -> Dict[str, int]:
+        """Bring the indexed configurations of keys in line with desired"""
+        counts = {'added': 0, 'removed': 0, 'changed': 0, 'unchanged': 0}
+        for key in keys:
+            config = desired.get(key)
+            current = self._scheduled.get(key)
+            if config == current:
+                counts['unchanged'] += 1
+                continue
+
+            counts['changed'] += 1
+            self._complete.pop(key, None)
+            if config is None:
+                counts['removed'] += self.index.remove_config(*key)
+                del self._scheduled[key]
+            else:
+                removed, added = self.index.set_config(config)
+                counts['removed'] += removed
+                counts['added'] += added
+                self._scheduled[key] = config
+        return counts
+
+    def refresh(self) -> Dict[str, int]:
+        """Re-index the configurations that changed since the last refresh, returning the counts"""
+        desired = {
+            (config.chat_id, config.config_type): config
+            for config in self.db.get_all_active_configurations()
+        }
+        counts = self._sync(desired, set(desired) | set(self._scheduled))
+        logger.info(
+            f"Schedule refresh: {counts['changed']} configurations changed, {counts['unchanged']} unchanged; "
+            f"{counts['added']} events added, {counts['removed']} removed, {len(self.index)} scheduled"
+        )
+        return counts
+
+    def update_chat(self, chat_id: int) -> Dict[str, int]:
+        """Re-index one chat after its configuration may have changed"""
+        desired = {}
+        for config_type in CONFIG_TYPES:
+            config = self.db.get_configuration(chat_id, config_type)
+            if config is not None and config.is_active:
+                desired[(chat_id, config_type)] = config
+        counts = self._sync(desired, [(chat_id, config_type) for config_type in CONFIG_TYPES])
+        if counts['changed']:
+            logger.info(f"Rescheduled chat {chat_id}: {counts['added']} events added, {counts['removed']} removed")
+        return counts
+
+    def mark_complete(self, chat_id: int, config_type: str, roster: DailyRoster):
+        """Skip a chat's reminders of a type for the rest of the day unless the roster changes"""
+        self._complete[(chat_id, config_type)] = (
+            roster.day_num, roster.clock_in_count, roster.clock_out_count
+        )
+        logger.info(f"Chat {chat_id} complete for {config_type}, suppressing its reminders for today")
+
+    def resume_chat(self, chat_id: int):
+        """Send a chat's reminders again, e.g. after its members changed"""
+        for config_type in CONFIG_TYPES:
+            if self._complete.pop((chat_id, config_type), None) is not None:
+                logger.info(f"Resumed {config_type} reminders for chat {chat_id}")
+
+    def _is_suppressed(self, event: ScheduleEvent, now: datetime) -> bool:
+        """Whether a reminder can be skipped because its chat's roster is still complete"""
+        if event.kind != REMINDER:
+            return False
+        key = (event.chat_id, event.config_type)
+        complete = self._complete.get(key)
+        if complete is None:
+            return False
+
+        # Only the in-memory roster is consulted; without one the reminder goes out
+        roster = self.db.peek_roster(event.chat_id, attendance_day(self._scheduled.get(key), now))
+        if roster is None or (roster.day_num, roster.clock_in_count, roster.clock_out_count) != complete:
+            del self._complete[key]
+            return False
+        return True
+
+    def remove_chat(self, chat_id: int) -> Dict[str, int]:
+        """Stop sending anything to a chat"""
+        self.resume_chat(chat_id)
+        return self._sync({}, [(chat_id, config_type) for config_type in CONFIG_TYPES])
+
+    def active_configs(self, config_type: str, now: Optional[datetime] = None) -> List[ScheduleConfig]:
+        """Configurations of a type whose window covers now"""
+        now = now or get_current_time()
+        return self.index.active(minute_of_week(now), config_type)
+
+    def is_active(self, chat_id: int, config_type: str, now: Optional[datetime] = None) -> bool:
+        """Whether a chat's clock in/out window covers now"""
+        now = now or get_current_time()
+        return self.index.is_active(chat_id, config_type, minute_of_week(now))
+
+    def next_event(self, chat_id: int, now: Optional[datetime] = None) -> Optional[Tuple[datetime, List[ScheduleEvent]]]:
+        """When a chat's next message or reminder goes out, and what goes out then"""
+        now = now or get_current_time()
+        found = self.index.next_event(chat_id, minute_of_week(now))
+        if found is None:
+            return None
+        ahead, events = found
+        return now.replace(second=0, microsecond=0) + timedelta(minutes=ahead), events
+
+    def jitter(self, chat_id: int) -> float:
+        """Seconds a chat's scheduled sends are delayed"""
+        return stagger_delay(chat_id, self.jitter_seconds)
+
+    async def restore(self):
+        """Load the persisted last tick and last-fired markers, before the first tick"""
+        last_tick, markers = await self.db.get_schedule_markers()
+        if last_tick is not None and self._last_minute is None:
+            self._last_minute = last_tick
+        for key, minute in markers.items():
+            self._fired[key] = max(minute, self._fired.get(key, minute))
+        logger.info(f"Restored scheduler markers: last tick {last_tick}, {len(markers)} configurations fired before")
+
+    def _due_minutes(self, current: int) -> List[int]:
+        """Minutes since the epoch to dispatch on this tick; missed windows last at most a day"""
+        if self._last_minute is None:
+            return [current]
+        first = max(self._last_minute + 1, current - MINUTES_PER_DAY + 1)
+        return list(range(first, current + 1))
+
+    def due_events(self, now: datetime) -> List[Tuple[int, ScheduleEvent]]:
+        """(minute since the epoch, event) pairs to send at now, at most one per chat, type and kind.
+
+        Minutes older than MAX_CATCHUP_MINUTES only contribute events whose
+        window is still open now, and events at or before a configuration's
+        last-fired marker were already sent.
+        """
+        current = int(now.timestamp()) // 60
+        current_of_week = minute_of_week(now)
+        timezone = Settings.get_timezone()
+        due = {}  # (chat_id, config_type, kind) -> (minute, event); the latest missed one wins
+        for minute in self._due_minutes(current):
+            missed = current - minute >= self.MAX_CATCHUP_MINUTES
+            local = datetime.fromtimestamp(minute * 60, timezone)
+            for event in self.index.due(minute_of_week(local)):
+                key = (event.chat_id, event.config_type)
+                if self._fired.get(key, minute - 1) >= minute:
+                    continue
+                if missed:
+                    offset = self.index.window_offset(event.chat_id, event.config_type, current_of_week)
+                    if offset is None or current - minute > offset:
+                        continue
+                due[(event.chat_id, event.config_type, event.kind)] = (minute, event)
+        return sorted(due.values(), key=lambda item: item[0])
+
+    async def _tick(self, context: ContextTypes.DEFAULT_TYPE):
+        """Send everything due since the previous tick"""
+        now = get_current_time()
+        due = self.due_events(now)
+        self._last_minute = int(now.timestamp()) // 60
+
+        fired = {}  # (chat_id, config_type) -> minute
+        for minute, event in due:
+            fired[(event.chat_id, event.config_type)] = minute
+        self._fired.update(fired)
+        # Saved before sending: after a crash an event is missed rather than sent twice
+        await self.db.save_schedule_markers(
+            self._last_minute, [(chat_id, config_type, minute) for (chat_id, config_type), minute in fired.items()]
+        )
+
+        events = [event for _, event in due if not self._is_suppressed(event, now)]
+        if len(events) < len(due):
+            logger.debug(f"Suppressed {len(due) - len(events)} reminders of complete chats")
+
+        if events:
+            # Runs as its own task: with jitter or a long fan-out the sends can
+            # outlast the minute, and the job queue skips ticks still running
+            context.application.create_task(self.dispatch(context.bot, events))
+
+    async def dispatch(self, bot: Bot, events: Iterable[ScheduleEvent]):
+        """Send events through the fan-out, chats concurrently and each chat's events in order"""
+        by_chat = {}  # chat_id -> [ScheduleEvent]
+        for event in events:
+            by_chat.setdefault(event.chat_id, []).append(event)
+
+        await self.fanout.run([
+            (chat_id, lambda chat_events=chat_events: self._send_chat(bot, chat_events))
+            for chat_id, chat_events in by_chat.items()
+        ], delay=self.jitter)
+        logger.info(f"Dispatched {sum(len(chat_events) for chat_events in by_chat.values())} events to {len(by_chat)} chats")
+
+    async def _send_chat(self, bot: Bot, events: List[ScheduleEvent]):
+        """Send one chat's events, the daily message before its first reminder"""
+        for event in events:
+            try:
+                await self.send_event(bot, event)
+            except Exception as e:
+                logger.error(f"Error dispatching {event.kind} {event.config_type} to {event.chat_id}: {e}")
@@ -0,0 +1,140 @@
+import asyncio
+import logging
+import time
+import zlib
+from datetime import timedelta
+from typing import Awaitable, Callable, Iterable, List, Optional, Tuple
+
+from telegram import Bot, Message
+from telegram.error import RetryAfter
+
+logger = logging.getLogger(__name__)
+
+def stagger_delay(chat_id: int, spread: float) -> float:
+    """Seconds between 0 and spread a chat's scheduled sends wait; stable for a chat"""
+    if spread <= 0:
+        return 0.0
+    return zlib.crc32(f"stagger:{chat_id}".encode()) / 2 ** 32 * spread
+
+class TokenBucket:
+    """Admits at most limit acquisitions in any period seconds, burst of them at once.
+
+    Acquisitions reserve their token immediately, so waiters are served in
+    the order they arrived. burst is clamped to 1 .. limit - 1; a limit
+    below 2 is treated as 2.
+    """
+
+    def __init__(self, limit: int, period: float, burst: int = 1):
+        limit = max(limit, 2)
+        burst = max(1, min(burst, limit - 1))
+        self.capacity = float(burst)
+        self.rate = (limit - burst) / period  # tokens per second
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self) -> float:
+        """Take a token, returning the seconds to wait before using it"""
+        self._refill()
+        self._tokens -= 1
+        return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    async def acquire(self):
+        """Wait for a token"""
+        delay = self.reserve()
+        if delay:
+            await asyncio.sleep(delay)
+
+    def is_full(self) -> bool:
+        """Whether the bucket has refilled completely, so forgetting it changes nothing"""
+        self._refill()
+        return self._tokens >= self.capacity
+
+class FanOut:
+    """Sends to many chats concurrently within Telegram's rate limits.
+
+    At most concurrency chat jobs run at once. Every message waits for a
+    token of its chat's bucket (limit per minute, for groups) and then of the
+    bot-wide bucket (limit per second). A RetryAfter from Telegram pauses all
+    sends for the requested time before the message is retried.
+    """
+
+    # Per-chat buckets are dropped once refilled, checked whenever this many have piled up
+    PRUNE_CHAT_BUCKETS = 1024
+
+    def __init__(self, concurrency: int = 32, messages_per_second: int = 30,
+                 chat_messages_per_minute: int = 20, max_retries: int = 3):
+        self.concurrency = concurrency
+        self.chat_messages_per_minute = chat_messages_per_minute
+        self.max_retries = max_retries
+        self._semaphore = None  # created on first use, inside the running event loop
+        self._bucket = TokenBucket(messages_per_second, 1.0)
+        self._chat_buckets = {}  # chat_id -> TokenBucket
+        self._resume_at = 0.0  # time.monotonic() before which nothing is sent
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) >= self.PRUNE_CHAT_BUCKETS:
+                self._chat_buckets = {
+                    key: value for key, value in self._chat_buckets.items() if not value.is_full()
+                }
+            # A message and a reminder may share a minute, so a chat bursts two
+            bucket = TokenBucket(self.chat_messages_per_minute, 60.0, burst=2)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    async def _wait_resume(self):
+        delay = self._resume_at - time.monotonic()
+        while delay > 0:
+            await asyncio.sleep(delay)
+            delay = self._resume_at - time.monotonic()
+
+    async def send(self, chat_id: int, send: Callable[[], Awaitable]):
+        """Call send once chat_id's and the bot-wide limits allow, retrying after RetryAfter"""
+        await self._chat_bucket(chat_id).acquire()
+        for attempt in range(self.max_retries + 1):
+            await self._wait_resume()
+            await self._bucket.acquire()
+            try:
+                return await send()
+            except RetryAfter as e:
+                retry_after = e.retry_after
+                if isinstance(retry_after, timedelta):
+                    retry_after = retry_after.total_seconds()
+                self._resume_at = max(self._resume_at, time.monotonic() + retry_after)
+                if attempt == self.max_retries:
+                    raise
+                logger.warning(f"⏳ Flood limit hit sending to {chat_id}, pausing sends for {retry_after}s")
+
+    async def send_message(self, bot: Bot, chat_id: int, **kwargs) -> Message:
+        """bot.send_message within the rate limits"""
+        return await self.send(chat_id, lambda: bot.send_message(chat_id=chat_id, **kwargs))
+
+    async def _run_job(self, chat_id: int, job: Callable[[], Awaitable], delay: float):
+        if delay:
+            # Waits outside the semaphore, so staggered chats don't hold a slot
+            await asyncio.sleep(delay)
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        async with self._semaphore:
+            try:
+                await job()
+            except Exception as e:
+                logger.error(f"Error in fan-out job for chat {chat_id}: {e}")
+
+    async def run(self, jobs: Iterable[Tuple[int, Callable[[], Awaitable]]],
+                  delay: Optional[Callable[[int], float]] = None) -> int:
+        """Run one job per (chat_id, job) pair, at most concurrency at a time; returns the job count.
+
+        delay maps a chat_id to the seconds its job waits before starting.
+        """
+        tasks: List[Awaitable] = [
+            self._run_job(chat_id, job, delay(chat_id) if delay else 0.0) for chat_id, job in jobs
+        ]
+        await asyncio.gather(*tasks)
+        return len(tasks)
@@ -0,0 +1,201 @@
+from bisect import bisect_right
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from typing import List, Optional, Set, Tuple
+
+from src.database.config_snapshot import ScheduleConfig
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+MESSAGE = 'message'  # the daily clock in/out message at start_time
+REMINDER = 'reminder'  # the repeating reminder between start_time and end_time
+
+def minute_of_day(value: time) -> int:
+    """Minutes since midnight"""
+    return value.hour * 60 + value.minute
+
+def minute_of_week(moment: datetime) -> int:
+    """Minutes since Monday 00:00 of a local datetime"""
+    return moment.weekday() * MINUTES_PER_DAY + moment.hour * 60 + moment.minute
+
+def window_length(config: ScheduleConfig) -> int:
+    """Minutes from start_time to end_time; windows ending before they start run past midnight"""
+    return (minute_of_day(config.end_time) - minute_of_day(config.start_time)) % MINUTES_PER_DAY
+
+def attendance_day(config: Optional[ScheduleConfig], moment: datetime) -> date:
+    """Day a clock or reminder at a local moment belongs to.
+
+    That is the moment's own date, except after midnight inside an overnight
+    window, which belongs to the day it started on.
+    """
+    if config is None or not config.is_active:
+        return moment.date()
+    end = minute_of_day(config.end_time)
+    if end >= minute_of_day(config.start_time) or minute_of_day(moment.time()) > end:
+        return moment.date()
+    started = moment.date() - timedelta(days=1)
+    return started if started.weekday() in config.enabled_days else moment.date()
+
+@dataclass(frozen=True)
+class ScheduleEvent:
+    """Something to send to a chat at a minute of the week"""
+    chat_id: int
+    config_type: str  # 'clock_in' or 'clock_out'
+    kind: str  # MESSAGE or REMINDER
+
+def config_events(config: ScheduleConfig) -> List[Tuple[int, ScheduleEvent]]:
+    """(minute of week, event) pairs of one configuration.
+
+    The message goes out at start_time and reminders every reminder_interval
+    minutes from start_time up to and including end_time, on every enabled
+    day. An overnight window belongs to the day it starts on, so its
+    reminders after midnight fall on the following weekday.
+    """
+    if not config.is_active:
+        return []
+
+    start = minute_of_day(config.start_time)
+    length = window_length(config)
+    interval = max(config.reminder_interval, 1)
+    message = ScheduleEvent(config.chat_id, config.config_type, MESSAGE)
+    reminder = ScheduleEvent(config.chat_id, config.config_type, REMINDER)
+
+    events = []
+    for weekday in config.enabled_days:
+        day_start = weekday * MINUTES_PER_DAY + start
+        events.append((day_start % MINUTES_PER_WEEK, message))
+        for offset in range(0, length + 1, interval):
+            events.append(((day_start + offset) % MINUTES_PER_WEEK, reminder))
+    return events
+
+def config_windows(config: ScheduleConfig) -> List[Tuple[int, int]]:
+    """(first minute of week, minutes) of each window of one configuration, end_time included"""
+    if not config.is_active:
+        return []
+    start = minute_of_day(config.start_time)
+    length = window_length(config) + 1
+    return [(weekday * MINUTES_PER_DAY + start, length) for weekday in config.enabled_days]
+
+def window_minutes(config: ScheduleConfig) -> Set[int]:
+    """Minutes of the week in which a configuration is active"""
+    return {
+        (first + offset) % MINUTES_PER_WEEK
+        for first, length in config_windows(config)
+        for offset in range(length)
+    }
+
+ConfigKey = Tuple[int, str]  # (chat_id, config_type)
+
+class ScheduleIndex:
+    """Schedules bucketed by minute of the week.
+
+    Events are bucketed by the minute they are due, so a tick only touches
+    what is due, and configurations by every minute their window covers, so
+    "who is active now" is one lookup. Windows past midnight simply cover
+    minutes of the next weekday.
+    """
+
+    def __init__(self):
+        self._events = {}  # minute of week -> [ScheduleEvent]
+        self._config_minutes = {}  # (chat_id, config_type) -> sorted minutes holding its events
+        self._active = {}  # minute of week -> [ScheduleConfig] active in that minute
+        self._configs = {}  # (chat_id, config_type) -> ScheduleConfig indexed
+        self._chat_types = {}  # chat_id -> {config_type} indexed
+
+    def set_config(self, config: ScheduleConfig) -> Tuple[int, int]:
+        """Replace the events of one configuration, returning (events removed, events added)"""
+        removed = self.remove_config(config.chat_id, config.config_type)
+
+        events = config_events(config)
+        if not events:
+            return removed, 0
+
+        key = (config.chat_id, config.config_type)
+        for minute, event in events:
+            self._events.setdefault(minute, []).append(event)
+        for minute in window_minutes(config):
+            self._active.setdefault(minute, []).append(config)
+        self._config_minutes[key] = sorted({minute for minute, _ in events})
+        self._configs[key] = config
+        self._chat_types.setdefault(config.chat_id, set()).add(config.config_type)
+        return removed, len(events)
+
+    def remove_config(self, chat_id: int, config_type: str) -> int:
+        """Drop the events of one configuration, returning how many were removed"""
+        removed = 0
+        for minute in self._config_minutes.pop((chat_id, config_type), ()):
+            events = self._events[minute]
+            remaining = [
+                event for event in events
+                if event.chat_id != chat_id or event.config_type != config_type
+            ]
+            removed += len(events) - len(remaining)
+            if remaining:
+                self._events[minute] = remaining
+            else:
+                del self._events[minute]
+
+        config = self._configs.pop((chat_id, config_type), None)
+        if config is not None:
+            for minute in window_minutes(config):
+                remaining = [active for active in self._active[minute] if active is not config]
+                if remaining:
+                    self._active[minute] = remaining
+                else:
+                    del self._active[minute]
+            types = self._chat_types[chat_id]
+            types.discard(config_type)
+            if not types:
+                del self._chat_types[chat_id]
+        return removed
+
+    def due(self, minute: int) -> List[ScheduleEvent]:
+        """Events due in a minute of the week"""
+        return list(self._events.get(minute % MINUTES_PER_WEEK, ()))
+
+    def active(self, minute: int, config_type: Optional[str] = None) -> List[ScheduleConfig]:
+        """Configurations whose window covers a minute of the week, optionally of one type"""
+        configs = self._active.get(minute % MINUTES_PER_WEEK, ())
+        return [config for config in configs if config_type is None or config.config_type == config_type]
+
+    def window_offset(self, chat_id: int, config_type: str, minute: int) -> Optional[int]:
+        """Minutes since the start of the chat's window covering a minute of the week, None outside it"""
+        config = self._configs.get((chat_id, config_type))
+        if config is None:
+            return None
+        for first, length in config_windows(config):
+            offset = (minute - first) % MINUTES_PER_WEEK
+            if offset < length:
+                return offset
+        return None
+
+    def is_active(self, chat_id: int, config_type: str, minute: int) -> bool:
+        """Whether a chat's configuration covers a minute of the week"""
+        return self.window_offset(chat_id, config_type, minute) is not None
+
+    def next_event(self, chat_id: int, minute: int) -> Optional[Tuple[int, List[ScheduleEvent]]]:
+        """(minutes ahead, events) of a chat's first events after a minute of the week.
+
+        Minutes ahead is between 1 and MINUTES_PER_WEEK, the latter when the
+        only events of the chat are due in that same minute next week.
+        """
+        minute %= MINUTES_PER_WEEK
+        ahead = None
+        for config_type in self._chat_types.get(chat_id, ()):
+            minutes = self._config_minutes[(chat_id, config_type)]
+            position = bisect_right(minutes, minute)
+            due = minutes[position] if position < len(minutes) else minutes[0] + MINUTES_PER_WEEK
+            if ahead is None or due - minute < ahead:
+                ahead = due - minute
+        if ahead is None:
+            return None
+        events = [event for event in self.due(minute + ahead) if event.chat_id == chat_id]
+        return ahead, events
+
+    def chats(self) -> Set[int]:
+        """Chats with at least one event"""
+        return set(self._chat_types)
+
+    def __len__(self) -> int:
+        return sum(len(events) for events in self._events.values())
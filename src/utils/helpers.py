@@ -1,5 +1,5 @@
-from datetime import datetime, time, timedelta
-from typing import List, Dict, Optional
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 import pytz
 from src.config.settings import Settings
 
@@ -15,6 +15,21 @@ def parse_time_string(time_str: str) -> Optional[time]:
     except (ValueError, AttributeError):
         return None
 
+def parse_date_string(date_str: str) -> Optional[date]:
+    """Parse a date in YYYY-MM-DD or DD/MM/YYYY format"""
+    for fmt in ('%Y-%m-%d', '%d/%m/%Y'):
+        try:
+            return datetime.strptime(date_str.strip(), fmt).date()
+        except (ValueError, AttributeError):
+            continue
+    return None
+
+def format_clock_time(clock_ts: Optional[int]) -> str:
+    """Format a stored epoch-seconds clock time as local HH:MM:SS"""
+    if clock_ts is None:
+        return "-"
+    return datetime.fromtimestamp(clock_ts, Settings.get_timezone()).strftime('%H:%M:%S')
+
 def format_time_display(time_obj: time) -> str:
     """Format time object to HH:MM display string"""
     return time_obj.strftime('%H:%M')
@@ -59,7 +74,7 @@ def format_attendance_report(attendance_data: Dict, date: datetime) -> str:
     report += f"🟢 **Clock In ({clock_in_count} orang):**\n"
     if clock_in_count > 0:
         for user_id, data in attendance_data['clock_in'].items():
-            report += f"• {data['name']} - {data['time']}\n"
+            report += f"• {data['name']} - {format_clock_time(data['time'])}\n"
     else:
         report += "Belum ada yang clock in\n"
 
@@ -70,12 +85,38 @@ def format_attendance_report(attendance_data: Dict, date: datetime) -> str:
     report += f"🔴 **Clock Out ({clock_out_count} orang):**\n"
     if clock_out_count > 0:
         for user_id, data in attendance_data['clock_out'].items():
-            report += f"• {data['name']} - {data['time']}\n"
+            report += f"• {data['name']} - {format_clock_time(data['time'])}\n"
     else:
         report += "Belum ada yang clock out\n"
 
     return report
 
+def format_report_lines(rows: Iterable[Tuple]) -> Iterator[str]:
+    """Format aggregated report rows one line at a time"""
+    number = 0
+    for number, (user_id, user_name, in_days, out_days, earliest_in, latest_in) in enumerate(rows, 1):
+        line = f"{number}. {user_name} - masuk {in_days} hari, pulang {out_days} hari"
+        if earliest_in:
+            line += f" (clock in {earliest_in}-{latest_in})"
+        yield line
+
+    if number == 0:
+        yield "Tidak ada data kehadiran pada periode ini."
+
+def paginate_lines(lines: Iterable[str], header: str = "", limit: int = 4096) -> Iterator[str]:
+    """Group lines into messages no longer than Telegram's limit, holding one page at a time"""
+    page, size = ([header], len(header) + 1) if header else ([], 0)
+    for line in lines:
+        line = line[:limit - 1]
+        if size + len(line) + 1 > limit and page:
+            yield '\n'.join(page)
+            page, size = [], 0
+        page.append(line)
+        size += len(line) + 1
+
+    if page:
+        yield '\n'.join(page)
+
 def create_mention_list(user_ids: List[int]) -> str:
     """
     Create mention list for users using Telegram's tg://user?id= format
@@ -110,13 +151,9 @@ def get_next_reminder_time(current_time: datetime, reminder_interval: int) -> da
     """Calculate next reminder time based on current time and interval"""
     return current_time + timedelta(minutes=reminder_interval)
 
-def format_configuration_display(config: dict) -> str:
-    """Format configuration for display"""
-    config_type = config.get('config_type', 'unknown')
-    start_time = config.get('start_time', 'N/A')
-    end_time = config.get('end_time', 'N/A')
-    interval = config.get('reminder_interval', 'N/A')
-    enabled_days = config.get('enabled_days', [])
+def format_configuration_display(config) -> str:
+    """Format a ScheduleConfig for display"""
+    config_type = config.config_type
 
     # Get clock type name
     if config_type == 'clock_in':
@@ -127,11 +164,11 @@ def format_configuration_display(config: dict) -> str:
         clock_name = f"⚙️ **{config_type.replace('_', ' ').title()}**"
 
     # Format enabled days
-    days_display = get_enabled_days_display(enabled_days)
+    days_display = get_enabled_days_display(config.enabled_days)
 
     formatted = f"{clock_name}:\n"
-    formatted += f"🕐 Waktu: {start_time} - {end_time}\n"
-    formatted += f"⏰ Interval: {interval} menit\n"
+    formatted += f"🕐 Waktu: {config.start_time_str} - {config.end_time_str}\n"
+    formatted += f"⏰ Interval: {config.reminder_interval} menit\n"
     formatted += f"📅 Hari: {days_display}\n\n"
 
     return formatted 
@@ -0,0 +1,25 @@
+import os
+import sys
+
+import pytest
+
+# The bot runs from the repository root and imports its modules as src.*
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.database.database import Database
+from src.database.memory import MemoryStorage
+from src.database.sharding import ShardedDatabase
+
+ENGINES = ['memory', 'sqlite', 'sharded']
+
+@pytest.fixture(params=ENGINES)
+def storage(request, tmp_path):
+    """Every storage engine behind AttendanceStorage, on a fresh database"""
+    if request.param == 'memory':
+        engine = MemoryStorage()
+    elif request.param == 'sqlite':
+        engine = Database(str(tmp_path / "attendance.db"))
+    else:
+        engine = ShardedDatabase(str(tmp_path / "attendance.db"), shards=2)
+    yield engine
+    engine.close()
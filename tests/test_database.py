@@ -0,0 +1,61 @@
+"""Behaviour specific to the SQLite engine"""
+
+import sqlite3
+from datetime import date
+
+from src.database.database import Database
+from src.database.migrations import MIGRATIONS
+from src.utils.helpers import get_current_time
+from tests.test_storage_contract import CHAT, MORNING, clock
+
+def test_attendance_report_reads_one_snapshot(tmp_path):
+    database = Database(str(tmp_path / "attendance.db"))
+    try:
+        for user_id, name in ((1, "Alpha"), (2, "Bravo")):
+            clock(database, user_id, 'in', MORNING, name=name)
+
+        rows = database.iter_attendance_report(CHAT, date(2024, 3, 4), date(2024, 3, 4), fetch_size=1)
+        first = next(rows)
+        # Committed after the report started, so it is not part of it
+        clock(database, 3, 'in', MORNING, name="Charlie")
+        assert [first[0]] + [row[0] for row in rows] == [1, 2]
+        assert database._read_pool.stats()['checkouts'] == 0
+    finally:
+        database.close()
+
+def drain_online_migrations(database):
+    while database.run_online_migration_step():
+        pass
+
+def test_fresh_database_uses_indexes(tmp_path):
+    database = Database(str(tmp_path / "attendance.db"))
+    try:
+        drain_online_migrations(database)
+        assert database.verify_query_plans()
+    finally:
+        database.close()
+
+def test_migrated_baseline_database_uses_indexes(tmp_path):
+    path = str(tmp_path / "attendance.db")
+    # The layout the bot created before schema versions were tracked
+    conn = sqlite3.connect(path)
+    for statement in MIGRATIONS[0].statements:
+        conn.execute(statement)
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_attendance_chat_date ON attendance(chat_id, date_only)')
+    now = get_current_time()
+    for user_id, moment in ((1, MORNING), (2, now)):
+        conn.execute('''
+            INSERT INTO attendance (chat_id, user_id, user_name, username, clock_type, clock_time, date_only)
+            VALUES (?, ?, ?, ?, 'in', ?, DATE(?))
+        ''', (CHAT, user_id, f"User {user_id}", f"user{user_id}", str(moment), str(moment)))
+    conn.commit()
+    conn.close()
+
+    database = Database(path)
+    try:
+        drain_online_migrations(database)
+        assert database.verify_query_plans()
+        assert database.get_user_names([1, 2]) == {1: ("User 1", "user1"), 2: ("User 2", "user2")}
+        assert '2' in database.get_today_attendance(CHAT, now)['clock_in']
+    finally:
+        database.close()
@@ -0,0 +1,25 @@
+"""Day a clock or reminder belongs to under overnight windows"""
+
+from datetime import date, time
+
+from src.database.config_snapshot import ScheduleConfig, days_to_mask
+from src.scheduler.index import attendance_day
+from tests.test_storage_contract import CHAT, local
+
+def config(start, end, days=(0, 1, 2, 3, 4)):
+    return ScheduleConfig(CHAT, 'clock_out', start, end, 15, days_to_mask(list(days)))
+
+def test_overnight_window_belongs_to_its_start_day():
+    night = config(time(22, 0), time(1, 0))
+    # 2024-03-04 is a Monday
+    assert attendance_day(night, local(2024, 3, 4, 23, 0)) == date(2024, 3, 4)
+    assert attendance_day(night, local(2024, 3, 5, 0, 30)) == date(2024, 3, 4)
+    assert attendance_day(night, local(2024, 3, 5, 1, 0)) == date(2024, 3, 4)
+    assert attendance_day(night, local(2024, 3, 5, 1, 1)) == date(2024, 3, 5)
+
+def test_other_moments_keep_their_own_day():
+    morning = local(2024, 3, 5, 0, 30)
+    assert attendance_day(None, morning) == date(2024, 3, 5)
+    assert attendance_day(config(time(0, 0), time(2, 0)), morning) == date(2024, 3, 5)
+    # Sunday's window is not enabled, so Monday just after midnight is Monday
+    assert attendance_day(config(time(22, 0), time(1, 0)), local(2024, 3, 4, 0, 30)) == date(2024, 3, 4)
@@ -0,0 +1,195 @@
+"""Behaviour every AttendanceStorage engine must share, run against each engine"""
+
+import os
+from datetime import date, datetime
+
+from src.config.settings import Settings
+from src.database.storage import ClockStatus
+from src.database.timecodes import day_number, epoch_seconds
+
+CHAT = -1001
+OTHER_CHAT = -1002
+
+def local(year, month, day, hour=8, minute=0) -> datetime:
+    """Aware datetime in the bot's timezone"""
+    return Settings.get_timezone().localize(datetime(year, month, day, hour, minute))
+
+MORNING = local(2024, 3, 4, 8, 0)
+EVENING = local(2024, 3, 4, 17, 0)
+NEXT_MORNING = local(2024, 3, 5, 8, 0)
+
+def clock(storage, user_id, clock_type, moment, chat_id=CHAT, name=None):
+    return storage.clock(chat_id, user_id, name or f"User {user_id}", f"user{user_id}", clock_type, moment)
+
+def test_clock_in_then_out(storage):
+    assert clock(storage, 1, 'in', MORNING) == ClockStatus.INSERTED
+    assert clock(storage, 1, 'out', EVENING) == ClockStatus.INSERTED
+
+def test_clock_out_needs_clock_in_of_the_same_day(storage):
+    assert clock(storage, 1, 'out', EVENING) == ClockStatus.NOT_CLOCKED_IN
+    assert clock(storage, 1, 'in', MORNING) == ClockStatus.INSERTED
+    assert clock(storage, 1, 'out', local(2024, 3, 5, 17, 0)) == ClockStatus.NOT_CLOCKED_IN
+
+def test_one_clock_per_type_and_day(storage):
+    assert clock(storage, 1, 'in', MORNING) == ClockStatus.INSERTED
+    assert clock(storage, 1, 'in', local(2024, 3, 4, 9, 0)) == ClockStatus.ALREADY_CLOCKED
+    assert clock(storage, 1, 'in', NEXT_MORNING) == ClockStatus.INSERTED
+    assert clock(storage, 1, 'in', MORNING, chat_id=OTHER_CHAT) == ClockStatus.INSERTED
+
+def test_early_clock_in_is_filed_under_the_local_day(storage):
+    # 05:30 local is the previous day in UTC for timezones east of it
+    early = local(2024, 3, 4, 5, 30)
+    assert clock(storage, 1, 'in', early) == ClockStatus.INSERTED
+    assert clock(storage, 1, 'in', MORNING) == ClockStatus.ALREADY_CLOCKED
+    assert '1' in storage.get_today_attendance(CHAT, MORNING)['clock_in']
+
+def test_clock_out_filed_under_an_earlier_day(storage):
+    # An overnight window files a clock out after midnight under the day it started
+    after_midnight = local(2024, 3, 5, 0, 30)
+    assert clock(storage, 1, 'in', local(2024, 3, 4, 22, 0)) == ClockStatus.INSERTED
+    assert clock(storage, 1, 'out', after_midnight) == ClockStatus.NOT_CLOCKED_IN
+    assert storage.clock(CHAT, 1, "User 1", "user1", 'out', after_midnight, day=MORNING.date()) == ClockStatus.INSERTED
+
+    roster = storage.get_roster(CHAT, MORNING)
+    assert roster.get_clock_time(1, 'out') == epoch_seconds(after_midnight)
+    assert not storage.get_roster(CHAT, NEXT_MORNING).has_clocked_out(1)
+
+def test_batch_statuses_follow_record_order(storage):
+    records = [
+        (CHAT, 1, "User 1", "user1", 'in', MORNING, MORNING),
+        (CHAT, 1, "User 1", "user1", 'in', MORNING, MORNING),
+        (CHAT, 2, "User 2", "user2", 'out', EVENING, EVENING),
+        (OTHER_CHAT, 1, "User 1", "user1", 'in', MORNING, MORNING),
+        (CHAT, 1, "User 1", "user1", 'out', EVENING, EVENING),
+    ]
+    assert storage.clock_batch(records) == [
+        ClockStatus.INSERTED,
+        ClockStatus.ALREADY_CLOCKED,
+        ClockStatus.NOT_CLOCKED_IN,
+        ClockStatus.INSERTED,
+        ClockStatus.INSERTED,
+    ]
+    assert storage.clock_batch([]) == []
+
+def test_today_attendance(storage):
+    clock(storage, 1, 'in', MORNING)
+    clock(storage, 2, 'in', local(2024, 3, 4, 8, 30))
+    clock(storage, 1, 'out', EVENING)
+    clock(storage, 3, 'in', NEXT_MORNING)
+
+    attendance = storage.get_today_attendance(CHAT, MORNING)
+    assert set(attendance['clock_in']) == {'1', '2'}
+    assert set(attendance['clock_out']) == {'1'}
+    assert attendance['clock_in']['1'] == {
+        'name': "User 1", 'username': "user1", 'time': epoch_seconds(MORNING)
+    }
+    assert storage.get_today_attendance(OTHER_CHAT, MORNING) == {'clock_in': {}, 'clock_out': {}}
+
+def test_user_names_are_the_latest_seen(storage):
+    clock(storage, 1, 'in', MORNING, name="Old Name")
+    clock(storage, 1, 'in', NEXT_MORNING, name="New Name")
+    assert storage.get_user_names([1, 99]) == {1: ("New Name", "user1")}
+
+def test_daily_summary(storage):
+    clock(storage, 1, 'in', MORNING)
+    clock(storage, 2, 'in', local(2024, 3, 4, 7, 30))
+    clock(storage, 1, 'out', EVENING)
+    clock(storage, 1, 'in', local(2024, 3, 4, 9, 0))
+
+    summary = storage.get_daily_summary(CHAT, MORNING)
+    assert summary.day_num == day_number(MORNING)
+    assert (summary.in_count, summary.out_count) == (2, 1)
+    assert summary.first_in == epoch_seconds(local(2024, 3, 4, 7, 30))
+    assert summary.last_out == epoch_seconds(EVENING)
+
+    empty = storage.get_daily_summary(CHAT, NEXT_MORNING)
+    assert (empty.in_count, empty.out_count, empty.first_in, empty.last_out) == (0, 0, None, None)
+
+def test_attendance_report(storage):
+    clock(storage, 1, 'in', MORNING, name="bravo")
+    clock(storage, 1, 'out', EVENING, name="bravo")
+    clock(storage, 1, 'in', local(2024, 3, 5, 7, 45), name="bravo")
+    clock(storage, 2, 'in', local(2024, 3, 5, 9, 15), name="Alpha")
+    clock(storage, 3, 'in', local(2024, 3, 9, 9, 0), name="Outside")
+
+    offset = int(MORNING.utcoffset().total_seconds())
+    rows = list(storage.iter_attendance_report(CHAT, date(2024, 3, 4), date(2024, 3, 5), utc_offset=offset))
+    assert rows == [
+        (2, "Alpha", 1, 0, "09:15", "09:15"),
+        (1, "bravo", 2, 1, "07:45", "08:00"),
+    ]
+
+def test_attendance_report_orders_ties_by_user_id(storage):
+    for user_id, name in ((7, "sama"), (3, "SAMA"), (5, "Sama"), (4, "beta")):
+        clock(storage, user_id, 'in', MORNING, name=name)
+
+    rows = list(storage.iter_attendance_report(CHAT, date(2024, 3, 4), date(2024, 3, 4), fetch_size=2))
+    assert [row[0] for row in rows] == [4, 3, 5, 7]
+
+def test_roster_tracks_clocks(storage):
+    clock(storage, 1, 'in', MORNING)
+    roster = storage.get_roster(CHAT, MORNING)
+    assert roster.has_clocked_in(1)
+    assert not roster.has_clocked_out(1)
+
+    clock(storage, 1, 'out', EVENING)
+    clock(storage, 2, 'in', MORNING)
+    roster = storage.get_roster(CHAT, MORNING)
+    assert roster.has_clocked_out(1) and roster.has_clocked_in(2)
+    assert roster.get_clock_time(1, 'out') == epoch_seconds(EVENING)
+    assert roster.clock_in_count == 2
+
+    peeked = storage.peek_roster(CHAT, MORNING)
+    assert peeked is None or peeked.has_clocked_in(2)
+    assert not storage.get_roster(CHAT, NEXT_MORNING).has_clocked_in(1)
+
+def test_members_without_attendance(storage):
+    clock(storage, 1, 'in', MORNING)
+    clock(storage, 2, 'in', MORNING)
+    clock(storage, 2, 'out', EVENING)
+    assert storage.get_members_without_attendance(CHAT, 'in', MORNING, [1, 2, 3]) == [3]
+    assert storage.get_members_without_attendance(CHAT, 'out', MORNING, [1, 2, 3]) == [1, 3]
+
+def test_chat_groups(storage):
+    assert storage.add_chat_group(CHAT, "Tim A", 'group')
+    assert storage.add_chat_group(CHAT, "Tim A baru", 'supergroup')
+    assert storage.add_chat_group(OTHER_CHAT, "Tim B", 'group')
+
+    groups = {group['chat_id']: group for group in storage.get_all_chat_groups()}
+    assert set(groups) == {CHAT, OTHER_CHAT}
+    assert groups[CHAT]['chat_title'] == "Tim A baru"
+    assert groups[CHAT]['chat_type'] == 'supergroup'
+
+def test_configuration(storage):
+    assert storage.save_configuration(CHAT, 'clock_in', '07:00', '09:00', 15, [0, 1, 2, 3, 4])
+    assert storage.save_configuration(CHAT, 'clock_in', '07:30', '09:00', 10, [0, 2])
+    assert storage.save_configuration(OTHER_CHAT, 'clock_out', '16:00', '18:00', 30, [4])
+    assert not storage.save_configuration(CHAT, 'clock_out', 'soon', '18:00', 30, [4])
+
+    config = storage.get_configuration(CHAT, 'clock_in')
+    assert config.start_time.strftime('%H:%M') == '07:30'
+    assert config.reminder_interval == 10
+    assert config.enabled_days == [0, 2]
+    assert storage.get_configuration(CHAT, 'clock_out') is None
+
+    active = {(config.chat_id, config.config_type) for config in storage.get_all_active_configurations()}
+    assert active == {(CHAT, 'clock_in'), (OTHER_CHAT, 'clock_out')}
+
+def test_schedule_markers_never_move_backwards(storage):
+    assert storage.get_schedule_markers() == (None, {})
+
+    assert storage.save_schedule_markers(1000, [(CHAT, 'clock_in', 990), (OTHER_CHAT, 'clock_out', 1000)])
+    assert storage.save_schedule_markers(900, [(CHAT, 'clock_in', 900)])
+    assert storage.get_schedule_markers() == (
+        1000, {(CHAT, 'clock_in'): 990, (OTHER_CHAT, 'clock_out'): 1000}
+    )
+
+def test_backup(storage, tmp_path):
+    clock(storage, 1, 'in', MORNING)
+    result = storage.backup(str(tmp_path / "backups"), keep=2)
+    if result:
+        assert os.path.exists(result['path'])
+        assert result['compressed_bytes'] > 0
+    else:
+        # Engines without a database file have nothing to back up
+        assert result == {}